@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Balises réfléchissantes : détection dans un scan et recalage global.
+
+- find_reflectors : regroupe en un seul passage linéaire les points très
+  réfléchissants consécutifs en angle (scan trié par l'index angulaire),
+  centroïdes pondérés par la qualité.
+- global_pose : pose du robot à partir de ces reflets et des balises connues,
+  sans a priori sur la pose (toutes les affectations reflets -> balises
+  compatibles avec la géométrie du triangle sont évaluées d'un bloc).
+- associate : reflet correspondant à chaque balise, une fois la pose connue.
+- triangulate : pose par relèvements seuls sur trois balises (algorithme
+  ToTal, forme fermée), vectorisé sur un lot d'affectations candidates.
+"""
+from itertools import combinations
+import numpy as np
+from lidar_scan import LidarScan
+
+
+# Un reflet : centroïde (repère LIDAR, mm), distance/angle brut du centroïde,
+# nombre de points, étendue (mm), qualité moyenne
+REFLECTOR_DTYPE = np.dtype([
+    ("x", np.float32), ("y", np.float32),
+    ("range", np.float32), ("angle", np.float32),
+    ("n", np.int32), ("size", np.float32), ("qual", np.float32),
+])
+
+
+def find_reflectors(scan: LidarScan, qual_min=40, gap=60.0, min_points=2, max_size=200.0):
+    """
+    Reflets du scan : points de qualité >= qual_min, regroupés tant que deux
+    points consécutifs en angle sont à moins de gap (mm) l'un de l'autre.
+    Les groupes de moins de min_points points ou plus larges que max_size (mm)
+    (murs clairs, adversaire) sont écartés.
+    Retourne un tableau structuré REFLECTOR_DTYPE trié par angle.
+    ValueError si le scan n'a pas de qualité (modes express/dense).
+    """
+    if not scan.has_quality:
+        raise ValueError("scan sans qualité (mode express/dense) : reflets indétectables")
+    if len(scan) == 0:
+        return np.zeros(0, dtype=REFLECTOR_DTYPE)
+    idx = scan.between(0.0, 2 * np.pi)          # ordre angulaire (index du scan)
+    idx = idx[scan.quals[idx] >= qual_min]
+    if len(idx) == 0:
+        return np.zeros(0, dtype=REFLECTOR_DTYPE)
+
+    x = scan.x[idx].astype(float)
+    y = scan.y[idx].astype(float)
+    q = scan.quals[idx].astype(float)
+
+    # Nouveau groupe à chaque saut de plus de gap entre voisins angulaires
+    new = np.empty(len(idx), dtype=bool)
+    new[0] = True
+    np.greater(np.hypot(np.diff(x), np.diff(y)), gap, out=new[1:])
+    label = np.cumsum(new) - 1
+    # Le groupe qui chevauche 0° est coupé en deux : on recolle
+    if label[-1] > 0 and np.hypot(x[0] - x[-1], y[0] - y[-1]) <= gap:
+        label[label == label[-1]] = 0
+    n_lab = int(label.max()) + 1
+
+    n = np.bincount(label, minlength=n_lab)
+    w = np.bincount(label, weights=q, minlength=n_lab)
+    cx = np.bincount(label, weights=q * x, minlength=n_lab) / w
+    cy = np.bincount(label, weights=q * y, minlength=n_lab) / w
+    size = np.zeros(n_lab)
+    np.maximum.at(size, label, np.hypot(x - cx[label], y - cy[label]))
+    size *= 2.0
+
+    keep = (n >= min_points) & (size <= max_size)
+    out = np.zeros(int(np.count_nonzero(keep)), dtype=REFLECTOR_DTYPE)
+    out["x"], out["y"] = cx[keep], cy[keep]
+    out["range"] = np.hypot(cx[keep], cy[keep])
+    out["angle"] = np.arctan2(cy[keep], cx[keep]) % (2 * np.pi)
+    out["n"], out["size"] = n[keep], size[keep]
+    out["qual"] = w[keep] / n[keep]
+    return out[np.argsort(out["angle"])]
+
+
+def global_pose(points, beacons, tol=80.0, bounds=None, max_points=12):
+    """
+    Pose (x, y, theta) du robot sans a priori.
+
+    points  : (M, 2) reflets dans le repère robot (mm)
+    beacons : (K, 2) balises dans le repère table (mm), K >= 3
+    tol     : écart toléré sur les côtés du triangle et sur les résidus (mm)
+    bounds  : ((xmin, xmax), (ymin, ymax)) pour écarter les poses hors table
+
+    Pour chaque triplet de balises, toutes les affectations ordonnées de
+    trois reflets distincts sont générées ; on garde celles dont les trois
+    distances mutuelles et le sens de parcours collent au triangle des
+    balises, puis la pose de chacune est obtenue en forme fermée (recalage
+    rigide 2D aux moindres carrés). La meilleure est celle qui explique le
+    plus de balises (reflet à moins de tol de sa position prédite), puis le
+    plus petit résidu.
+    Retourne (pose (3,), résidu rms (mm), nb de balises expliquées) ou None.
+    """
+    P = np.asarray(points, dtype=float)
+    B = np.asarray(beacons, dtype=float)
+    if len(P) < 3 or len(B) < 3:
+        return None
+    P = P[:max_points]
+    m = len(P)
+
+    # Affectations ordonnées (i, j, k) de reflets distincts
+    i, j, k = np.meshgrid(np.arange(m), np.arange(m), np.arange(m), indexing="ij")
+    i, j, k = i.ravel(), j.ravel(), k.ravel()
+    distinct = (i != j) & (j != k) & (i != k)
+    trip = np.stack((i[distinct], j[distinct], k[distinct]), axis=1)   # (T, 3)
+
+    D = np.hypot(P[:, None, 0] - P[None, :, 0], P[:, None, 1] - P[None, :, 1])
+    cross_p = _cross(P[trip[:, 1]] - P[trip[:, 0]], P[trip[:, 2]] - P[trip[:, 0]])
+
+    poses, rms = [], []
+    for tri in combinations(range(len(B)), 3):
+        Bt = B[list(tri)]
+        d_ab = np.hypot(*(Bt[1] - Bt[0]))
+        d_bc = np.hypot(*(Bt[2] - Bt[1]))
+        d_ac = np.hypot(*(Bt[2] - Bt[0]))
+        cross_b = _cross(Bt[1] - Bt[0], Bt[2] - Bt[0])
+
+        # Triangle de reflets compatible (côtés + même sens : pas de miroir)
+        ok = (
+            (np.abs(D[trip[:, 0], trip[:, 1]] - d_ab) < tol)
+            & (np.abs(D[trip[:, 1], trip[:, 2]] - d_bc) < tol)
+            & (np.abs(D[trip[:, 0], trip[:, 2]] - d_ac) < tol)
+            & (np.sign(cross_p) == np.sign(cross_b))
+        )
+        if not np.any(ok):
+            continue
+        pose, res = _rigid_fit(P[trip[ok]], Bt)
+        poses.append(pose)
+        rms.append(res)
+
+    if not poses:
+        return None
+    poses = np.concatenate(poses)
+    rms = np.concatenate(rms)
+
+    valid = rms < tol
+    if bounds is not None:
+        (xmin, xmax), (ymin, ymax) = bounds
+        valid &= (poses[:, 0] >= xmin) & (poses[:, 0] <= xmax)
+        valid &= (poses[:, 1] >= ymin) & (poses[:, 1] <= ymax)
+    if not np.any(valid):
+        return None
+    poses, rms = poses[valid], rms[valid]
+
+    # Support : balises dont la position prédite (repère robot) tombe sur un reflet
+    c, s = np.cos(poses[:, 2]), np.sin(poses[:, 2])
+    dx = B[None, :, 0] - poses[:, None, 0]
+    dy = B[None, :, 1] - poses[:, None, 1]
+    bx = c[:, None] * dx + s[:, None] * dy                  # (H, K)
+    by = -s[:, None] * dx + c[:, None] * dy
+    dist = np.hypot(bx[:, :, None] - P[None, None, :, 0], by[:, :, None] - P[None, None, :, 1])
+    support = np.count_nonzero(dist.min(axis=2) < tol, axis=1)
+
+    best = np.lexsort((rms, -support))[0]
+    return poses[best], float(rms[best]), int(support[best])
+
+
+def associate(points, beacons, pose, tol=80.0):
+    """
+    Affectation reflets -> balises depuis pose (x, y, theta) : pour chaque
+    balise, le reflet le plus proche de sa position prédite dans le repère
+    robot, s'il est à moins de tol (mm) et n'est pas plus proche d'une autre balise.
+    Retourne un tableau (K,) d'indices dans points, -1 pour une balise non vue.
+    """
+    P = np.asarray(points, dtype=float).reshape(-1, 2)
+    B = np.asarray(beacons, dtype=float).reshape(-1, 2)
+    match = np.full(len(B), -1, dtype=np.intp)
+    if len(P) == 0 or len(B) == 0:
+        return match
+    x, y, th = pose
+    c, s = np.cos(th), np.sin(th)
+    bx = c * (B[:, 0] - x) + s * (B[:, 1] - y)
+    by = -s * (B[:, 0] - x) + c * (B[:, 1] - y)
+    dist = np.hypot(bx[:, None] - P[None, :, 0], by[:, None] - P[None, :, 1])   # (K, M)
+    i = np.argmin(dist, axis=1)
+    ok = dist[np.arange(len(B)), i] < tol
+    # Un reflet revendiqué par deux balises va à la plus proche
+    ok &= np.argmin(dist, axis=0)[i] == np.arange(len(B))
+    match[ok] = i[ok]
+    return match
+
+
+def _cot(a):
+    """Cotangente bornée (relèvements égaux ou opposés : valeur très grande, pas d'infini)."""
+    sa = np.sin(a)
+    sa = np.where(np.abs(sa) < 1e-8, np.copysign(1e-8, sa), sa)
+    return np.cos(a) / sa
+
+
+def triangulate(bearings, beacons, min_det=0.1):
+    """
+    Triangulation par relèvements seuls (ToTal, Pierlot & Van Droogenbroeck) :
+    pose à partir des angles sous lesquels trois balises sont vues, sans les
+    distances (bien plus précises en angle qu'en distance pour des catadioptres).
+
+    bearings : (..., 3) relèvements des balises dans le repère robot (rad)
+    beacons  : (..., 3, 2) ou (3, 2) balises correspondantes, repère table (mm)
+    min_det  : seuil de dégénérescence sur |D| normalisé. D s'annule quand le
+               robot est sur le cercle passant par les trois balises (ou qu'elles
+               sont alignées) : la position n'y est plus observable.
+    Retourne (poses (..., 3), det (...,) normalisé, valid (...,) booléen).
+    Les poses dégénérées valent NaN.
+    """
+    a = np.asarray(bearings, dtype=float)
+    B = np.broadcast_to(np.asarray(beacons, dtype=float), a.shape + (2,))
+    x1, y1 = B[..., 0, 0], B[..., 0, 1]
+    x2, y2 = B[..., 1, 0], B[..., 1, 1]
+    x3, y3 = B[..., 2, 0], B[..., 2, 1]
+
+    # Repère centré sur la balise 2
+    x1p, y1p = x1 - x2, y1 - y2
+    x3p, y3p = x3 - x2, y3 - y2
+    t12 = _cot(a[..., 1] - a[..., 0])
+    t23 = _cot(a[..., 2] - a[..., 1])
+    den = t12 + t23
+    den = np.where(np.abs(den) < 1e-8, np.copysign(1e-8, den), den)
+    t31 = (1.0 - t12 * t23) / den
+
+    # Centres des cercles passant par le robot et chaque paire de balises
+    x12, y12 = x1p + t12 * y1p, y1p - t12 * x1p
+    x23, y23 = x3p - t23 * y3p, y3p + t23 * x3p
+    x31, y31 = (x3p + x1p) + t31 * (y3p - y1p), (y3p + y1p) - t31 * (x3p - x1p)
+    k31 = x1p * x3p + y1p * y3p + t31 * (x1p * y3p - x3p * y1p)
+
+    D = (x12 - x23) * (y23 - y31) - (y12 - y23) * (x23 - x31)
+    # |D| normalisé par l'échelle du triangle (sans unité)
+    scale = x1p * x1p + y1p * y1p + x3p * x3p + y3p * y3p
+    det = np.abs(D) / scale
+    valid = det > min_det
+    Ds = np.where(valid, D, 1.0)
+    xr = x2 + k31 * (y12 - y23) / Ds
+    yr = y2 + k31 * (x23 - x12) / Ds
+
+    # Cap : moyenne circulaire des trois (direction de la balise - relèvement)
+    phi = np.arctan2(B[..., 1] - yr[..., None], B[..., 0] - xr[..., None]) - a
+    th = np.arctan2(np.sin(phi).sum(axis=-1), np.cos(phi).sum(axis=-1))
+
+    poses = np.stack((xr, yr, th), axis=-1)
+    poses[~valid] = np.nan
+    return poses, det, valid
+
+
+def best_triangulation(bearings, beacons, min_det=0.1):
+    """
+    Triangulation sur le triplet le mieux conditionné parmi K >= 3 balises
+    associées (relèvements (K,), balises (K, 2)) : tous les triplets sont
+    évalués d'un bloc par triangulate.
+    Retourne (pose (3,), det) ou None si tous sont dégénérés.
+    """
+    a = np.asarray(bearings, dtype=float)
+    B = np.asarray(beacons, dtype=float)
+    if len(a) < 3:
+        return None
+    tri = np.array(list(combinations(range(len(a)), 3)))
+    poses, det, valid = triangulate(a[tri], B[tri], min_det=min_det)
+    if not np.any(valid):
+        return None
+    best = int(np.argmax(np.where(valid, det, -np.inf)))
+    return poses[best], float(det[best])
+
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def _rigid_fit(P, Q):
+    """
+    Recalage rigide 2D en forme fermée, vectorisé sur les hypothèses :
+    P (H, n, 2) points repère robot, Q (n, 2) points repère table.
+    Retourne poses (H, 3) telles que Q ≈ t + R(theta) P, et résidus rms (H,).
+    """
+    p_mean = P.mean(axis=1)
+    q_mean = Q.mean(axis=0)
+    pc = P - p_mean[:, None, :]
+    qc = Q - q_mean
+    s_dot = np.sum(pc[..., 0] * qc[..., 0] + pc[..., 1] * qc[..., 1], axis=1)
+    s_cross = np.sum(pc[..., 0] * qc[..., 1] - pc[..., 1] * qc[..., 0], axis=1)
+    theta = np.arctan2(s_cross, s_dot)
+    c, s = np.cos(theta), np.sin(theta)
+    tx = q_mean[0] - (c * p_mean[:, 0] - s * p_mean[:, 1])
+    ty = q_mean[1] - (s * p_mean[:, 0] + c * p_mean[:, 1])
+
+    rx = tx[:, None] + c[:, None] * P[..., 0] - s[:, None] * P[..., 1] - Q[:, 0]
+    ry = ty[:, None] + s[:, None] * P[..., 0] + c[:, None] * P[..., 1] - Q[:, 1]
+    rms = np.sqrt(np.mean(rx * rx + ry * ry, axis=1))
+    return np.stack((tx, ty, theta), axis=1), rms
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure EKF sans LIDAR branché : scans synthétiques (balises, bordures, bruit),
+temps de calcul de l'extraction des balises et des bordures, du predict et de l'update,
+du suivi des adversaires et de la carte statique sur la machine courante (Pi).
+
+Usage : python3 bench_ekf.py [nb_points_par_tour]
+"""
+import sys
+import time
+import numpy as np
+from ekf_localizer import EKFLocalizer
+from lidar_scan import LidarScan
+from beacons import triangulate
+from opponents import OpponentTracker
+from static_map import StaticMap
+
+N_POINTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+N_ITER = 2000
+BUDGET_MS = 1.0
+
+
+def synthetic_scan(ekf, pose, n_points, rng, n_fake=4):
+    """
+    Tour LIDAR vu depuis pose : 3 points très réfléchissants par balise,
+    n_fake faux reflets (2 points) et un fond aléatoire peu réfléchissant.
+    """
+    x, y, th = pose
+    ang, dist, qual = [], [], []
+    for bx, by in ekf.balises.values():
+        b = np.arctan2(by - y, bx - x) - th
+        r = np.hypot(bx - x, by - y)
+        for off in (-25.0, 0.0, 25.0):
+            ang.append((b + off / r - ekf.angle_offset) % (2 * np.pi))
+            dist.append(r + rng.normal(0.0, 10.0))
+            qual.append(60)
+    for _ in range(n_fake):
+        a, r = rng.uniform(0.0, 2 * np.pi), rng.uniform(300.0, 2500.0)
+        ang += [a, a + 20.0 / r]
+        dist += [r, r]
+        qual += [55, 55]
+    n_bg = n_points - len(ang)
+    ang = np.r_[ang, rng.uniform(0.0, 2 * np.pi, n_bg)]
+    dist = np.r_[dist, rng.uniform(100.0, 3500.0, n_bg)]
+    qual = np.r_[qual, rng.integers(0, 40, n_bg)]
+    o = np.argsort(ang)
+    t = np.linspace(0.0, 0.1, n_points)
+    return LidarScan.from_columns(ang[o], dist[o], qual[o], t)
+
+
+def table_scan(ekf, pose, n_points, rng, opponent=None):
+    """
+    Tour LIDAR réaliste vu depuis pose : bordures de la table (lancer de rayons
+    sur le rectangle table_bounds), balises, et éventuellement un adversaire
+    (disque de 200 mm de rayon en opponent=(x, y)) qui masque ce qu'il y a derrière.
+    """
+    x, y, th = pose
+    (xmin, xmax), (ymin, ymax) = ekf.table_bounds
+    ang = np.sort(rng.uniform(0.0, 2 * np.pi, n_points))
+    b = ang + ekf.angle_offset + th                     # direction monde
+    c, s = np.cos(b), np.sin(b)
+    with np.errstate(divide="ignore"):
+        tx = np.where(c > 0, (xmax - x) / c, (xmin - x) / c)
+        ty = np.where(s > 0, (ymax - y) / s, (ymin - y) / s)
+    dist = np.minimum(np.abs(tx), np.abs(ty))
+    if opponent is not None:
+        ox, oy = opponent[0] - x, opponent[1] - y
+        proj = ox * c + oy * s
+        perp2 = ox * ox + oy * oy - proj * proj
+        hit = (proj > 0) & (perp2 < 200.0 ** 2)
+        dist[hit] = np.minimum(dist[hit], proj[hit] - np.sqrt(200.0 ** 2 - perp2[hit]))
+    dist += rng.normal(0.0, 8.0, n_points)
+    qual = rng.integers(10, 40, n_points)
+    beacons = synthetic_scan(ekf, pose, 3 * len(ekf.balises), rng, n_fake=0)
+    ang = np.r_[ang, beacons.angles]
+    dist = np.r_[dist, beacons.dists]
+    qual = np.r_[qual, beacons.quals]
+    o = np.argsort(ang)
+    t = np.linspace(0.0, 0.1, len(ang))
+    return LidarScan.from_columns(ang[o], dist[o], qual[o], t)
+
+
+def bench(name, fn, n_iter=N_ITER, budget_ms=BUDGET_MS):
+    dt = np.empty(n_iter)
+    for i in range(n_iter):
+        t0 = time.perf_counter()
+        fn()
+        dt[i] = time.perf_counter() - t0
+    dt *= 1e3
+    status = "OK" if np.median(dt) < budget_ms else "TROP LENT"
+    print(f"{name:<28} médiane={np.median(dt):.3f} ms  p99={np.percentile(dt, 99):.3f} ms  [{status}]")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+
+    # port=None : objet série non ouvert, aucun accès matériel
+    ekf = EKFLocalizer(port=None, init_pose=(500.0, 0.0, 0.0))
+    scans = [synthetic_scan(ekf, (500.0, 0.0, 0.0), N_POINTS, rng) for _ in range(16)]
+
+    obs, diag = ekf._extract_beacon_measurements(scans[0])
+    print(f"[BENCH] {N_POINTS} points/tour, {len(obs)}/{len(ekf.balises)} balises vues")
+    for key, d in diag.items():
+        print(f"   {key}: r_hat={d['r_hat']:.0f} b_hat={np.degrees(d['b_hat']):.1f}° "
+              f"candidats={d['n_gate']} vu={d['seen']}")
+
+    k = 0
+
+    def extract_new_scan():
+        # Scan "neuf" à chaque fois : l'index angulaire est reconstruit
+        global k
+        scan = scans[k % len(scans)]
+        scan._invalidate()
+        k += 1
+        ekf._extract_beacon_measurements(scan)
+
+    bench("extraction (scan neuf)", extract_new_scan)
+    bench("extraction (index en cache)", lambda: ekf._extract_beacon_measurements(scans[0]))
+
+    # Filtre au rythme de l'odométrie : 100 Hz sur un coeur, avec de la marge
+    bench("predict (v, w)", lambda: ekf.predict(0.01, v=300.0, w=0.5), budget_ms=0.1)
+    bench("predict (dx, dy, dtheta)", lambda: ekf.predict(0.01, dx=3.0, dy=0.5, dtheta=0.005), budget_ms=0.1)
+    bench(f"update conjoint ({len(obs)} balises)", lambda: ekf._update_with_measurements(obs), budget_ms=0.2)
+
+    # Recalage global depuis un seul tour, robot perdu (pose de départ fausse)
+    true_pose = (1400.0, 700.0, np.radians(130.0))
+    lost_scans = [synthetic_scan(ekf, true_pose, N_POINTS, rng) for _ in range(16)]
+    ekf.reset_pose((300.0, -900.0, 0.0))
+    pose = ekf.relocalize(lost_scans[0])
+    if pose is not None:
+        err = np.hypot(pose[0] - true_pose[0], pose[1] - true_pose[1])
+        print(f"[BENCH] recalage : erreur {err:.0f} mm, {np.degrees(pose[2] - true_pose[2]):.1f}°")
+
+    def relocalize_new_scan():
+        global k
+        scan = lost_scans[k % len(lost_scans)]
+        scan._invalidate()
+        k += 1
+        ekf.relocalize(scan)
+
+    bench("recalage global", relocalize_new_scan, n_iter=200, budget_ms=20.0)
+
+    # Triangulation par relèvements : contrôle du filtre, et lot d'affectations candidates
+    bench("triangulation (3 balises)", lambda: ekf.triangulate(obs), budget_ms=0.2)
+    B = np.array(list(ekf.balises.values()))
+    bearings = rng.uniform(-np.pi, np.pi, (1000, 3))
+    bench("triangulation (lot de 1000)", lambda: triangulate(bearings, B), budget_ms=1.0)
+
+    # Bordures de la table : segments + appariement, adversaire devant une balise
+    true_pose = (700.0, -300.0, np.radians(20.0))
+    wall_scans = [table_scan(ekf, true_pose, N_POINTS, rng, opponent=(300.0, -1000.0))
+                  for _ in range(16)]
+    ekf.reset_pose(true_pose, sigmas=(50.0, 50.0, np.deg2rad(3.0)))
+    wall_obs = ekf._extract_wall_measurements(wall_scans[0])
+    print(f"[BENCH] {len(ekf.wall_segments)} segments, bordures vues : "
+          f"{', '.join(key for key, _, _ in wall_obs) or 'aucune'}")
+    # Pose décalée : l'update par les seules bordures doit la ramener
+    ekf.reset_pose((true_pose[0] + 60.0, true_pose[1] - 60.0, true_pose[2] + 0.03),
+                   sigmas=(80.0, 80.0, np.deg2rad(3.0)))
+    ekf._update_with_measurements(ekf._extract_wall_measurements(wall_scans[1]))
+    print(f"[BENCH] bordures seules : erreur {np.hypot(ekf.x[0] - true_pose[0], ekf.x[1] - true_pose[1]):.0f} mm, "
+          f"{np.degrees(ekf.x[2] - true_pose[2]):.2f}°")
+
+    def walls_new_scan():
+        global k
+        scan = wall_scans[k % len(wall_scans)]
+        scan._invalidate()
+        k += 1
+        ekf._extract_wall_measurements(scan)
+
+    bench("bordures (scan neuf)", walls_new_scan, n_iter=500, budget_ms=2.0)
+
+    # Adversaires : repère table, retrait bordures / balises, obstacles, pistes
+    tracker = OpponentTracker()
+    t_rev = [0.0]
+
+    def opponents_new_scan():
+        global k
+        scan = wall_scans[k % len(wall_scans)]
+        scan._invalidate()
+        k += 1
+        t_rev[0] += 0.1
+        tracker.process(scan, true_pose, ekf.angle_offset, ekf.table_bounds, ekf.balises.values(), t=t_rev[0])
+
+    bench("adversaires (tour complet)", opponents_new_scan, n_iter=500, budget_ms=3.0)
+    print(f"[BENCH] adversaires suivis : {[(o['id'], round(o['x']), round(o['y'])) for o in tracker.opponents()]}")
+
+    # Carte statique : calibration sur la table vide, puis tri statique / dynamique
+    smap = StaticMap(ekf.table_bounds)
+    for _ in range(20):
+        scan = table_scan(ekf, true_pose, N_POINTS, rng)
+        x, y, th = true_pose
+        b = scan.angles.astype(float) + ekf.angle_offset + th
+        smap.add_points(x + scan.dists * np.cos(b), y + scan.dists * np.sin(b))
+    smap.finalize()
+    scan = wall_scans[0]
+    b = scan.angles.astype(float) + ekf.angle_offset + true_pose[2]
+    px = true_pose[0] + scan.dists * np.cos(b)
+    py = true_pose[1] + scan.dists * np.sin(b)
+    dyn = smap.dynamic_mask(px, py)
+    near = np.hypot(px - 300.0, py + 1000.0) < 260.0
+    print(f"[BENCH] carte statique : {np.count_nonzero(smap.static)} cellules, "
+          f"{np.count_nonzero(dyn & near)}/{np.count_nonzero(near)} points adversaire dynamiques, "
+          f"{np.count_nonzero(dyn & ~near)} faux dynamiques")
+    bench(f"carte statique ({len(scan)} points)", lambda: smap.dynamic_mask(px, py), budget_ms=0.2)
+    tracker = OpponentTracker(static_map=smap)
+    bench("adversaires (carte statique)", opponents_new_scan, n_iter=500, budget_ms=3.0)
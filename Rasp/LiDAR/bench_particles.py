@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure du filtre particulaire (cœur NumPy, sans LIDAR) :
+temps par pas de mouvement et par update à 500 / 2000 / 5000 particules,
+et convergence depuis un nuage étalé sur toute la table.
+
+Usage : python3 bench_particles.py
+"""
+import time
+import numpy as np
+from particle_filter import ParticleFilter
+
+BEACONS = [(50.0, -1594.0), (1950.0, -1594.0), (1000.0, 1594.0)]
+TABLE = ((0.0, 2000.0), (-1500.0, 1500.0))
+N_ITER = 200
+
+
+def observe(pose, rng, n_fake=5):
+    """Reflets (distance, relèvement robot) vus depuis pose : balises + faux reflets."""
+    x, y, th = pose
+    r, b = [], []
+    for bx, by in BEACONS:
+        r.append(np.hypot(bx - x, by - y) + rng.normal(0.0, 15.0))
+        b.append(np.arctan2(by - y, bx - x) - th + rng.normal(0.0, 0.01))
+    r += list(rng.uniform(200.0, 2500.0, n_fake))
+    b += list(rng.uniform(-np.pi, np.pi, n_fake))
+    return np.array(r), np.array(b)
+
+
+def timed(fn, n_iter=N_ITER):
+    dt = np.empty(n_iter)
+    for i in range(n_iter):
+        t0 = time.perf_counter()
+        fn()
+        dt[i] = time.perf_counter() - t0
+    return np.median(dt) * 1e3, np.percentile(dt, 99) * 1e3
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    pose = (1200.0, -400.0, np.radians(60.0))
+    r, b = observe(pose, rng)
+
+    print(f"{'particules':>10} {'move (ms)':>12} {'update (ms)':>12} {'p99 update':>12}")
+    for n in (500, 2000, 5000):
+        # Nombre fixe : pas d'adaptation pendant la mesure
+        pf = ParticleFilter(BEACONS, n_max=n, n_min=n, budget_ms=1e9, seed=1)
+        pf.seed_gaussian(pose, (100.0, 100.0, 0.1))
+        move_ms, _ = timed(lambda: pf.move(5.0, 0.0, 0.002, 2.0, 0.002))
+        upd_ms, upd_p99 = timed(lambda: pf.update(r, b))
+        print(f"{n:>10} {move_ms:>12.3f} {upd_ms:>12.3f} {upd_p99:>12.3f}")
+
+    # Convergence globale avec nombre adaptatif (démarrage sans a priori)
+    pf = ParticleFilter(BEACONS, n_max=5000, n_min=300, budget_ms=5.0, seed=2)
+    pf.seed_uniform(TABLE)
+    for k in range(15):
+        pf.move(0.0, 0.0, 0.0, 5.0, 0.005)
+        pf.update(*observe(pose, rng))
+    mean, cov = pf.estimate()
+    err = np.hypot(mean[0] - pose[0], mean[1] - pose[1])
+    print(f"[BENCH] convergence globale : erreur {err:.0f} mm, "
+          f"sigma {np.sqrt(cov[0, 0] + cov[1, 1]):.0f} mm, {pf.n} particules")
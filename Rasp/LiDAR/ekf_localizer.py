@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
+import math
+import time
 import numpy as np
 from rplidar_c1m1 import RPLidarC1M1
+from lidar_scan import LidarScan
+from beacons import find_reflectors, global_pose, associate, best_triangulation
+from walls import find_segments, table_walls, match_walls
 
 
 # ---------------- Outils divers ---------------- #
@@ -11,6 +16,21 @@ def wrap_pi(a: float) -> float:
     return a - np.pi
 
 
+def inv3(a: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Inverse d'une matrice 3x3 par la comatrice (bien plus rapide que np.linalg.inv)."""
+    a00, a01, a02, a10, a11, a12, a20, a21, a22 = a.ravel().tolist()
+    c00 = a11 * a22 - a12 * a21
+    c01 = a12 * a20 - a10 * a22
+    c02 = a10 * a21 - a11 * a20
+    d = 1.0 / (a00 * c00 + a01 * c01 + a02 * c02)
+    out[:] = (
+        (c00 * d, (a02 * a21 - a01 * a22) * d, (a01 * a12 - a02 * a11) * d),
+        (c01 * d, (a00 * a22 - a02 * a20) * d, (a02 * a10 - a00 * a12) * d),
+        (c02 * d, (a01 * a20 - a00 * a21) * d, (a00 * a11 - a01 * a10) * d),
+    )
+    return out
+
+
 class EKFLocalizer(RPLidarC1M1):
     """
     EKF pose-only: prédiction par odométrie, correction par balises fixes (range + bearing).
@@ -30,6 +50,11 @@ class EKFLocalizer(RPLidarC1M1):
         z_i = [r_i, b_i]
         r_i : distance (mm)
         b_i : angle LIDAR (rad) dans le même repère angulaire que theta.
+
+    Mesures LIDAR pour chaque bordure de table j (droite n_j . p = c_j):
+        z_j = [rho_j, alpha_j]
+        rho_j : distance du robot à la bordure (mm)
+        alpha_j : angle de la normale robot -> bordure (rad), repère robot.
     """
 
     def __init__(
@@ -39,8 +64,9 @@ class EKFLocalizer(RPLidarC1M1):
         timeout: float = 0.05,
         balises: dict | None = None,
         init_pose: tuple[float, float, float] | None = None,
+        scan_mode: str = "standard",
     ):
-        super().__init__(port, baud, timeout)
+        super().__init__(port, baud, timeout, scan_mode=scan_mode)
 
         # Coordonnées fixes des balises (mm) dans ton repère table
         # (valeurs que tu as mesurées)
@@ -70,19 +96,86 @@ class EKFLocalizer(RPLidarC1M1):
         # Bruits process (odom) — à tuner
         self.sigma_v = 30.0     # mm/s
         self.sigma_w = 0.05     # rad/s
+        # Erreur proportionnelle des déplacements mesurés par l'odométrie
+        self.odom_k_lin = 0.05  # mm/mm
+        self.odom_k_rot = 0.05  # rad/rad
 
         # Bruits de mesure LIDAR (balises) — à tuner
         self.sigma_r = 30.0     # mm
         self.sigma_b = np.deg2rad(2.0)  # rad
 
+        # Décalage entre l'angle brut du LIDAR et l'axe avant du robot
+        self.angle_offset = np.radians(-90.0)
+
         # Fenêtres de recherche autour de la mesure attendue
         self.bearing_window = np.deg2rad(20.0)   # ±20°
         self.range_window = 300.0               # ±300 mm
 
+        # Odométrie horodatée (OdometryBuffer) : prédiction et redressement des scans
+        self.odom = None
+        self.odom_idx = 0           # curseur de lecture dans self.odom
+        self.odom_last = None       # dernier échantillon consommé (t, x, y, theta)
+
         # Gestion d’obstruction (miss counters par balise)
         self.miss_max = 8
         self.miss_cnt = {k: 0 for k in self.balises.keys()}
 
+        # Recalage global (voir relocalize) : déclenché quand le filtre est perdu
+        self.table_bounds = ((0.0, 2000.0), (-1500.0, 1500.0))   # x, y (mm)
+        self.lost_sigma = 600.0         # écart-type de position au-delà duquel on est perdu (mm)
+        self.reflector_qual_min = 40
+        self._reloc_warned = False
+        self.reloc_tol = 80.0           # tolérance géométrique (mm)
+        # Triangulation par relèvements seuls (voir beacons.triangulate)
+        self.tri_min_det = 0.1          # conditionnement minimal (|D| normalisé)
+        self.check_tol = 150.0          # écart filtre / triangulation toléré (mm)
+
+        # Bordures de la table (voir walls.py) : mesures distance / angle aux murs
+        # qui complètent les balises quand l'une d'elles est masquée
+        self.use_walls = True
+        self.walls = table_walls(self.table_bounds)
+        self.sigma_wall_r = 20.0                    # mm
+        self.sigma_wall_a = np.deg2rad(1.5)         # rad
+        self.wall_rho_window = 150.0                # ±150 mm
+        self.wall_alpha_window = np.deg2rad(10.0)   # ±10°
+        self.wall_min_length = 300.0                # segment le plus court accepté (mm)
+        self.wall_segments = None                   # segments du dernier scan (affichage)
+
+        # Diagnostic de la dernière extraction (voir _extract_beacon_measurements)
+        self.diag = {}
+
+        # Buffers préalloués du filtre (predict / update sans allocation de matrices)
+        self._F = np.eye(3)
+        self._T33 = np.zeros((3, 3))
+        self._A33 = np.zeros((3, 3))
+        self._B33 = np.zeros((3, 3))
+        self._alloc_update(len(self.balises) + len(self.walls))
+
+        # Historique horodaté des états prédits par l'odométrie (buffer circulaire) :
+        # une mesure LIDAR est appliquée à l'heure de capture, puis l'odométrie rejouée
+        self.hist_capacity = 512                       # ~5 s à 100 Hz
+        self._hist_t = np.zeros(self.hist_capacity)
+        self._hist_x = np.zeros((self.hist_capacity, 3))
+        self._hist_P = np.zeros((self.hist_capacity, 3, 3))
+        self._hist_u = np.zeros((self.hist_capacity, 5))   # (dxr, dyr, dth, var_lin, var_th)
+        self._hist_n = 0
+        self._hist_fixed = -1    # dernier pas corrigé : on ne revient pas avant lui
+        self._x_save = np.zeros(3)
+        self._P_save = np.zeros((3, 3))
+
+    def _alloc_update(self, k_max: int) -> None:
+        """Buffers de l'update conjoint pour au plus k_max balises (2 mesures chacune)."""
+        self._k_max = k_max
+        self._H = np.zeros((k_max, 2, 3))      # Jacobien, un bloc 2x3 par balise
+        self._W = np.zeros((k_max, 2, 2))      # R^-1 par bloc
+        self._Rb = np.zeros((k_max, 2, 2))     # R par bloc
+        self._yk = np.zeros((k_max, 2))        # innovations
+        self._HtW = np.zeros((k_max, 3, 2))
+        self._K = np.zeros((k_max, 3, 2))      # gain, par bloc de colonnes
+        self._KR = np.zeros((k_max, 3, 2))
+        self._k33 = np.zeros((k_max, 3, 3))
+        self._dx = np.zeros(3)
+
     # -------------------------------------------------------------
     # PREDICTION (odométrie)
     # -------------------------------------------------------------
@@ -99,21 +192,19 @@ class EKFLocalizer(RPLidarC1M1):
         Deux modes:
             - (v, w, dt) : modèle unicycle (v en mm/s, w en rad/s).
             - (dx, dy, dtheta) : deltas déjà intégrés (mm, mm, rad) dans le repère monde.
+        Etat et covariance sont mis à jour sur place (aucune matrice allouée) :
+        le filtre doit pouvoir tourner au rythme de l'odométrie (100+ Hz).
         """
-        x, y, th = self.x
-
         # --- Mode 1: deltas déjà calculés dans le monde ---
         if dx is not None and dy is not None and dtheta is not None:
-            self.x = np.array([x + dx, y + dy, wrap_pi(th + dtheta)], dtype=float)
-
-            Q = np.diag(
-                [
-                    (abs(dx) * 0.2 + 5.0) ** 2,
-                    (abs(dy) * 0.2 + 5.0) ** 2,
-                    (abs(dtheta) * 0.2 + 0.01) ** 2,
-                ]
-            )
-            self.P = self.P + Q
+            self.x[0] += dx
+            self.x[1] += dy
+            self.x[2] = wrap_pi(self.x[2] + dtheta)
+
+            P = self.P
+            P[0, 0] += (abs(dx) * 0.2 + 5.0) ** 2
+            P[1, 1] += (abs(dy) * 0.2 + 5.0) ** 2
+            P[2, 2] += (abs(dtheta) * 0.2 + 0.01) ** 2
             return
 
         # --- Mode 2: commandes (v, w, dt) ---
@@ -124,162 +215,499 @@ class EKFLocalizer(RPLidarC1M1):
             dxr = v * dt
             dyr = 0.0
         else:
-            dxr = (v / w) * np.sin(w * dt)
-            dyr = (v / w) * (1.0 - np.cos(w * dt))
+            dxr = (v / w) * math.sin(w * dt)
+            dyr = (v / w) * (1.0 - math.cos(w * dt))
 
-        # Passage repère robot -> repère monde
-        c, s = np.cos(th), np.sin(th)
-        dxm = c * dxr - s * dyr
-        dym = s * dxr + c * dyr
-        th_new = wrap_pi(th + w * dt)
+        self._predict_robot(dxr, dyr, w * dt, self.sigma_v**2 * dt * dt, self.sigma_w**2 * dt * dt)
 
-        self.x = np.array([x + dxm, y + dym, th_new], dtype=float)
+    def _predict_robot(self, dxr: float, dyr: float, dth: float, var_lin: float, var_th: float) -> None:
+        """
+        Déplacement (dxr, dyr, dth) exprimé dans le repère robot, appliqué sur place.
+        var_lin : variance du déplacement le long du cap (mm²), var_th : en rotation (rad²).
+        """
+        x, y, th = self.x.tolist()
+        P = self.P
+
+        # Passage repère robot -> repère monde
+        c, s = math.cos(th), math.sin(th)
+        self.x[0] = x + c * dxr - s * dyr
+        self.x[1] = y + s * dxr + c * dyr
+        self.x[2] = wrap_pi(th + dth)
 
-        # Jacobien F wrt état
-        F = np.eye(3)
+        # Jacobien F wrt état (identité + colonne theta)
+        F = self._F
         F[0, 2] = -s * dxr - c * dyr
         F[1, 2] = c * dxr - s * dyr
 
-        # Bruit process (linéarisation simple)
-        G = np.array(
-            [
-                [c * dt, 0.0],
-                [s * dt, 0.0],
-                [0.0, dt],
-            ]
-        )
-        Qu = np.diag([self.sigma_v**2, self.sigma_w**2])
-        Q = G @ Qu @ G.T
-        self.P = F @ self.P @ F.T + Q
+        # P = F P F^T + G Q G^T, avec G = [[c, 0], [s, 0], [0, 1]]
+        np.matmul(F, P, out=self._T33)
+        np.matmul(self._T33, F.T, out=P)
+        P[0, 0] += c * c * var_lin
+        P[0, 1] += c * s * var_lin
+        P[1, 0] += c * s * var_lin
+        P[1, 1] += s * s * var_lin
+        P[2, 2] += var_th
+
+    def predict_odometry(self) -> int:
+        """
+        Prédiction avec les vrais déplacements mesurés par l'ESP32 : chaque
+        échantillon reçu dans self.odom depuis l'appel précédent donne un
+        déplacement relatif (repère robot), appliqué à la cadence de l'odométrie.
+        Seul le mouvement relatif compte : le repère de l'odométrie peut
+        dériver de celui de la table, c'est l'EKF qui recale.
+        Retourne le nombre d'échantillons consommés.
+        """
+        if self.odom is None:
+            return 0
+        samples, first, self.odom_idx = self.odom.read_since(self.odom_idx)
+        if len(samples) == 0:
+            return 0
+        brk = self.odom.last_break
+        last = self.odom_last
+        if last is None:
+            # Premier appel : on part du dernier échantillon, l'historique est déjà passé
+            first += len(samples) - 1
+            samples = samples[-1:]
+
+        for i, (t, x, y, th) in enumerate(samples.tolist()):
+            # Pas de déplacement à travers un SET POSE (odométrie réinitialisée)
+            if last is not None and first + i != brk:
+                t0, x0, y0, th0 = last
+                c, s = math.cos(th0), math.sin(th0)
+                ddx, ddy = x - x0, y - y0
+                dxr = c * ddx + s * ddy
+                dyr = -s * ddx + c * ddy
+                dth = wrap_pi(th - th0)
+                dt = max(t - t0, 0.0)
+                var_lin = (self.sigma_v * dt) ** 2 + (self.odom_k_lin * math.hypot(dxr, dyr)) ** 2
+                var_th = (self.sigma_w * dt) ** 2 + (self.odom_k_rot * dth) ** 2
+                self._predict_robot(dxr, dyr, dth, var_lin, var_th)
+                self._history_push(t, dxr, dyr, dth, var_lin, var_th)
+            last = (t, x, y, th)
+
+        self.odom_last = last
+        return len(samples)
+
+    def reset_pose(self, pose, sigmas=(400.0, 400.0, np.deg2rad(5.0))) -> None:
+        """
+        Recalage : l'état repart de pose (mm, mm, rad) avec une covariance
+        diagonale d'écarts-types sigmas. L'odométrie reprend à son prochain échantillon.
+        """
+        self.x[:] = pose
+        self.P[:] = np.diag(np.square(sigmas))
+        self.odom_last = None
+        self._hist_n = 0
+        self._hist_fixed = -1
 
     # -------------------------------------------------------------
-    # EXTRACTION mesures depuis un scan LIDAR
+    # RECALAGE GLOBAL (filtre perdu)
     # -------------------------------------------------------------
-    def _extract_beacon_measurements(self, scan: np.ndarray):
+    @property
+    def lost(self) -> bool:
+        """Covariance de position trop grande, ou plus aucune balise vue depuis longtemps."""
+        if math.sqrt(self.P[0, 0] + self.P[1, 1]) > self.lost_sigma:
+            return True
+        return all(c >= self.miss_max for c in self.miss_cnt.values())
+
+    def relocalize(self, scan: LidarScan):
         """
-        Pour chaque balise j, on prédit (r_hat, b_hat),
-        puis on cherche dans le scan un point proche de cette prédiction.
-        Retourne une liste de (key, z=[r,b], R) observées.
+        Recalage global depuis un seul scan, sans utiliser l'état courant :
+        reflets -> affectations compatibles avec le triangle des balises ->
+        pose en forme fermée (voir beacons.global_pose). En cas de succès,
+        x et P sont réensemencés et les compteurs de balises manquées remis à 0.
+        Retourne la pose (x, y, theta) ou None.
         """
-        x, y, th = self.x
-        obs = []
-        # On suppose que angle_offset est en radians (ex: pi/2)
-        angle_offset = np.radians(-90.0) 
-        
-        # D'abord convertir le scan (deg) en radians
-        raw_angles = np.radians(scan[:, 0]) 
-        # Ajouter l'offset
-        shifted_angles = raw_angles + angle_offset
-        # Ramener dans [-pi, pi]
-        angles = (shifted_angles + np.pi) % (2 * np.pi) - np.pi
-        dists = scan[:, 1]
-        qual = scan[:, 2]
-
-        # Optionnel: filtrage brut
-        valid = (dists > 40.0) & (dists < 4500.0)
-        angles = angles[valid]
-        dists = dists[valid]
-        qual = qual[valid]
-
-        for key, (bx, by) in self.balises.items():
-            # Prévision de la mesure en repère robot
-            dx = bx - x
-            dy = by - y
-            r_hat = np.hypot(dx, dy)
-            b_hat = wrap_pi(np.arctan2(dy, dx) - th)
-
-            # Fenêtre de gating
-            ang_min = wrap_pi(b_hat - self.bearing_window)
-            ang_max = wrap_pi(b_hat + self.bearing_window)
-
-            if ang_min <= ang_max:
-                ang_mask = (angles >= ang_min) & (angles <= ang_max)
-            else:
-                ang_mask = (angles >= ang_min) | (angles <= ang_max)
-
-            rng_mask = (dists >= (r_hat - self.range_window)) & (
-                dists <= (r_hat + self.range_window)
-            )
-            mask = ang_mask & rng_mask
+        if scan is None or len(scan) == 0:
+            return None
+        if not scan.has_quality:
+            # Express/dense : pas de qualité, donc pas de reflets à apparier
+            if not self._reloc_warned:
+                print("[RELOC] Impossible en mode express/dense (pas de qualité) : scan standard requis")
+                self._reloc_warned = True
+            return None
+        t0 = time.perf_counter()
+        refl = find_reflectors(scan, qual_min=self.reflector_qual_min)
+        # Les reflets les plus nets d'abord (global_pose n'en garde qu'une douzaine)
+        refl = refl[np.argsort(-refl["qual"] * refl["n"])]
+        b = refl["angle"].astype(float) + self.angle_offset
+        r = refl["range"].astype(float)
+        points = np.column_stack((r * np.cos(b), r * np.sin(b)))
+
+        beacons = np.array(list(self.balises.values()), dtype=float)
+        res = global_pose(points, beacons, tol=self.reloc_tol, bounds=self.table_bounds)
+        dt_ms = (time.perf_counter() - t0) * 1e3
+        if res is None:
+            print(f"[RELOC] Echec ({len(refl)} reflets, {dt_ms:.1f} ms)")
+            return None
+
+        pose, rms, support = res
+        sigma_xy = max(2.0 * rms, 30.0)
+
+        # Affinage par les relèvements seuls (plus précis que les distances
+        # sur des catadioptres), si les balises associées sont bien conditionnées
+        match = associate(points, beacons, pose, tol=self.reloc_tol)
+        seen = match >= 0
+        tri = best_triangulation(b[match[seen]], beacons[seen], min_det=self.tri_min_det)
+        how = "distances"
+        if tri is not None and math.hypot(tri[0][0] - pose[0], tri[0][1] - pose[1]) < self.reloc_tol:
+            pose, how = tri[0], "relèvements"
+
+        self.reset_pose(pose, sigmas=(sigma_xy, sigma_xy, np.deg2rad(3.0)))
+        self.miss_cnt = {k: 0 for k in self.balises.keys()}
+        print(f"[RELOC] x={pose[0]:.0f} y={pose[1]:.0f} th={np.degrees(pose[2]):.1f}° "
+              f"({support} balises, rms={rms:.0f} mm, {how}, {dt_ms:.1f} ms)")
+        return (float(pose[0]), float(pose[1]), float(pose[2]))
 
-            if not np.any(mask):
-                self.miss_cnt[key] = min(self.miss_cnt[key] + 1, self.miss_max)
-                continue
+    def triangulate(self, obs):
+        """
+        Pose absolue instantanée par relèvements seuls, à partir des balises
+        d'obs (liste de (key, z=[r, b], R), les bordures sont ignorées) :
+        triplet le mieux conditionné (voir beacons.best_triangulation).
+        Retourne (pose (3,), det) ou None (moins de 3 balises, ou dégénéré).
+        """
+        obs = [(key, z) for key, z, _ in obs if key in self.balises]
+        if len(obs) < 3:
+            return None
+        bearings = [z[1] for _, z in obs]
+        beacons = [self.balises[key] for key, _ in obs]
+        return best_triangulation(bearings, beacons, min_det=self.tri_min_det)
+
+    def check_pose(self, obs, stamp=None):
+        """
+        Contrôle de cohérence de l'état avec la triangulation des balises d'obs.
+        La triangulation vaut à l'heure de capture des balises (stamp) : elle est
+        comparée à l'état de cet instant, pas à l'état courant qui a avancé depuis
+        (stamp None : état courant). Retourne l'écart de position (mm), ou None si
+        la triangulation est impossible (moins de 3 balises, configuration dégénérée).
+        """
+        tri = self.triangulate(obs)
+        if tri is None:
+            return None
+        j = self._rewind(stamp) if stamp is not None else None
+        err = math.hypot(tri[0][0] - self.x[0], tri[0][1] - self.x[1])
+        if j is not None:
+            self.x[:] = self._x_save
+            self.P[:] = self._P_save
+        return err
+
+    def reset_pose_at(self, t, pose, sigmas=(400.0, 400.0, np.deg2rad(5.0))) -> None:
+        """
+        Recalage sur une pose mesurée à l'heure t (triangulation d'un scan) :
+        l'état de cet instant est remplacé puis l'odométrie reçue depuis est
+        rejouée, l'état courant reste donc à jour et l'historique est gardé.
+        """
+        j = self._rewind(t)
+        self.x[:] = pose
+        self.P[:] = np.diag(np.square(sigmas))
+        self._commit_at(j)
 
-            cand_angles = angles[mask]
-            cand_dists = dists[mask]
+    # -------------------------------------------------------------
+    # HISTORIQUE (mesures retardées)
+    # -------------------------------------------------------------
+    def _history_push(self, t, dxr, dyr, dth, var_lin, var_th) -> None:
+        """Mémorise l'état après un pas d'odométrie et le déplacement qui y a mené."""
+        i = self._hist_n % self.hist_capacity
+        self._hist_t[i] = t
+        self._hist_x[i] = self.x
+        self._hist_P[i] = self.P
+        self._hist_u[i] = (dxr, dyr, dth, var_lin, var_th)
+        self._hist_n += 1
+
+    def _rewind(self, t: float):
+        """
+        Ramène x, P à l'état du dernier pas d'odométrie antérieur à t
+        (l'état courant est sauvegardé). Retourne l'index absolu de ce pas,
+        ou None si t n'est pas dans l'historique : la mesure s'applique alors
+        à l'état courant (trop récente, ou plus vieille que tout l'historique).
+        On ne remonte pas avant la correction précédente : le rejeu ne
+        ré-applique que l'odométrie, il l'effacerait.
+        """
+        n = min(self._hist_n, self.hist_capacity)
+        if n == 0 or not np.isfinite(t):
+            return None
+        newest = (self._hist_n - 1) % self.hist_capacity
+        if t >= self._hist_t[newest]:
+            return None
+        order = np.arange(self._hist_n - n, self._hist_n) % self.hist_capacity
+        k = int(np.searchsorted(self._hist_t[order], t, side="right")) - 1
+        if k < 0:
+            return None
+        j = max(self._hist_n - n + k, self._hist_fixed)
+        if j < 0 or j >= self._hist_n - 1:
+            return None
+        self._x_save[:] = self.x
+        self._P_save[:] = self.P
+        self.x[:] = self._hist_x[j % self.hist_capacity]
+        self.P[:] = self._hist_P[j % self.hist_capacity]
+        return j
+
+    def _replay(self, j: int) -> None:
+        """Ré-applique les pas d'odométrie postérieurs au pas j et réécrit l'historique."""
+        for a in range(j + 1, self._hist_n):
+            i = a % self.hist_capacity
+            dxr, dyr, dth, var_lin, var_th = self._hist_u[i].tolist()
+            self._predict_robot(dxr, dyr, dth, var_lin, var_th)
+            self._hist_x[i] = self.x
+            self._hist_P[i] = self.P
+
+    def _commit_at(self, j) -> None:
+        """
+        L'état corrigé devient celui du pas j (retour de _rewind ; None : l'état
+        courant) et l'odométrie postérieure est rejouée par-dessus.
+        """
+        if j is not None:
+            self._hist_x[j % self.hist_capacity] = self.x
+            self._hist_P[j % self.hist_capacity] = self.P
+            self._hist_fixed = j
+            self._replay(j)
+        else:
+            self._hist_fixed = self._hist_n - 1
 
-            dr = cand_dists - r_hat
-            db = np.array([wrap_pi(a - b_hat) for a in cand_angles])
-            score = (np.abs(dr) / self.sigma_r) + (np.abs(db) / self.sigma_b)
-            i = np.argmin(score)
+    def _correct_at(self, scan: LidarScan, keys=None):
+        """
+        Correction LIDAR à l'heure de capture du scan (scan.stamp) : retour
+        à l'état de cet instant, extraction + update, puis rejeu de
+        l'odométrie reçue depuis. Le pipeline LIDAR peut ainsi prendre du
+        retard sans fausser la correction.
+        Retourne la liste des mesures utilisées (balises puis bordures).
+        """
+        j = self._rewind(scan.stamp)
+        obs, self.diag = self._extract_beacon_measurements(scan, keys=keys)
+        if self.use_walls:
+            obs += self._extract_wall_measurements(scan)
+        if obs:
+            self._update_with_measurements(obs)
+            self._commit_at(j)
+        elif j is not None:
+            self.x[:] = self._x_save
+            self.P[:] = self._P_save
+        return obs
 
-            z = np.array(
-                [
-                    cand_dists[i],
-                    wrap_pi(cand_angles[i]),
-                ]
-            )
+    # -------------------------------------------------------------
+    # REDRESSEMENT du scan (mouvement pendant le tour)
+    # -------------------------------------------------------------
+    def deskew(self, scan: LidarScan, t_ref: float | None = None) -> LidarScan:
+        """
+        Re-projette chaque point du scan à un même instant t_ref (par défaut
+        l'heure du dernier point) grâce à l'odométrie horodatée self.odom.
+        Seul le mouvement relatif du robot entre t_i et t_ref est utilisé,
+        le repère de l'odométrie n'a donc pas besoin d'être celui de la table.
+        Sans odométrie, le scan est rendu tel quel ; sinon un nouveau LidarScan
+        (le tour publié est partagé, on ne le modifie pas).
+        """
+        if self.odom is None or len(scan) == 0:
+            return scan
+        t = scan.times
+        if t_ref is None:
+            t_ref = float(np.nanmax(t))
+        poses = self.odom.pose_at(np.append(t, t_ref))
+        if poses is None or not np.all(np.isfinite(t)):
+            return scan
+
+        x_i, y_i, th_i = poses[:-1, 0], poses[:-1, 1], poses[:-1, 2]
+        x_r, y_r, th_r = poses[-1]
+
+        # Pose du robot à t_i exprimée dans le repère robot à t_ref
+        c, s = np.cos(th_r), np.sin(th_r)
+        ddx, ddy = x_i - x_r, y_i - y_r
+        tx = c * ddx + s * ddy
+        ty = -s * ddx + c * ddy
+        dth = th_i - th_r
+
+        # Point (repère robot à t_i) -> repère robot à t_ref
+        b = scan.angles + self.angle_offset
+        r = scan.dists
+        px = tx + r * np.cos(b + dth)
+        py = ty + r * np.sin(b + dth)
+
+        angles = (np.arctan2(py, px) - self.angle_offset) % (2 * np.pi)
+        out = LidarScan.from_columns(angles, np.hypot(px, py), scan.quals, np.full(len(scan), t_ref),
+                                     has_quality=scan.has_quality)
+        out.seq = scan.seq
+        return out
 
-            self.miss_cnt[key] = max(self.miss_cnt[key] - 1, 0)
+    # -------------------------------------------------------------
+    # EXTRACTION mesures depuis un scan LIDAR
+    # -------------------------------------------------------------
+    def _extract_beacon_measurements(self, scan: LidarScan, keys=None):
+        """
+        Pour toutes les balises d'un coup : prédiction (r_hat, b_hat), fenêtres
+        de gating et score des candidats calculés en un seul broadcast NumPy
+        (K balises x M points des fenêtres angulaires), puis meilleur point par balise.
+        keys: restreint la recherche à certaines balises (secteur partiel).
+        Retourne (obs, diag) :
+            obs  : liste de (key, z=[r,b], R) observées
+            diag : {key: {"r_hat", "b_hat", "n_gate", "score", "seen"}}, à afficher
+                   par l'appelant si besoin (rien n'est imprimé ici).
+        """
+        names = [k for k in self.balises if keys is None or k in keys]
+        obs, diag = [], {}
+        if not names:
+            return obs, diag
 
-            miss_factor = 1.0 + 0.25 * self.miss_cnt[key]
-            R = np.diag(
-                [
-                    (self.sigma_r * miss_factor) ** 2,
-                    (self.sigma_b * miss_factor) ** 2,
-                ]
+        # Prévision des mesures en repère robot, toutes balises
+        x, y, th = self.x
+        B = np.array([self.balises[k] for k in names], dtype=float)
+        dx = B[:, 0] - x
+        dy = B[:, 1] - y
+        r_hat = np.hypot(dx, dy)
+        b_hat = wrap_pi(np.arctan2(dy, dx) - th)
+        a_hat = b_hat - self.angle_offset      # angle brut LIDAR attendu
+
+        # Candidats : union des fenêtres angulaires (index du scan)
+        idx = np.concatenate([scan.window(a, self.bearing_window) for a in a_hat])
+        k = len(names)
+        n_gate = np.zeros(k, dtype=int)
+        best_score = np.full(k, np.inf)
+        best_r = np.zeros(k)
+        best_db = np.zeros(k)
+
+        if idx.size:
+            dists = scan.dists[idx].astype(float)
+            # (K, M) : écarts à la prédiction de chaque balise
+            db = wrap_pi(scan.angles[idx][None, :] - a_hat[:, None])
+            dr = dists[None, :] - r_hat[:, None]
+            gate = (
+                (np.abs(db) <= self.bearing_window)
+                & (np.abs(dr) <= self.range_window)
+                & ((dists > 40.0) & (dists < 4500.0))[None, :]
             )
+            score = np.abs(dr) / self.sigma_r + np.abs(db) / self.sigma_b
+            score[~gate] = np.inf
+
+            rows = np.arange(k)
+            i = np.argmin(score, axis=1)
+            n_gate = np.count_nonzero(gate, axis=1)
+            best_score = score[rows, i]
+            best_r = dists[i]
+            best_db = db[rows, i]
+
+        seen = np.isfinite(best_score)
+        b_meas = wrap_pi(b_hat + best_db)
+
+        for j, key in enumerate(names):
+            if seen[j]:
+                self.miss_cnt[key] = max(self.miss_cnt[key] - 1, 0)
+                miss_factor = 1.0 + 0.25 * self.miss_cnt[key]
+                R = np.diag(
+                    [
+                        (self.sigma_r * miss_factor) ** 2,
+                        (self.sigma_b * miss_factor) ** 2,
+                    ]
+                )
+                obs.append((key, np.array([best_r[j], b_meas[j]]), R))
+            else:
+                self.miss_cnt[key] = min(self.miss_cnt[key] + 1, self.miss_max)
 
-            print(f"[DEBUG] Balise {key} : "f"r_hat={r_hat:.1f}  b_hat={b_hat*180/np.pi:.1f}°")
-            print("   points trouvés dans fenêtre ?", np.sum(mask))
+            diag[key] = {
+                "r_hat": float(r_hat[j]),
+                "b_hat": float(b_hat[j]),
+                "n_gate": int(n_gate[j]),
+                "score": float(best_score[j]),
+                "seen": bool(seen[j]),
+            }
 
-            obs.append((key, z, R))
+        return obs, diag
 
-        return obs
+    def _extract_wall_measurements(self, scan: LidarScan):
+        """
+        Segments du scan (split-and-merge, voir walls.find_segments) appariés
+        aux bordures de la table autour de la pose courante.
+        Retourne une liste de (nom, z=[rho, alpha], R), comme les balises.
+        """
+        self.wall_segments = find_segments(scan)
+        matches = match_walls(
+            self.wall_segments, self.walls, self.x, self.angle_offset,
+            rho_window=self.wall_rho_window, alpha_window=self.wall_alpha_window,
+            min_length=self.wall_min_length,
+        )
+        R = np.diag([self.sigma_wall_r**2, self.sigma_wall_a**2])
+        return [(name, np.array([rho, alpha]), R) for name, rho, alpha in matches]
 
     # -------------------------------------------------------------
     # UPDATE EKF avec les balises visibles
     # -------------------------------------------------------------
     def _update_with_measurements(self, obs):
         """
-        obs: liste de tuples (key, z=[r,b], R), où r en mm, b en rad.
-        Applique séquentiellement des updates EKF.
-        """
-        for key, z, R in obs:
-            bx, by = self.balises[key]
-            x, y, th = self.x
-
-            dx = bx - x
-            dy = by - y
-            q = dx * dx + dy * dy
-            r_hat = np.sqrt(q)
-            b_hat = wrap_pi(np.arctan2(dy, dx) - th)
-
-            z_hat = np.array([r_hat, b_hat])
-            yk = np.array(
-                [
-                    z[0] - z_hat[0],
-                    wrap_pi(z[1] - z_hat[1]),
-                ]
-            )
-
-            # Jacobien H wrt [x, y, theta]
-            H = np.array(
-                [
-                    [-dx / r_hat, -dy / r_hat, 0.0],
-                    [dy / q, -dx / q, -1.0],
-                ]
-            )
-
-            S = H @ self.P @ H.T + R
-            K = self.P @ H.T @ np.linalg.inv(S)
-
-            self.x = self.x + K @ yk
-            self.x[2] = wrap_pi(self.x[2])
-
-            I = np.eye(3)
-            self.P = (I - K @ H) @ self.P
+        obs: liste de tuples (key, z=[r,b], R), où r en mm, b en rad
+             (key dans self.walls : z=[rho, alpha] d'une bordure).
+        Update EKF conjoint : toutes les mesures empilées dans un seul vecteur
+        de mesure, R bloc-diagonale (un bloc 2x2 par balise).
+
+        Le gain est calculé sous forme information, qui n'inverse que des 2x2
+        (blocs de R) et des 3x3 (état), en forme fermée :
+            P+ = (P^-1 + sum H_i^T R_i^-1 H_i)^-1,   K = P+ H^T R^-1
+        puis la covariance est mise à jour sous forme de Joseph
+            P = (I - K H) P (I - K H)^T + K R K^T
+        qui reste symétrique définie positive malgré les arrondis.
+        """
+        k = len(obs)
+        if k == 0:
+            return
+        if k > self._k_max:
+            self._alloc_update(k)
+
+        H, W, Rb, yk = self._H[:k], self._W[:k], self._Rb[:k], self._yk[:k]
+        x, y, th = self.x.tolist()
+
+        # Empilement des mesures (linéarisation au même point pour toutes)
+        for j, (key, z, R) in enumerate(obs):
+            if key in self.walls:
+                # Bordure n . p = c : distance signée du robot, normale vers la bordure
+                a, c = self.walls[key]
+                ca, sa = math.cos(a), math.sin(a)
+                d = c - ca * x - sa * y
+                sg = 1.0 if d >= 0.0 else -1.0
+                yk[j, 0] = z[0] - sg * d
+                yk[j, 1] = wrap_pi(z[1] - (a - th if sg > 0.0 else a + math.pi - th))
+                H[j] = ((-sg * ca, -sg * sa, 0.0), (0.0, 0.0, -1.0))
+            else:
+                bx, by = self.balises[key]
+                dx = bx - x
+                dy = by - y
+                q = dx * dx + dy * dy
+                r_hat = math.sqrt(q)
+                b_hat = math.atan2(dy, dx) - th
+
+                yk[j, 0] = z[0] - r_hat
+                yk[j, 1] = wrap_pi(z[1] - b_hat)
+
+                # Jacobien H wrt [x, y, theta]
+                H[j] = ((-dx / r_hat, -dy / r_hat, 0.0), (dy / q, -dx / q, -1.0))
+
+            # R^-1 du bloc 2x2 en forme fermée
+            Rb[j] = R
+            r00, r01, r10, r11 = Rb[j].ravel().tolist()
+            d = 1.0 / (r00 * r11 - r01 * r10)
+            W[j] = ((r11 * d, -r01 * d), (-r10 * d, r00 * d))
+
+        HtW, Kb, KR, k33 = self._HtW[:k], self._K[:k], self._KR[:k], self._k33[:k]
+        A, B, T = self._A33, self._B33, self._T33
+
+        # Information : P^-1 + sum H_i^T W_i H_i
+        np.matmul(H.transpose(0, 2, 1), W, out=HtW)
+        np.matmul(HtW, H, out=k33)
+        inv3(self.P, A)
+        A += k33.sum(axis=0)
+        inv3(A, B)                      # B = P+
+
+        # Gain par blocs K_i = P+ H_i^T W_i, correction dx = sum K_i y_i
+        np.matmul(B, HtW, out=Kb)
+        np.einsum("kij,kj->i", Kb, yk, out=self._dx)
+        self.x += self._dx
+        self.x[2] = wrap_pi(self.x[2])
+
+        # Joseph : A = I - sum K_i H_i
+        np.matmul(Kb, H, out=k33)
+        np.negative(k33.sum(axis=0), out=A)
+        A[0, 0] += 1.0
+        A[1, 1] += 1.0
+        A[2, 2] += 1.0
+        np.matmul(A, self.P, out=T)
+        np.matmul(T, A.T, out=B)
+        np.matmul(Kb, Rb, out=KR)
+        np.matmul(KR, Kb.transpose(0, 2, 1), out=k33)
+        np.add(B, k33.sum(axis=0), out=self.P)
 
     # -------------------------------------------------------------
     # PIPELINE COMPLET PAR PAS
@@ -303,12 +731,14 @@ class EKFLocalizer(RPLidarC1M1):
         self.predict(dt, v=v, w=w, dx=dx, dy=dy, dtheta=dtheta)
 
         # 2) SCAN + extractions
-        scan = self.get_scan(min_dist=40, max_dist=6000)
-        obs = self._extract_beacon_measurements(scan)
+        scan = self.read_scan(min_dist=40, max_dist=6000)
+        if scan is not None:
+            scan = self.deskew(scan)
+            if self.lost:
+                self.relocalize(scan)
 
-        # 3) UPDATE si on a au moins une balise
-        if len(obs) > 0:
-            self._update_with_measurements(obs)
+        # 3) UPDATE (à l'heure du scan) si on a au moins une balise
+        obs = self._correct_at(scan) if scan is not None else []
 
         # 4) Résumé
         pose = (float(self.x[0]), float(self.x[1]), float(self.x[2]))
@@ -326,23 +756,70 @@ class EKFLocalizer(RPLidarC1M1):
             obs (liste des mesures utilisées)
         """
 
-        # 1) Lire un seul scan
-        scan = self.get_scan(min_dist=40, max_dist=6000)
+        # 1) Lire un seul scan (le plus récent si l'acquisition continue tourne)
+        scan = self.read_scan(min_dist=40, max_dist=6000)
+        if scan is None:
+            print("[LOCATE] Aucun scan LIDAR reçu.")
+            return None, 0, None
+        scan = self.deskew(scan)
+
+        # 2) Filtre perdu (choc, mauvais set_pos) : recalage global d'abord
+        if self.lost:
+            self.relocalize(scan)
 
-        # 2) Extraire les mesures valides
-        obs = self._extract_beacon_measurements(scan)
-        nb = len(obs)
+        # 3) Extraire les mesures valides et effectuer un update EKF
+        #    uniquement basé sur ce scan (à son heure de capture)
+        #    (les bordures seules ne suffisent pas : elles ne lèvent pas les symétries)
+        obs = self._correct_at(scan)
+        nb = sum(1 for key, _, _ in obs if key in self.balises)
+
+        # 4) Rien autour de la pose prédite : on retente sans a priori
+        if nb == 0 and self.relocalize(scan) is not None:
+            obs = self._correct_at(scan)
+            nb = sum(1 for key, _, _ in obs if key in self.balises)
 
         if nb == 0:
             print("[LOCATE] Aucune balise détectée -> impossible de se localiser.")
             return None, 0, None
 
-        # 3) Effectuer un update EKF uniquement basé sur ce scan
-        self._update_with_measurements(obs)
+        # 5) Contrôle : la triangulation des mêmes balises doit tomber près du filtre
+        #    à l'heure du scan, sinon on repart d'elle à cette heure-là (et on
+        #    rejoue l'odométrie reçue depuis)
+        err = self.check_pose(obs, stamp=scan.stamp)
+        if err is not None and err > self.check_tol:
+            print(f"[LOCATE] Filtre incohérent avec la triangulation ({err:.0f} mm) -> réinitialisé")
+            self.reset_pose_at(scan.stamp, self.triangulate(obs)[0], sigmas=(50.0, 50.0, np.deg2rad(3.0)))
 
-        # 4) Retourner la pose courante
+        # 6) Retourner la pose courante
         return (float(self.x[0]), float(self.x[1]), float(self.x[2])), nb, obs
     
+    def beacons_in_sector(self, start_deg: float, end_deg: float):
+        """Balises dont l'angle LIDAR prédit (deg) tombe dans [start_deg, end_deg[."""
+        x, y, th = self.x
+        keys = []
+        for key, (bx, by) in self.balises.items():
+            b_hat = np.arctan2(by - y, bx - x) - th
+            a_deg = np.degrees(b_hat - self.angle_offset) % 360.0
+            if start_deg <= a_deg < end_deg:
+                keys.append(key)
+        return keys
+
+    def update_sector(self, start_deg: float, end_deg: float, points: np.ndarray, stamp=None):
+        """
+        Correction EKF dès qu'un secteur angulaire du tour est décodé
+        (voir RPLidarC1M1.iter_sectors), sans attendre la fin des 360°.
+        Seules les balises attendues dans ce secteur sont cherchées, pour ne pas
+        compter comme manquées celles qui sont ailleurs dans le tour ; les
+        bordures vues dans le secteur sont utilisées aussi.
+        La correction est appliquée à l'heure de capture du secteur.
+        Retourne la liste des mesures utilisées.
+        """
+        keys = self.beacons_in_sector(start_deg, end_deg)
+        if (not keys and not self.use_walls) or len(points) == 0:
+            return []
+        points = self.deskew(points)
+        return self._correct_at(points, keys=keys)
+
     def close(self):
         """Ferme la connexion au LIDAR proprement."""
         super().close()
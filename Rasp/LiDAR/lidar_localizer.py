@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import numpy as np
-from sklearn.cluster import DBSCAN # type: ignore
 from rplidar_c1m1 import RPLidarC1M1
+from beacons import find_reflectors, global_pose, associate, best_triangulation
 
 class LidarLocalizer(RPLidarC1M1):
     """
@@ -24,28 +24,26 @@ class LidarLocalizer(RPLidarC1M1):
     # ---------------------------
     @staticmethod
     def detect_reflective_points(scan, qual_min=40):
-        mask = scan[:, 2] > qual_min
-        angles = np.radians(scan[mask, 0])
-        dists = scan[mask, 1]
-        x = dists * np.cos(angles)
-        y = dists * np.sin(angles)
-        return np.column_stack((x, y))
+        if not scan.has_quality:
+            raise ValueError("scan sans qualité (mode express/dense) : reflets indétectables")
+        mask = scan.quals > qual_min
+        # x/y sont calculés une seule fois par tour et partagés (voir LidarScan)
+        return np.column_stack((scan.x[mask], scan.y[mask]))
 
     # ---------------------------
     # Étape 2 : clustering des reflets
     # ---------------------------
     @staticmethod
-    def cluster_points(points, eps=100, min_samples=5):
-        if len(points) == 0:
-            return []
-        labels = DBSCAN(eps=eps, min_samples=min_samples).fit(points).labels_
-        clusters = []
-        for label in set(labels):
-            if label == -1:
-                continue
-            cluster = points[labels == label]
-            clusters.append(np.mean(cluster, axis=0))
-        return clusters
+    def cluster_points(scan, qual_min=40, eps=100, min_samples=5):
+        """
+        Reflets du scan en un seul passage sur les points triés par angle
+        (voir beacons.find_reflectors) : coupure dès que deux voisins sont à
+        plus de eps (mm), centroïdes pondérés par la qualité.
+        Retourne un tableau (M, 2) de centroïdes (repère LIDAR, mm), les plus nets d'abord.
+        """
+        refl = find_reflectors(scan, qual_min=qual_min, gap=eps, min_points=min_samples)
+        refl = refl[np.argsort(-refl["qual"] * refl["n"])]
+        return np.column_stack((refl["x"], refl["y"])).astype(float)
 
     # ---------------------------
     # Étape 3 : trilatération géométrique
@@ -65,19 +63,39 @@ class LidarLocalizer(RPLidarC1M1):
     # ---------------------------
     # Étape 4 : localisation complète
     # ---------------------------
-    def locate_robot(self, qual_min=40, eps=100, min_samples=5):
+    def locate_robot(self, qual_min=40, eps=100, min_samples=5, tol=80.0):
         scan = self.get_scan()
+        if scan is None:
+            print("[WARN] Aucun scan LIDAR reçu.")
+            return None
         points = self.detect_reflective_points(scan, qual_min)
-        clusters = self.cluster_points(points, eps, min_samples)
+        clusters = self.cluster_points(scan, qual_min, eps, min_samples)
 
         if len(clusters) < 3:
             print("[WARN] Moins de 3 balises visibles.")
             return None
 
-        # distances lidar→balises détectées
-        distances = [np.linalg.norm(c) for c in clusters[:4]]
-        beacons = list(self.balises.values())[:len(distances)]
-        pos = self.trilateration(beacons, distances)
+        # Association reflets -> balises : pose compatible avec la géométrie
+        # des balises, puis reflet le plus proche de chaque balise prédite
+        beacons = np.array(list(self.balises.values()), dtype=float)
+        res = global_pose(clusters, beacons, tol=tol)
+        if res is None:
+            print("[WARN] Aucune association reflets -> balises cohérente.")
+            return None
+        match = associate(clusters, beacons, res[0], tol=tol)
+        seen = match >= 0
+        if np.count_nonzero(seen) < 3:
+            print("[WARN] Moins de 3 balises associées.")
+            return None
+
+        # Relèvements seuls (triangulation en forme fermée), plus précis que
+        # les distances ; trilatération si la configuration est dégénérée
+        c = clusters[match[seen]]
+        tri = best_triangulation(np.arctan2(c[:, 1], c[:, 0]), beacons[seen])
+        if tri is not None:
+            pos = tri[0][:2]
+        else:
+            pos = self.trilateration(beacons[seen], np.hypot(c[:, 0], c[:, 1]))
         print(f"[POS] Robot estimé à (x={pos[0]:.1f}, y={pos[1]:.1f}) mm")
         return pos, clusters, points
 
@@ -89,11 +107,9 @@ class LidarLocalizer(RPLidarC1M1):
         import matplotlib.pyplot as plt
         plt.figure(figsize=(6, 4))
         # nuage brut
-        plt.scatter(scan[:,1]*np.cos(np.radians(scan[:,0])),
-                    scan[:,1]*np.sin(np.radians(scan[:,0])),
-                    s=2, c='gray', label='Points LIDAR')
+        plt.scatter(scan.x, scan.y, s=2, c='gray', label='Points LIDAR')
         # clusters détectés
-        if clusters:
+        if len(clusters):
             plt.scatter(*zip(*clusters), c='red', s=50, label='Balises détectées')
         # balises connues
         plt.scatter(*zip(*balises.values()), c='green', s=80, label='Balises connues')
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import numpy as np
+
+
+class LidarScan:
+    """
+    Tour (ou secteur) LIDAR compact, rempli sur place dans des tableaux préalloués.
+
+    Colonnes (vues de longueur len(scan)) :
+        angles : float32, rad, angle brut du LIDAR dans [0, 2pi[
+        dists  : float32, mm
+        quals  : uint8, qualité 0..63
+        times  : float64, time.monotonic() de réception de chaque point
+    stamp : heure du dernier point (s), seq : numéro de tour publié.
+    has_quality : False pour les modes express/dense, qui ne transmettent
+    pas de qualité (quals vaut alors 0 partout).
+
+    Les colonnes dérivées (cos, sin, x, y, relèvements décalés) sont calculées
+    au premier accès puis gardées en cache jusqu'au prochain remplissage :
+    tous les consommateurs (EKF, localisation, affichage) les partagent.
+
+    Index angulaire : les points sont rangés par paquets de bin_deg degrés
+    (ordre trié + offset de début de chaque paquet). between()/window()
+    renvoient les points d'une plage d'angles en ne parcourant que cette plage.
+    """
+
+    def __init__(self, capacity=4096, bin_deg=0.5):
+        self.n = 0
+        self.stamp = 0.0
+        self.seq = 0
+        self.has_quality = True
+        self.n_bins = int(round(360.0 / bin_deg))
+        self.bin_rad = 2 * np.pi / self.n_bins
+        self._bin_start = np.zeros(self.n_bins + 1, dtype=np.intp)
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self._angle = np.zeros(capacity, dtype=np.float32)
+        self._dist = np.zeros(capacity, dtype=np.float32)
+        self._qual = np.zeros(capacity, dtype=np.uint8)
+        self._t = np.zeros(capacity, dtype=np.float64)
+        self._cos = np.zeros(capacity, dtype=np.float32)
+        self._sin = np.zeros(capacity, dtype=np.float32)
+        self._x = np.zeros(capacity, dtype=np.float32)
+        self._y = np.zeros(capacity, dtype=np.float32)
+        self._bearing = np.zeros(capacity, dtype=np.float32)
+        self._order = np.zeros(capacity, dtype=np.intp)
+        self._bin = np.zeros(capacity, dtype=np.intp)
+        self._cache = set()
+        self._bearing_offset = None
+
+    def __len__(self):
+        return self.n
+
+    # ---------------------
+    # Remplissage
+    # ---------------------
+
+    def reset(self):
+        """Vide le tour sans rien désallouer."""
+        self.n = 0
+        self.stamp = 0.0
+        self._invalidate()
+
+    def _invalidate(self):
+        self._cache.clear()
+        self._bearing_offset = None
+
+    def _reserve(self, extra):
+        if self.n + extra <= self.capacity:
+            return
+        # Rare : tour plus dense que prévu, on agrandit une fois pour toutes
+        old = (self.angles.copy(), self.dists.copy(), self.quals.copy(), self.times.copy())
+        self._alloc(max(2 * self.capacity, self.n + extra))
+        self._angle[:self.n], self._dist[:self.n], self._qual[:self.n], self._t[:self.n] = old
+
+    def extend(self, angle_deg, dist, qual, t, min_dist=0.0, max_dist=np.inf):
+        """Ajoute des points (angle en degrés) en gardant min_dist < dist < max_dist."""
+        keep = (dist > min_dist) & (dist < max_dist)
+        k = int(np.count_nonzero(keep))
+        if k == 0:
+            return
+        self._reserve(k)
+        i, j = self.n, self.n + k
+        np.radians(angle_deg[keep], out=self._angle[i:j], casting="same_kind")
+        self._dist[i:j] = dist[keep]
+        self._qual[i:j] = qual[keep]
+        self._t[i:j] = t[keep]
+        self.n = j
+        self.stamp = float(self._t[j - 1])
+        self._invalidate()
+
+    def extend_rows(self, rows, min_dist=0.0, max_dist=np.inf):
+        """Ajoute les lignes d'un lot décodé (angle deg, dist, qual, t, ...)."""
+        self.extend(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], min_dist, max_dist)
+
+    @classmethod
+    def from_columns(cls, angle_rad, dist, qual, t, stamp=None, has_quality=True):
+        scan = cls(max(len(dist), 1))
+        scan.has_quality = has_quality
+        n = len(dist)
+        scan._angle[:n] = angle_rad
+        scan._dist[:n] = dist
+        scan._qual[:n] = qual
+        scan._t[:n] = t
+        scan.n = n
+        if stamp is None:
+            stamp = float(t[n - 1]) if n else 0.0
+        scan.stamp = stamp
+        return scan
+
+    def subset(self, mask):
+        """Nouveau LidarScan ne contenant que les points sélectionnés (masque ou indices)."""
+        out = LidarScan.from_columns(
+            self.angles[mask], self.dists[mask], self.quals[mask], self.times[mask], self.stamp,
+            self.has_quality,
+        )
+        out.seq = self.seq
+        return out
+
+    def copy(self):
+        return self.subset(slice(None))
+
+    # ---------------------
+    # Colonnes
+    # ---------------------
+
+    @property
+    def angles(self):
+        return self._angle[:self.n]
+
+    @property
+    def dists(self):
+        return self._dist[:self.n]
+
+    @property
+    def quals(self):
+        return self._qual[:self.n]
+
+    @property
+    def times(self):
+        return self._t[:self.n]
+
+    @property
+    def cos(self):
+        if "cos" not in self._cache:
+            np.cos(self.angles, out=self._cos[:self.n])
+            self._cache.add("cos")
+        return self._cos[:self.n]
+
+    @property
+    def sin(self):
+        if "sin" not in self._cache:
+            np.sin(self.angles, out=self._sin[:self.n])
+            self._cache.add("sin")
+        return self._sin[:self.n]
+
+    @property
+    def x(self):
+        """Abscisse (mm) dans le repère du LIDAR (angle 0 = axe x)."""
+        if "x" not in self._cache:
+            np.multiply(self.dists, self.cos, out=self._x[:self.n])
+            self._cache.add("x")
+        return self._x[:self.n]
+
+    @property
+    def y(self):
+        """Ordonnée (mm) dans le repère du LIDAR."""
+        if "y" not in self._cache:
+            np.multiply(self.dists, self.sin, out=self._y[:self.n])
+            self._cache.add("y")
+        return self._y[:self.n]
+
+    def bearings(self, offset):
+        """Angles décalés de offset (rad) et ramenés dans [-pi, pi[, en cache."""
+        if self._bearing_offset != offset:
+            b = self._bearing[:self.n]
+            np.add(self.angles, np.float32(offset + np.pi), out=b)
+            np.mod(b, np.float32(2 * np.pi), out=b)
+            b -= np.float32(np.pi)
+            self._bearing_offset = offset
+        return self._bearing[:self.n]
+
+    # ---------------------
+    # Index angulaire
+    # ---------------------
+
+    def _index(self):
+        """Construit (une fois par tour) l'ordre trié par paquet et les offsets de début."""
+        if "index" in self._cache:
+            return
+        n = self.n
+        b = self._bin[:n]
+        np.floor_divide(self.angles, np.float32(self.bin_rad), out=b, casting="unsafe")
+        np.clip(b, 0, self.n_bins - 1, out=b)
+        # Tri par paquet (stable : l'ordre d'arrivée est déjà croissant dans un paquet)
+        self._order[:n] = np.argsort(b, kind="stable")
+        self._bin_start[0] = 0
+        np.cumsum(np.bincount(b, minlength=self.n_bins), out=self._bin_start[1:])
+        self._cache.add("index")
+
+    def _bins(self, lo, hi):
+        """Indices des points des paquets lo..hi-1 (0 <= lo <= hi <= n_bins)."""
+        return self._order[self._bin_start[lo]:self._bin_start[hi]]
+
+    def between(self, start, end):
+        """
+        Indices (dans les colonnes) des points d'angle brut dans [start, end[ (rad).
+        La plage peut chevaucher 0 (start > end après modulo, ou end - start >= 2pi).
+        Coût proportionnel au nombre de points de la plage, pas à la taille du tour.
+        """
+        if self.n == 0:
+            return self._order[:0]
+        self._index()
+        if end - start >= 2 * np.pi:
+            return self._bins(0, self.n_bins)
+        two_pi = 2 * np.pi
+        start %= two_pi
+        end %= two_pi
+        lo = int(start // self.bin_rad)
+        hi = min(int(np.ceil(end / self.bin_rad)), self.n_bins)
+        if start <= end:
+            idx = self._bins(lo, hi)
+        else:
+            idx = np.concatenate((self._bins(lo, self.n_bins), self._bins(0, hi)))
+
+        # Paquets de bord : on retire les points hors de la plage exacte
+        a = self.angles[idx]
+        if start <= end:
+            keep = (a >= start) & (a < end)
+        else:
+            keep = (a >= start) | (a < end)
+        return idx[keep]
+
+    def window(self, center, half_width):
+        """Indices des points d'angle brut dans center ± half_width (rad)."""
+        return self.between(center - half_width, center + half_width)
+
+    def as_array(self):
+        """Ancien format (N, 4) float64 : angle (deg), distance, qualité, t."""
+        return np.column_stack((np.degrees(self.angles.astype(float)), self.dists, self.quals, self.times))
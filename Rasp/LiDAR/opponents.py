@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Adversaires : détection dans un tour LIDAR et suivi multi-cibles.
+
+- obstacle_points : points du tour passés dans le repère table, privés de
+  tout ce qui est connu (hors table, bande des bordures, balises, ou toute
+  la carte statique apprise si elle est fournie, cf. static_map.py).
+- cluster_obstacles : regroupement linéaire des points restants (ordre
+  angulaire), comme beacons.find_reflectors.
+- OpponentTracker : pistes de Kalman à vitesse constante (x, y, vx, vy),
+  toutes prédites et associées d'un bloc (tableaux (T, 4) et (T, 4, 4)).
+"""
+import itertools
+import numpy as np
+from lidar_scan import LidarScan
+
+
+# Un obstacle : centroïde (repère table, mm), nombre de points, étendue (mm)
+OBSTACLE_DTYPE = np.dtype([
+    ("x", np.float64), ("y", np.float64),
+    ("n", np.int32), ("size", np.float32),
+])
+
+
+def obstacle_points(scan: LidarScan, pose, angle_offset, bounds, beacons=(),
+                    border_margin=60.0, beacon_radius=120.0, max_dist=3600.0,
+                    static_map=None):
+    """
+    Points du scan (ordre angulaire) dans le repère table depuis pose
+    (x, y, theta), sans ceux qui tombent hors de la table ou à moins de
+    border_margin (mm) d'une bordure, ni à moins de beacon_radius d'une balise.
+    Avec static_map (StaticMap), ce tri est remplacé par la carte apprise :
+    seuls restent les points sur une cellule libre de la table.
+    Retourne un tableau (M, 2).
+    """
+    if len(scan) == 0:
+        return np.zeros((0, 2))
+    idx = scan.between(0.0, 2 * np.pi)
+    idx = idx[scan.dists[idx] < max_dist]
+    x, y, th = pose
+    b = scan.angles[idx].astype(float) + (angle_offset + th)
+    r = scan.dists[idx].astype(float)
+    px = x + r * np.cos(b)
+    py = y + r * np.sin(b)
+
+    if static_map is not None:
+        keep = static_map.dynamic_mask(px, py)
+        return np.column_stack((px[keep], py[keep]))
+
+    (xmin, xmax), (ymin, ymax) = bounds
+    keep = (
+        (px > xmin + border_margin) & (px < xmax - border_margin)
+        & (py > ymin + border_margin) & (py < ymax - border_margin)
+    )
+    for bx, by in beacons:
+        keep &= (px - bx) ** 2 + (py - by) ** 2 > beacon_radius ** 2
+    return np.column_stack((px[keep], py[keep]))
+
+
+def cluster_obstacles(points, gap=80.0, min_points=3, max_size=600.0):
+    """
+    Regroupe les points consécutifs (ordre angulaire) à moins de gap (mm)
+    l'un de l'autre. Les groupes de moins de min_points points (bruit) ou
+    plus larges que max_size (mm) (restes de bordure) sont écartés.
+    Retourne un tableau structuré OBSTACLE_DTYPE.
+    """
+    if len(points) < min_points:
+        return np.zeros(0, dtype=OBSTACLE_DTYPE)
+    x, y = points[:, 0], points[:, 1]
+
+    new = np.empty(len(points), dtype=bool)
+    new[0] = True
+    np.greater(np.hypot(np.diff(x), np.diff(y)), gap, out=new[1:])
+    label = np.cumsum(new) - 1
+    # Le groupe qui chevauche 0° est coupé en deux : on recolle
+    if label[-1] > 0 and np.hypot(x[0] - x[-1], y[0] - y[-1]) <= gap:
+        label[label == label[-1]] = 0
+    n_lab = int(label.max()) + 1
+
+    n = np.bincount(label, minlength=n_lab)
+    cx = np.bincount(label, weights=x, minlength=n_lab) / np.maximum(n, 1)
+    cy = np.bincount(label, weights=y, minlength=n_lab) / np.maximum(n, 1)
+    size = np.zeros(n_lab)
+    np.maximum.at(size, label, np.hypot(x - cx[label], y - cy[label]))
+    size *= 2.0
+
+    keep = (n >= min_points) & (size <= max_size)
+    out = np.zeros(int(np.count_nonzero(keep)), dtype=OBSTACLE_DTYPE)
+    out["x"], out["y"] = cx[keep], cy[keep]
+    out["n"], out["size"] = n[keep], size[keep]
+    return out
+
+
+class OpponentTracker:
+    """
+    Suivi multi-cibles des obstacles mobiles (adversaires), repère table.
+
+    Chaque piste est un filtre de Kalman linéaire à vitesse constante,
+    état (x, y, vx, vy) en mm et mm/s, mesurée en position par le centroïde
+    d'un obstacle. Association plus proche voisin dans une porte de gate mm
+    (paires traitées de la plus proche à la plus lointaine). Une piste est
+    confirmée après confirm détections et supprimée après max_miss tours
+    sans détection. static_map (StaticMap, optionnelle) remplace le retrait
+    des bordures et des balises dans process().
+    """
+
+    def __init__(self, gate=400.0, sigma_acc=2000.0, sigma_meas=50.0,
+                 confirm=3, max_miss=5, max_tracks=8, center_offset=130.0,
+                 static_map=None):
+        self.gate = gate
+        self.static_map = static_map
+        # Le LIDAR ne voit que la face avant d'un robot : son centre est
+        # estimé center_offset mm derrière le centroïde, dans l'axe du rayon
+        self.center_offset = center_offset
+        self.sigma_acc = sigma_acc          # bruit d'accélération (mm/s²)
+        self.sigma_meas = sigma_meas        # bruit sur le centroïde (mm)
+        self.confirm = confirm
+        self.max_miss = max_miss
+        self.max_tracks = max_tracks
+
+        self.X = np.zeros((0, 4))
+        self.P = np.zeros((0, 4, 4))
+        self.ids = np.zeros(0, dtype=int)
+        self.hits = np.zeros(0, dtype=int)
+        self.miss = np.zeros(0, dtype=int)
+        self.t = None
+        self._next_id = itertools.count(1)
+
+    def __len__(self):
+        return len(self.X)
+
+    def predict(self, dt):
+        """Avance toutes les pistes de dt secondes (vitesse constante)."""
+        if dt <= 0.0 or len(self.X) == 0:
+            return
+        self.X[:, 0] += dt * self.X[:, 2]
+        self.X[:, 1] += dt * self.X[:, 3]
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        q = self.sigma_acc ** 2
+        Q = q * np.array([
+            [dt ** 4 / 4, 0.0, dt ** 3 / 2, 0.0],
+            [0.0, dt ** 4 / 4, 0.0, dt ** 3 / 2],
+            [dt ** 3 / 2, 0.0, dt ** 2, 0.0],
+            [0.0, dt ** 3 / 2, 0.0, dt ** 2],
+        ])
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, obstacles, t):
+        """
+        Un tour : prédiction jusqu'à t (s), association des obstacles
+        (tableau OBSTACLE_DTYPE) aux pistes, correction, création et
+        suppression de pistes.
+        """
+        if self.t is not None:
+            self.predict(t - self.t)
+        self.t = t
+        Z = np.column_stack((obstacles["x"], obstacles["y"])) if len(obstacles) else np.zeros((0, 2))
+
+        # Association : paires (piste, obstacle) de la plus proche à la plus lointaine
+        T, M = len(self.X), len(Z)
+        assigned = np.full(T, -1)
+        used = np.zeros(M, dtype=bool)
+        if T and M:
+            d = np.hypot(self.X[:, None, 0] - Z[None, :, 0], self.X[:, None, 1] - Z[None, :, 1])
+            for flat in np.argsort(d, axis=None):
+                i, j = divmod(int(flat), M)
+                if d[i, j] > self.gate:
+                    break
+                if assigned[i] < 0 and not used[j]:
+                    assigned[i] = j
+                    used[j] = True
+
+        # Correction des pistes associées (H = [I 0], toutes d'un bloc)
+        a = np.flatnonzero(assigned >= 0)
+        if len(a):
+            P = self.P[a]
+            S = P[:, :2, :2] + np.eye(2) * self.sigma_meas ** 2
+            K = P[:, :, :2] @ np.linalg.inv(S)                      # (A, 4, 2)
+            y = Z[assigned[a]] - self.X[a, :2]
+            self.X[a] += np.einsum("kij,kj->ki", K, y)
+            self.P[a] = P - K @ P[:, :2, :]
+            self.hits[a] += 1
+            self.miss[a] = 0
+        self.miss[assigned < 0] += 1
+
+        # Suppression des pistes perdues, création pour les obstacles libres
+        keep = self.miss <= self.max_miss
+        self.X, self.P = self.X[keep], self.P[keep]
+        self.ids, self.hits, self.miss = self.ids[keep], self.hits[keep], self.miss[keep]
+        free = Z[~used][:max(self.max_tracks - len(self.X), 0)]
+        if len(free):
+            k = len(free)
+            X0 = np.zeros((k, 4))
+            X0[:, :2] = free
+            P0 = np.zeros((k, 4, 4))
+            P0[:, 0, 0] = P0[:, 1, 1] = self.sigma_meas ** 2
+            P0[:, 2, 2] = P0[:, 3, 3] = 1000.0 ** 2          # vitesse inconnue (mm/s)
+            self.X = np.concatenate((self.X, X0))
+            self.P = np.concatenate((self.P, P0))
+            self.ids = np.concatenate((self.ids, [next(self._next_id) for _ in range(k)]))
+            self.hits = np.concatenate((self.hits, np.ones(k, dtype=int)))
+            self.miss = np.concatenate((self.miss, np.zeros(k, dtype=int)))
+
+    def opponents(self):
+        """
+        Pistes confirmées et vues récemment, à publier :
+        liste de {"id", "x", "y", "vx", "vy", "t"} (mm, mm/s, time.monotonic()).
+        """
+        out = []
+        for i in np.flatnonzero(self.hits >= self.confirm):
+            x, y, vx, vy = self.X[i].tolist()
+            out.append({"id": int(self.ids[i]), "x": x, "y": y, "vx": vx, "vy": vy, "t": self.t})
+        return out
+
+    def process(self, scan: LidarScan, pose, angle_offset, bounds, beacons=(), t=None):
+        """
+        Étape complète après un tour : points -> obstacles -> pistes.
+        t : heure du tour (par défaut scan.stamp). Retourne opponents().
+        """
+        pts = obstacle_points(scan, pose, angle_offset, bounds, beacons, static_map=self.static_map)
+        obstacles = cluster_obstacles(pts)
+        if len(obstacles):
+            dx, dy = obstacles["x"] - pose[0], obstacles["y"] - pose[1]
+            k = self.center_offset / np.maximum(np.hypot(dx, dy), 1.0)
+            obstacles["x"] += k * dx
+            obstacles["y"] += k * dy
+        self.update(obstacles, scan.stamp if t is None else t)
+        return self.opponents()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+import time
+import numpy as np
+
+
+class ParticleFilter:
+    """
+    Filtre particulaire de pose (x, y, theta), entièrement vectorisé NumPy.
+    Pur calcul : aucune dépendance au LIDAR ni au port série
+    (voir ParticleLocalizer pour le branchement sur le robot).
+
+    Repère table identique à l'EKF (mm, rad). Les mesures sont des reflets
+    (distance, relèvement dans le repère robot) ; la vraisemblance d'une
+    particule est, pour chaque balise, celle du reflet le plus compatible,
+    avec un plancher pour les balises masquées. Plusieurs hypothèses
+    (configuration symétrique, mauvaise zone de départ) coexistent jusqu'à
+    ce que les mesures tranchent.
+
+    Nombre de particules adaptatif : il diminue quand le nuage est concentré
+    et quand l'update dépasse budget_ms, remonte quand le nuage s'étale.
+
+    Tant que le nuage est étalé (démarrage sans a priori), la vraisemblance
+    est adoucie (bruits gonflés en proportion de l'étalement) et le
+    rééchantillonnage secoue légèrement les particules (roughening) : on évite
+    de converger trop tôt vers une hypothèse fausse.
+    """
+
+    def __init__(self, beacons, n_max=2000, n_min=300, budget_ms=5.0, seed=None):
+        self.beacons = np.asarray(beacons, dtype=float).reshape(-1, 2)
+        self.n_max = n_max
+        self.n_min = n_min
+        self.n_cap = n_max              # plafond courant (budget CPU)
+        self.budget_ms = budget_ms
+        self.rng = np.random.default_rng(seed)
+
+        # Bruits de mesure et probabilité qu'une balise ne soit pas vue
+        self.sigma_r = 40.0                     # mm
+        self.sigma_b = np.deg2rad(3.0)          # rad
+        self.p_miss = 0.05
+        # Etalement (mm) du nuage au-delà duquel on garde n_max particules
+        self.spread_full = 300.0
+        self.spread = 0.0
+        # Coefficient de roughening (Gordon : K * étendue * n^(-1/3))
+        self.roughen = 0.2
+
+        self.last_update_ms = 0.0
+        self._alloc(n_max)
+        self.seed_gaussian((0.0, 0.0, 0.0), (1.0, 1.0, 0.01))
+
+    def _alloc(self, n):
+        self.capacity = n
+        self._p = np.zeros((n, 3))
+        self._logw = np.zeros(n)
+        self._w = np.zeros(n)
+        self._noise = np.zeros((n, 2))
+        self.n = 0
+
+    @property
+    def particles(self):
+        return self._p[:self.n]
+
+    @property
+    def weights(self):
+        """Poids normalisés (somme = 1)."""
+        lw = self._logw[:self.n]
+        w = self._w[:self.n]
+        np.subtract(lw, lw.max(), out=w)
+        np.exp(w, out=w)
+        w /= w.sum()
+        return w
+
+    @property
+    def ess(self):
+        """Taille effective de l'échantillon (1 .. n)."""
+        w = self.weights
+        return 1.0 / float(np.dot(w, w))
+
+    def _resize(self, n):
+        n = int(min(max(n, 1), self.n_max))
+        if n > self.capacity:
+            self._alloc(n)
+        self.n = n
+
+    # ---------------------
+    # Initialisation
+    # ---------------------
+
+    def seed_gaussian(self, pose, sigmas, n=None):
+        """Nuage gaussien autour de pose (mm, mm, rad)."""
+        self._resize(n or self.n_cap)
+        p = self.particles
+        p[:] = self.rng.standard_normal((self.n, 3)) * np.asarray(sigmas, dtype=float)
+        p += np.asarray(pose, dtype=float)
+        self._logw[:self.n] = 0.0
+        self.spread = float(np.hypot(sigmas[0], sigmas[1]))
+
+    def seed_uniform(self, bounds, n=None):
+        """Particules réparties uniformément sur la table, cap quelconque."""
+        (xmin, xmax), (ymin, ymax) = bounds
+        self._resize(n or self.n_max)
+        p = self.particles
+        p[:, 0] = self.rng.uniform(xmin, xmax, self.n)
+        p[:, 1] = self.rng.uniform(ymin, ymax, self.n)
+        p[:, 2] = self.rng.uniform(-np.pi, np.pi, self.n)
+        self._logw[:self.n] = 0.0
+        self.spread = float(np.hypot(xmax - xmin, ymax - ymin) / np.sqrt(12.0))
+
+    # ---------------------
+    # Modèle de mouvement
+    # ---------------------
+
+    def move(self, dxr, dyr, dth, sd_lin, sd_th):
+        """
+        Déplacement (dxr, dyr, dth) mesuré dans le repère robot, appliqué à
+        toutes les particules avec un bruit propre à chacune
+        (sd_lin le long du cap en mm, sd_th en rad).
+        """
+        p = self.particles
+        noise = self._noise[:self.n]
+        self.rng.standard_normal(out=noise)
+        lin = dxr + sd_lin * noise[:, 0]
+        th = p[:, 2]
+        c, s = np.cos(th), np.sin(th)
+        p[:, 0] += c * lin - s * dyr
+        p[:, 1] += s * lin + c * dyr
+        th += dth + sd_th * noise[:, 1]
+
+    # ---------------------
+    # Mesures
+    # ---------------------
+
+    def update(self, ranges, bearings, beacon_idx=None):
+        """
+        Pondère les particules par les reflets observés.
+        ranges, bearings : (M,) reflets dans le repère robot (mm, rad)
+        beacon_idx : balises attendues (toutes par défaut)
+        Rééchantillonne si nécessaire et adapte le nombre de particules.
+        """
+        t0 = time.perf_counter()
+        ranges = np.asarray(ranges, dtype=float)
+        bearings = np.asarray(bearings, dtype=float)
+        B = self.beacons if beacon_idx is None else self.beacons[beacon_idx]
+        if len(B) == 0:
+            return
+
+        p = self.particles
+        logw = self._logw[:self.n]
+        floor = np.log(self.p_miss)
+        # Vraisemblance adoucie tant que le nuage est étalé
+        temper = 1.0 + self.spread / self.spread_full
+        sigma_r = self.sigma_r * temper
+        sigma_b = self.sigma_b * temper
+        for bx, by in B:
+            dx = bx - p[:, 0]
+            dy = by - p[:, 1]
+            r_hat = np.hypot(dx, dy)
+            b_hat = np.arctan2(dy, dx) - p[:, 2]
+            if len(ranges) == 0:
+                logw += floor
+                continue
+            # (N, M) : écart de chaque reflet à la balise vue par chaque particule
+            er = (ranges[None, :] - r_hat[:, None]) / sigma_r
+            eb = (bearings[None, :] - b_hat[:, None] + np.pi) % (2 * np.pi) - np.pi
+            eb /= sigma_b
+            e = np.min(er * er + eb * eb, axis=1)
+            logw += np.maximum(-0.5 * e, floor)
+
+        if self.ess < 0.5 * self.n:
+            self.resample()
+        else:
+            _, cov = self.estimate()
+            self.spread = float(np.sqrt(max(cov[0, 0] + cov[1, 1], 0.0)))
+        self.last_update_ms = (time.perf_counter() - t0) * 1e3
+
+    def resample(self):
+        """
+        Rééchantillonnage systématique (un seul tirage aléatoire, O(n)),
+        vers un nombre de particules adapté à l'étalement et au budget CPU.
+        """
+        w = self.weights
+        mean, cov = self.estimate()
+        spread = float(np.sqrt(max(cov[0, 0] + cov[1, 1], 0.0)))
+        self.spread = spread
+
+        # Budget CPU : on réduit si le dernier update a coûté trop cher
+        if self.last_update_ms > self.budget_ms:
+            self.n_cap = max(int(self.n_cap * 0.8), self.n_min)
+        elif self.last_update_ms < 0.5 * self.budget_ms:
+            self.n_cap = min(int(self.n_cap * 1.25) + 1, self.n_max)
+        frac = min(spread / self.spread_full, 1.0)
+        n_new = int(self.n_min + (self.n_cap - self.n_min) * frac)
+        n_new = max(min(n_new, self.n_cap), self.n_min)
+
+        positions = (self.rng.random() + np.arange(n_new)) / n_new
+        idx = np.searchsorted(np.cumsum(w), positions)
+        np.minimum(idx, self.n - 1, out=idx)
+        chosen = self.particles[idx]
+        # Caps ramenés autour du cap moyen (étendue angulaire sans saut de 2pi)
+        chosen[:, 2] = mean[2] + (chosen[:, 2] - mean[2] + np.pi) % (2 * np.pi) - np.pi
+        extent = np.ptp(chosen, axis=0)
+        extent[2] = min(extent[2], np.pi)
+        self._resize(n_new)
+        p = self.particles
+        p[:] = chosen
+        # Roughening : les copies d'une même particule se séparent
+        p += self.rng.standard_normal(p.shape) * (self.roughen * extent * n_new ** (-1.0 / 3.0))
+        self._logw[:self.n] = 0.0
+
+    # ---------------------
+    # Estimation
+    # ---------------------
+
+    def estimate(self):
+        """Pose moyenne pondérée (moyenne circulaire pour theta) et covariance 3x3."""
+        w = self.weights
+        p = self.particles
+        mx = float(np.dot(w, p[:, 0]))
+        my = float(np.dot(w, p[:, 1]))
+        mth = float(np.arctan2(np.dot(w, np.sin(p[:, 2])), np.dot(w, np.cos(p[:, 2]))))
+        d = p - (mx, my, mth)
+        d[:, 2] = (d[:, 2] + np.pi) % (2 * np.pi) - np.pi
+        cov = (d * w[:, None]).T @ d
+        return np.array([mx, my, mth]), cov
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import math
+import numpy as np
+from ekf_localizer import EKFLocalizer
+from particle_filter import ParticleFilter
+from lidar_scan import LidarScan
+from beacons import find_reflectors
+
+
+class ParticleLocalizer(EKFLocalizer):
+    """
+    Localisation par filtre particulaire, interchangeable avec EKFLocalizer
+    (mêmes step / locate_once / update_sector / predict_odometry / relocalize).
+
+    Le calcul est délégué à ParticleFilter ; cette classe ne fait que le
+    brancher sur le LIDAR et l'odométrie. x et P restent disponibles : ce sont
+    la moyenne et la covariance du nuage, mises à jour après chaque pas.
+    L'extraction des balises autour de la pose moyenne est conservée pour les
+    compteurs de visibilité et le nombre de balises vues ; la pondération,
+    elle, utilise tous les reflets du scan, sans a priori de pose.
+
+    Les mesures sont appliquées à l'état courant (pas de rejeu de l'historique
+    comme dans l'EKF) : le nuage absorbe le retard dans son bruit.
+    """
+
+    def __init__(
+        self,
+        port: str = "/dev/lidar",
+        baud: int = 460800,
+        timeout: float = 0.05,
+        balises: dict | None = None,
+        init_pose: tuple[float, float, float] | None = None,
+        scan_mode: str = "standard",
+        n_particles: int = 2000,
+        n_min: int = 300,
+        budget_ms: float = 5.0,
+    ):
+        if scan_mode != "standard":
+            # Le nuage est pondéré par les reflets (qualité) à chaque tour
+            raise ValueError(f"ParticleLocalizer : mode {scan_mode} sans qualité, scan standard requis")
+        super().__init__(port, baud, timeout, balises=balises, init_pose=init_pose, scan_mode=scan_mode)
+        self._keys = list(self.balises.keys())
+        self.pf = ParticleFilter(list(self.balises.values()), n_max=n_particles,
+                                 n_min=n_min, budget_ms=budget_ms)
+        self.pf.seed_gaussian(self.x, np.sqrt(np.diag(self.P)))
+        self._sync()
+
+    def _sync(self) -> None:
+        """Recopie la moyenne / covariance du nuage dans x / P."""
+        mean, cov = self.pf.estimate()
+        self.x[:] = mean
+        self.P[:] = cov
+
+    # -------------------------------------------------------------
+    # PREDICTION
+    # -------------------------------------------------------------
+    def predict(self, dt, v=None, w=None, dx=None, dy=None, dtheta=None) -> None:
+        """Mêmes modes que EKFLocalizer.predict, appliqués à toutes les particules."""
+        if dx is not None and dy is not None and dtheta is not None:
+            # Deltas monde -> repère robot (cap moyen du nuage)
+            c, s = math.cos(self.x[2]), math.sin(self.x[2])
+            self.pf.move(c * dx + s * dy, -s * dx + c * dy, dtheta,
+                         abs(math.hypot(dx, dy)) * 0.2 + 5.0, abs(dtheta) * 0.2 + 0.01)
+            self._sync()
+            return
+        super().predict(dt, v=v, w=w)
+
+    def _predict_robot(self, dxr, dyr, dth, var_lin, var_th) -> None:
+        self.pf.move(dxr, dyr, dth, math.sqrt(var_lin), math.sqrt(var_th))
+        self._sync()
+
+    def _history_push(self, *args) -> None:
+        # Pas d'historique : les mesures s'appliquent à l'état courant
+        pass
+
+    # -------------------------------------------------------------
+    # CORRECTION
+    # -------------------------------------------------------------
+    def _correct_at(self, scan: LidarScan, keys=None):
+        """Pondère le nuage par les reflets du scan ; retourne les balises vues (comme l'EKF)."""
+        obs, self.diag = self._extract_beacon_measurements(scan, keys=keys)
+        refl = find_reflectors(scan, qual_min=self.reflector_qual_min)
+        bearings = refl["angle"].astype(float) + self.angle_offset
+        idx = None if keys is None else [self._keys.index(k) for k in keys]
+        self.pf.update(refl["range"], bearings, beacon_idx=idx)
+        self._sync()
+        return obs
+
+    def reset_pose(self, pose, sigmas=(400.0, 400.0, np.deg2rad(5.0))) -> None:
+        super().reset_pose(pose, sigmas)
+        self.pf.seed_gaussian(pose, sigmas)
+        self._sync()
+
+    def relocalize(self, scan: LidarScan):
+        """
+        Recalage en forme fermée de l'EKF si possible ; sinon le nuage est
+        étalé sur toute la table et pondéré par ce scan : les hypothèses
+        survivantes convergeront au fil des tours suivants.
+        """
+        pose = super().relocalize(scan)
+        if pose is None and scan is not None and len(scan):
+            self.pf.seed_uniform(self.table_bounds)
+            refl = find_reflectors(scan, qual_min=self.reflector_qual_min)
+            self.pf.update(refl["range"], refl["angle"].astype(float) + self.angle_offset)
+            self._sync()
+        return pose
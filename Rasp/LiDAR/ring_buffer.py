@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import numpy as np
+
+
+class ByteRing:
+    """
+    Buffer circulaire d'octets de capacité fixe pour la réception série.
+
+    - Le tableau est alloué une seule fois : mémoire constante pendant tout le match.
+    - Le port série écrit directement dedans (readinto), sans bytes intermédiaires.
+    - Le décodeur lit à travers des vues NumPy/memoryview, puis avance
+      l'index de lecture (consume) : ni copie ni memmove par paquet.
+
+    Les index de lecture/écriture sont absolus (toujours croissants) ;
+    la position réelle dans le tableau est index % capacity.
+
+    Chaque écriture peut être horodatée : on en déduit l'heure d'arrivée
+    de n'importe quel octet encore présent (voir byte_times).
+    """
+
+    def __init__(self, capacity=1 << 16, n_stamps=256):
+        """
+        :param capacity: taille du buffer en octets (64 ko ≈ 1.4 s à 460800 bauds)
+        :param n_stamps: nombre d'horodatages de lecture conservés
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.uint8)
+        self._mv = memoryview(self._data)
+        # Zone de recopie quand les données non lues chevauchent la fin du tableau
+        self._lin = np.zeros(capacity, dtype=np.uint8)
+        self.r = 0
+        self.w = 0
+        self.overruns = 0   # octets perdus car le décodeur n'a pas suivi
+
+        # Horodatages (index d'écriture après lecture, time.monotonic())
+        self._st_w = np.zeros(n_stamps, dtype=np.int64)
+        self._st_t = np.zeros(n_stamps)
+        self._st_n = 0
+
+    def __len__(self):
+        return self.w - self.r
+
+    def free(self):
+        """Place disponible avant d'écraser des données non lues."""
+        return self.capacity - (self.w - self.r)
+
+    def clear(self):
+        """Oublie toutes les données non lues."""
+        self.r = self.w
+
+    def write_from(self, readinto, n, stamp=None):
+        """
+        Remplit le buffer avec au plus n octets via une fonction readinto
+        (ex: serial.Serial.readinto). Si le buffer est plein, les octets
+        les plus anciens sont sacrifiés (le décodeur se re-synchronise).
+        stamp: heure de la lecture (time.monotonic()), mémorisée si fournie.
+        Retourne le nombre d'octets écrits.
+        """
+        n = min(n, self.capacity)
+        lost = n - self.free()
+        if lost > 0:
+            self.r += lost
+            self.overruns += lost
+
+        total = 0
+        while total < n:
+            wi = self.w % self.capacity
+            seg = min(n - total, self.capacity - wi)
+            got = readinto(self._mv[wi:wi + seg]) or 0
+            self.w += got
+            total += got
+            if got < seg:
+                break
+
+        if stamp is not None and total > 0:
+            k = self._st_n % len(self._st_w)
+            self._st_w[k] = self.w
+            self._st_t[k] = stamp
+            self._st_n += 1
+        return total
+
+    def byte_times(self, idx, byte_time):
+        """
+        Heure d'arrivée estimée des octets d'index absolus idx.
+        Le dernier octet d'une lecture est daté de l'heure de cette lecture,
+        les précédents de byte_time (durée d'un octet sur la liaison) en moins
+        chacun, sans remonter avant la lecture précédente.
+        """
+        n = min(self._st_n, len(self._st_w))
+        if n == 0:
+            return np.full(np.shape(idx), np.nan)
+        order = np.arange(self._st_n - n, self._st_n) % len(self._st_w)
+        w = self._st_w[order]
+        t = self._st_t[order]
+
+        k = np.minimum(np.searchsorted(w, idx, side="right"), n - 1)
+        times = t[k] - (w[k] - 1 - idx) * byte_time
+        floor = np.where(k > 0, t[np.maximum(k - 1, 0)], -np.inf)
+        return np.maximum(times, floor)
+
+    def peek(self):
+        """
+        Vue uint8 contiguë sur toutes les données non lues.
+        Seul le cas où elles chevauchent la fin du tableau entraîne une recopie
+        (dans la zone préallouée), une fois par tour de buffer.
+        """
+        n = self.w - self.r
+        ri = self.r % self.capacity
+        if ri + n <= self.capacity:
+            return self._data[ri:ri + n]
+
+        k = self.capacity - ri
+        self._lin[:k] = self._data[ri:]
+        self._lin[k:n] = self._data[:n - k]
+        return self._lin[:n]
+
+    def consume(self, n):
+        """Avance l'index de lecture de n octets."""
+        self.r += min(n, self.w - self.r)
@@ -1,25 +1,71 @@
 #!/usr/bin/env python3
 import serial, time # type: ignore
+import threading
+import queue
 import numpy as np
 import matplotlib.pyplot as plt
+from ring_buffer import ByteRing
+from lidar_scan import LidarScan
 
 class RPLidarC1M1:
-    """Gestion du LIDAR RPLiDAR C1M1 (mode standard 0x20)."""
+    """Gestion du LIDAR RPLiDAR C1M1 (scan standard 0x20, express/dense 0x82)."""
 
     CMD_SCAN = b"\xA5\x20"
+    CMD_EXPRESS_SCAN = b"\xA5\x82"
     CMD_STOP = b"\xA5\x25"
     DESC_SCAN = bytes.fromhex("A5 5A 05 00 00 40 81")
 
-    def __init__(self, port="/dev/lidar", baud=460800, timeout=0.05):
+    # Type de données annoncé par le dernier octet du descripteur de réponse
+    DESC_FORMATS = {0x81: "standard", 0x82: "express", 0x85: "dense"}
+    # Capsule express/dense : 2 octets sync+checksum, 2 octets angle de départ, 80 de mesures
+    CAPSULE_LEN = 84
+    # Qualité des points express/dense (non transmise) : aucun point n'est un reflet
+    QUAL_NONE = 0
+    # working_mode de la commande express : 0 = express historique, sinon id de mode constructeur
+    DENSE_MODE_ID = 1
+
+    # Nombre de paquets consécutifs valides exigés pour se re-synchroniser
+    LOCK_SAMPLES = 4
+    # Période d'un tour (s, ~10 Hz) : get_scan abandonne après SCAN_TIMEOUT_REVS tours
+    REV_PERIOD = 0.1
+    SCAN_TIMEOUT_REVS = 3
+    # Taille du buffer circulaire de réception (octets)
+    RING_CAPACITY = 1 << 16
+
+    def __init__(self, port="/dev/lidar", baud=460800, timeout=0.05, scan_mode="standard"):
         """
         Initialise la communication avec le LIDAR.
         :param port: chemin du port série (ex: /dev/lidar)
         :param baud: vitesse de communication
         :param timeout: délai max de lecture série (s)
+        :param scan_mode: mode par défaut de start_scan ("standard", "express", "dense")
         """
         self.ser = serial.Serial(port, baud, timeout=timeout)
-        self.buf = bytearray()
+        self.scan_mode = scan_mode
+        # Durée d'un octet sur la liaison (8N1 = 10 bits), pour dater les points
+        self.byte_time = 10.0 / baud
+        self._scan_format = "standard"   # format réellement annoncé par le descripteur
+        self.ring = ByteRing(self.RING_CAPACITY)
         self.last_S = 0
+        # Points décodés en attente (début du tour suivant) et morceaux du tour courant
+        self._pending = None
+        self._rev_parts = []
+
+        # Acquisition continue : thread lecteur + double buffer des tours publiés
+        self._acq_thread = None
+        self._acq_running = False
+        self._scan_cond = threading.Condition()
+        self._scan_slots = [None, None]   # (scan, timestamp) ; slot actif = seq % 2
+        self._scan_buffers = [LidarScan(), LidarScan()]   # réutilisés tour après tour
+        self._scan_seq = 0
+        self._read_seq = 0                # dernier tour rendu par read_scan()
+
+        # Sortie par secteurs angulaires (avant la fin du tour)
+        self.sector_deg = 30.0
+        self._sector_listeners = []
+        self._sector_idx = None
+        self._sector_parts = []
+        self._sector_range = (0, np.inf)
         print(f"[INIT] LIDAR connecté sur {port} @ {baud} bauds")
 
     # ---------------------
@@ -28,6 +74,7 @@ class RPLidarC1M1:
 
     def close(self):
         """Arrête le scan et ferme proprement le port série."""
+        self.stop_acquisition()
         try:
             self.ser.write(self.CMD_STOP)
             self.ser.flush()
@@ -78,106 +125,336 @@ class RPLidarC1M1:
 
         return angle_deg, dist_mm, qual, S
 
+    @classmethod
+    def _decode_batch(cls, data):
+        """
+        Décodage vectorisé de tous les paquets de 5 octets d'un buffer.
+
+        Les bits S/S̅/C sont vérifiés à chaque offset en une seule opération
+        NumPy. On suit ensuite la chaîne des paquets alignés tous les 5 octets ;
+        sur un en-tête invalide on re-synchronise directement sur le prochain
+        offset où LOCK_SAMPLES paquets consécutifs sont valides (même principe
+        que l'ancienne recherche du 0xA5, mais sans faux positifs isolés).
+        Le coût Python est proportionnel au nombre de pertes de synchro,
+        pas au nombre de points.
+
+        :param data: tableau uint8 des octets reçus
+        :return: (angle_deg, dist_mm, qual, S, fin, nb_octets_consommés)
+                 fin : offset de l'octet suivant chaque paquet (pour l'horodatage)
+        """
+        n = len(data)
+        empty = np.empty(0)
+        if n < 5:
+            return empty, empty, empty, empty, empty, 0
+
+        # En-tête valide à chaque offset possible (0 .. n-5)
+        b0 = data[:-4]
+        b1 = data[1:-3]
+        ok = (((b0 ^ (b0 >> 1)) & 0x01) == 1) & ((b1 & 0x01) == 1)
+
+        # Offsets où plusieurs paquets successifs sont valides (verrouillage)
+        n_lock = max(len(ok) - 5 * (cls.LOCK_SAMPLES - 1), 0)
+        lock = ok[:n_lock].copy()
+        for k in range(1, cls.LOCK_SAMPLES):
+            lock &= ok[5 * k : 5 * k + n_lock]
+
+        m = len(ok)
+        pos = 0
+        chunks = []
+        while pos < m:
+            idx = np.arange(pos, m, 5)
+            bad = np.flatnonzero(~ok[idx])
+            if bad.size == 0:
+                chunks.append(idx)
+                pos = int(idx[-1]) + 5
+                break
+            f = bad[0]
+            chunks.append(idx[:f])
+
+            # Aïe, en-tête invalide : on saute au prochain offset verrouillé
+            pos = int(idx[f]) + 1
+            nxt = np.flatnonzero(lock[pos:])
+            if nxt.size == 0:
+                # Rien de fiable : on garde juste la fin, trop courte pour être vérifiée
+                pos = max(pos, n_lock)
+                break
+            pos += int(nxt[0])
+
+        consumed = min(pos, n)
+        starts = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.intp)
+        if starts.size == 0:
+            return empty, empty, empty, empty, empty, consumed
+
+        p0 = data[starts].astype(np.uint16)
+        p1 = data[starts + 1].astype(np.uint16)
+        p2 = data[starts + 2].astype(np.uint16)
+        p3 = data[starts + 3].astype(np.uint16)
+        p4 = data[starts + 4].astype(np.uint16)
+
+        qual = (p0 >> 2) & 0x3F
+        S = p0 & 0x01
+        angle_deg = (((p2 << 7) | (p1 >> 1)) / 64.0) % 360.0
+        dist_mm = ((p4 << 8) | p3) / 4.0
+
+        return angle_deg, dist_mm, qual, S, starts + 5, consumed
+
+    @classmethod
+    def _decode_capsules(cls, data, dense=False):
+        """
+        Décodage vectorisé des capsules express (0x82) ou dense (0x85).
+
+        Capsule (84 octets) :
+            - octets 0/1 : nibble haut = sync 0xA / 0x5, nibbles bas = checksum
+              (XOR des octets 2..83)
+            - octets 2/3 : angle de départ Q6 (15 bits) + bit S
+            - express : 16 cabines de 5 octets (2 distances + offsets d'angle)
+            - dense   : 40 distances u16 (mm)
+        Les angles sont interpolés entre l'angle de départ de la capsule et
+        celui de la suivante : la dernière capsule valide reste donc dans le
+        buffer (non consommée) jusqu'à l'arrivée de la prochaine. Après une
+        re-synchronisation, la capsule qui précède le trou est perdue (comme
+        dans le SDK) : on n'interpole pas entre deux capsules non contiguës.
+        Pas de qualité dans ces formats : elle vaut QUAL_NONE (voir
+        LidarScan.has_quality).
+
+        :return: (angle_deg, dist_mm, qual, S, fin, nb_octets_consommés)
+                 fin : offset estimé de fin de chaque mesure, réparti entre la
+                 fin de sa capsule et la fin de la suivante
+        """
+        L = cls.CAPSULE_LEN
+        n = len(data)
+        empty = np.empty(0)
+        m = n - L + 1
+        if m <= 0:
+            return empty, empty, empty, empty, empty, 0
+
+        # Capsules candidates : nibbles de synchro, puis checksum sur ces seuls offsets
+        sync = ((data[:m] >> 4) == 0xA) & ((data[1:m + 1] >> 4) == 0x5)
+        cand = np.flatnonzero(sync)
+        valid = np.zeros(m, dtype=bool)
+        if cand.size:
+            body = data[cand[:, None] + np.arange(2, L)]
+            checksum = np.bitwise_xor.reduce(body, axis=1)
+            expected = (data[cand] & 0x0F) | ((data[cand + 1] & 0x0F) << 4)
+            valid[cand[checksum == expected]] = True
+
+        # Chaîne des capsules alignées tous les L octets, re-synchro sur la suivante valide
+        pos = 0
+        chunks = []
+        while pos < m:
+            idx = np.arange(pos, m, L)
+            bad = np.flatnonzero(~valid[idx])
+            if bad.size == 0:
+                chunks.append(idx)
+                break
+            chunks.append(idx[:bad[0]])
+            pos = int(idx[bad[0]]) + 1
+            nxt = np.flatnonzero(valid[pos:])
+            if nxt.size == 0:
+                pos = m
+                break
+            pos += int(nxt[0])
+
+        caps = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.intp)
+        # Seules les capsules suivies de leur voisine immédiate donnent des points
+        pair = np.flatnonzero(np.diff(caps) == L)
+        if pair.size == 0:
+            # On garde la dernière capsule (ou la fin) en attendant la suivante
+            keep = int(caps[-1]) if caps.size else m
+            return empty, empty, empty, empty, empty, keep
+
+        start_q8 = ((data[caps + 2].astype(np.int64) | (data[caps + 3].astype(np.int64) << 8)) & 0x7FFF) << 2
+        prev_q8 = start_q8[pair]
+        next_q8 = start_q8[pair + 1]
+        diff_q8 = next_q8 - prev_q8
+        diff_q8[prev_q8 > next_q8] += 360 << 8
+        full_q16 = 360 << 16
+
+        base = caps[pair, None]
+        if dense:
+            k = np.arange(40)
+            off = base + 4 + 2 * k
+            dist = data[off].astype(np.int64) | (data[off + 1].astype(np.int64) << 8)
+            inc_q16 = (diff_q8 << 8) // 40
+            raw_q16 = (prev_q8 << 8)[:, None] + k * inc_q16[:, None]
+            angle_q6 = raw_q16 >> 10
+            dist_mm = dist
+        else:
+            c = base + 4 + 5 * np.arange(16)
+            d1 = data[c].astype(np.int64) | (data[c + 1].astype(np.int64) << 8)
+            d2 = data[c + 2].astype(np.int64) | (data[c + 3].astype(np.int64) << 8)
+            offs = data[c + 4].astype(np.int64)
+            off1 = (offs & 0x0F) | ((d1 & 0x03) << 4)
+            off2 = (offs >> 4) | ((d2 & 0x03) << 4)
+            # Entrelace les 2 mesures de chaque cabine -> 32 points par capsule
+            dist_mm = np.stack((d1 >> 2, d2 >> 2), axis=2).reshape(len(base), 32)
+            offset_q3 = np.stack((off1, off2), axis=2).reshape(len(base), 32)
+            inc_q16 = diff_q8 << 3
+            raw_q16 = (prev_q8 << 8)[:, None] + np.arange(32) * inc_q16[:, None]
+            angle_q6 = (raw_q16 - (offset_q3 << 13)) >> 10
+
+        S = (((raw_q16 + inc_q16[:, None]) % full_q16) < inc_q16[:, None]).astype(np.int64)
+        angle_deg = (angle_q6 % (360 << 6)) / 64.0
+        dist_mm = dist_mm.astype(float)
+        qual = np.full(dist_mm.shape, cls.QUAL_NONE)
+        per_cap = angle_deg.shape[1]
+        ends = (base + L) + L * np.arange(per_cap) / per_cap
+
+        return (angle_deg.ravel(), dist_mm.ravel(), qual.ravel(), S.ravel(),
+                ends.ravel(), int(caps[-1]))
+
     # ---------------------
     # Commandes principales
     # ---------------------
 
-    def start_scan(self):
-        """Envoie la commande de scan standard et attend le descripteur."""
-        print("[SEND] Stop + Start scan")
+    @staticmethod
+    def _express_request(working_mode):
+        """Trame A5 82 05 <mode> <flags u16> <param u16> <checksum>."""
+        pkt = bytearray(b"\xA5\x82\x05") + bytes([working_mode & 0xFF, 0, 0, 0, 0])
+        checksum = 0
+        for b in pkt:
+            checksum ^= b
+        pkt.append(checksum)
+        return bytes(pkt)
+
+    def start_scan(self, mode=None):
+        """
+        Envoie la commande de scan et attend le descripteur.
+        :param mode: "standard" (paquets de 5 octets, avec qualité),
+                     "express" (capsules de 32 points) ou
+                     "dense" (capsules de 40 points, ~2 octets/point).
+                     Par défaut self.scan_mode.
+        Le format réellement décodé est celui annoncé par le descripteur.
+        Attention : express/dense ne transmettent pas de qualité, elle vaut
+        QUAL_NONE et les tours ont has_quality = False : pas de détection
+        de balises par réflectivité (find_reflectors refuse ces scans).
+        """
+        mode = mode or self.scan_mode
+        print(f"[SEND] Stop + Start scan ({mode})")
         self.ser.write(self.CMD_STOP)
         self.ser.flush()
         time.sleep(0.05)
-
-        self.ser.write(self.CMD_SCAN)
+        self.ser.reset_input_buffer()
+
+        if mode == "standard":
+            self.ser.write(self.CMD_SCAN)
+        elif mode == "express":
+            self.ser.write(self._express_request(0))
+        elif mode == "dense":
+            self.ser.write(self._express_request(self.DENSE_MODE_ID))
+        else:
+            raise ValueError(f"Mode de scan inconnu : {mode}")
         self.ser.flush()
 
         desc = self._read_exactly(7)
         print("[DESC]", desc.hex() if desc else "None")
 
-        if desc != self.DESC_SCAN:
+        fmt = None
+        if desc is not None and desc[:2] == b"\xA5\x5A":
+            fmt = self.DESC_FORMATS.get(desc[6])
+
+        if fmt is None:
             print("[WARN] Descripteur inattendu — poursuite du scan.")
+            fmt = mode
+        elif fmt != mode:
+            print(f"[WARN] Demande {mode}, le LIDAR répond en {fmt} — on suit le descripteur.")
         else:
-            print("[OK] Scan standard confirmé.")
-        self.buf.clear()
+            print(f"[OK] Scan {fmt} confirmé.")
+        self._scan_format = fmt
+        self.ring.clear()
         self.last_S = 0
+        self._pending = None
+        self._rev_parts = []
+        self._sector_idx = None
+        self._sector_parts = []
+
+    def _read_serial(self):
+        """Lit directement dans le buffer circulaire tout ce qui est disponible."""
+        waiting = self.ser.in_waiting
+        if waiting > 0:
+            self.ring.write_from(self.ser.readinto, waiting, time.monotonic())
+
+        # Si on n'a pas assez de données, on attend un peu (lecture bloquante courte)
+        # (en express/dense il faut deux capsules pour interpoler les angles)
+        need = 5 if self._scan_format == "standard" else 2 * self.CAPSULE_LEN
+        if len(self.ring) < need:
+            self.ring.write_from(self.ser.readinto, max(32, need - len(self.ring)), time.monotonic())
+
+    def _decode_buffer(self):
+        """
+        Décode d'un coup tous les paquets complets présents dans le buffer circulaire.
+        Retourne un tableau (N, 5) : angle (deg), distance (mm), qualité,
+        t (time.monotonic() estimé de réception du point), S.
+        """
+        base = self.ring.r
+        data = self.ring.peek()
+        if self._scan_format == "standard":
+            angle, dist, qual, S, ends, consumed = self._decode_batch(data)
+        else:
+            angle, dist, qual, S, ends, consumed = self._decode_capsules(
+                data, dense=(self._scan_format == "dense")
+            )
+        stamps = self.ring.byte_times(base + ends - 1, self.byte_time)
+        self.ring.consume(consumed)
+        return np.column_stack((angle, dist, qual, stamps, S))
 
-    def get_scan(self, min_dist=50, max_dist=6000):
+    def get_scan(self, min_dist=50, max_dist=6000, out=None):
         """
         Lit un tour complet avec re-synchronisation robuste.
+        Le décodage se fait par lots (voir _decode_batch) : aucune boucle Python par point.
+        Retourne un LidarScan (angles rad, distances, qualités, heures de réception).
+        :param out: LidarScan à remplir sur place (sinon un nouveau est créé)
         """
-        revolution = []
-        # Sécurité pour ne pas bloquer indéfiniment si le Lidar est débranché
-        max_loops = 20000 
-        loops = 0
-
-        while loops < max_loops:
-            loops += 1
-            
-            # On lit tout ce qui arrive
-            if self.ser.in_waiting > 0:
-                self.buf.extend(self.ser.read(self.ser.in_waiting))
-            
-            # Si on n'a pas assez de données, on attend un peu (lecture bloquante courte)
-            if len(self.buf) < 5:
-                chunk = self.ser.read(32)
-                if not chunk:
-                    continue
-                self.buf.extend(chunk)
-
-            # --- C'est ici que ça change ---
-            # [OPTIMISATION] : On évite de traiter le buffer s'il ne commence pas par le header
-            # On utilise une boucle pour "sauter" directement au prochain octet 0xA5 (165)
-            while len(self.buf) >= 5:
-                
-                # 1. RECHERCHE RAPIDE DU DÉBUT DE TRAME
-                if self.buf[0] != 0xA5:
-                    try:
-                        # On cherche l'index du prochain 0xA5 dans tout le buffer d'un coup
-                        # C'est optimisé en C par Python, très rapide.
-                        idx = self.buf.index(0xA5)
-                        
-                        # On supprime tout ce qui précède en UNE SEULE opération
-                        del self.buf[:idx]
-                        
-                    except ValueError:
-                        # Aucun 0xA5 trouvé ? Tout le buffer est inutile, on vide tout.
-                        self.buf.clear()
-                        continue
-                
-                # Sécurité après nettoyage : a-t-on encore assez de données ?
-                if len(self.buf) < 5:
-                    continue
+        # Sécurité pour ne pas bloquer indéfiniment si le Lidar est débranché :
+        # délai en temps (un tour à finir + un tour complet + marge), le nombre
+        # de lectures par tour dépendant de la taille des morceaux reçus
+        deadline = time.monotonic() + self.SCAN_TIMEOUT_REVS * self.REV_PERIOD + (self.ser.timeout or 0.0)
 
-                # 2. DÉCODAGE (Ton code original reprend ici)
-                pkt = bytes(self.buf[:5])
-                decoded = self._decode_sample(pkt)
-                
-                if not decoded:
-                    # Aïe, c'était un faux positif (un 0xA5 qui n'était pas un header)
-                    # On supprime juste cet octet pour avancer et on recommence
-                    del self.buf[0]
+        while time.monotonic() < deadline:
+
+            if self._pending is None:
+                self._read_serial()
+                batch = self._decode_buffer()
+                if len(batch) == 0:
                     continue
-                
-                # SUCCÈS : On a un point valide !
-                # On supprime les 5 octets traités
-                del self.buf[:5]
-                
-                angle, dist, qual, S = decoded
-
-                # Logique de détection de tour (identique à avant)
-                if S == 1 and self.last_S == 0:
-                    if len(revolution) > 50:
-                        self.last_S = S
-                        return np.array(revolution)
-                    else:
-                        revolution = [] # Tour incomplet, on reset
-                
-                self.last_S = S
+                if self._sector_listeners:
+                    self._feed_sectors(batch, min_dist, max_dist)
+            else:
+                batch, self._pending = self._pending, None
+
+            # Détection de tour : front montant du bit S (identique à avant)
+            S = batch[:, 4]
+            prev_S = np.empty_like(S)
+            prev_S[0] = self.last_S
+            prev_S[1:] = S[:-1]
+            starts = np.flatnonzero((S == 1) & (prev_S == 0))
+
+            if starts.size == 0:
+                self._rev_parts.append(batch)
+                self.last_S = int(S[-1])
+                continue
+
+            # Nouveau tour : ce qui précède clôt le tour courant,
+            # le reste du lot est gardé pour l'appel suivant
+            k = starts[0]
+            if k > 0:
+                self._rev_parts.append(batch[:k])
+            self._pending = batch[k:]
+            self.last_S = 1
+
+            parts, self._rev_parts = self._rev_parts, []
+            if not parts:
+                continue
+            revolution = out if out is not None else LidarScan()
+            revolution.reset()
+            revolution.has_quality = self._scan_format == "standard"
+            for part in parts:
+                revolution.extend_rows(part, min_dist, max_dist)
+
+            if len(revolution) > 50:
+                return revolution
+            # Tour incomplet, on reset
 
-                if min_dist < dist < max_dist:
-                    revolution.append((angle, dist, qual))
-        
         return None
     
     def clean_input(self):
@@ -186,16 +463,210 @@ class RPLidarC1M1:
             self.ser.reset_input_buffer() # Vide le buffer de l'OS (Windows/Linux)
         except Exception:
             pass
-        self.buf.clear()              # Vide ton buffer bytearray
+        self.ring.clear()             # Vide le buffer circulaire
         self.last_S = 0               # Reset l'état du bit de synchro
+        self._pending = None          # Oublie les points déjà décodés
+        self._rev_parts = []
+        self._sector_idx = None
+        self._sector_parts = []
     
 
 
+    # ---------------------
+    # Acquisition continue (thread lecteur)
+    # ---------------------
+
+    @property
+    def acquiring(self):
+        return self._acq_thread is not None and self._acq_thread.is_alive()
+
+    def start_acquisition(self, min_dist=20, max_dist=6000):
+        """
+        Lance le scan puis un thread qui décode en continu et publie chaque
+        tour complet (numéro de séquence + horodatage monotonic).
+        Plus besoin de clean_input() : rien n'est jeté, aucun tour n'est perdu.
+        Tant que le thread tourne, ne pas appeler get_scan() ailleurs.
+        """
+        if self.acquiring:
+            return
+        self.start_scan()
+        self._acq_running = True
+        self._acq_thread = threading.Thread(
+            target=self._acquisition_loop, args=(min_dist, max_dist), daemon=True
+        )
+        self._acq_thread.start()
+        print("[LIDAR] Acquisition continue démarrée.")
+
+    def stop_acquisition(self, timeout=1.0):
+        """Arrête le thread lecteur (le port reste ouvert)."""
+        self._acq_running = False
+        if self._acq_thread is not None:
+            self._acq_thread.join(timeout)
+            self._acq_thread = None
+        with self._scan_cond:
+            self._scan_cond.notify_all()
+
+    def _acquisition_loop(self, min_dist, max_dist):
+        while self._acq_running:
+            # On remplit le buffer qui n'est pas le dernier publié (double buffer)
+            back = self._scan_buffers[(self._scan_seq + 1) % 2]
+            try:
+                scan = self.get_scan(min_dist=min_dist, max_dist=max_dist, out=back)
+            except Exception as e:
+                print("[LIDAR-THREAD] erreur:", e)
+                time.sleep(0.05)
+                continue
+            if scan is not None:
+                self._publish_scan(scan, time.monotonic())
+
+    def _publish_scan(self, scan, stamp):
+        """
+        Rend actif le slot qui vient d'être rempli (swap du double buffer).
+        Le tour publié reste valide jusqu'au remplissage suivant de ce même
+        buffer, soit environ un tour plus tard : copier (scan.copy()) pour le garder.
+        """
+        with self._scan_cond:
+            scan.seq = self._scan_seq + 1
+            self._scan_slots[(self._scan_seq + 1) % 2] = (scan, stamp)
+            self._scan_seq += 1
+            self._scan_cond.notify_all()
+
+    def get_latest_scan(self):
+        """
+        Dernier tour publié, sans attendre.
+        Retourne (seq, timestamp, scan) ou (0, None, None) si rien encore.
+        """
+        with self._scan_cond:
+            seq = self._scan_seq
+            slot = self._scan_slots[seq % 2]
+        if slot is None:
+            return 0, None, None
+        return seq, slot[1], slot[0]
+
+    def wait_scan(self, after_seq=None, timeout=0.5):
+        """
+        Bloque jusqu'à ce qu'un tour plus récent que after_seq soit publié
+        (par défaut : le prochain tour) et le retourne immédiatement.
+        Si un tour plus récent existe déjà, aucune attente.
+        Retourne (seq, timestamp, scan) ou (after_seq, None, None) si délai dépassé.
+        """
+        with self._scan_cond:
+            if after_seq is None:
+                after_seq = self._scan_seq
+            ok = self._scan_cond.wait_for(
+                lambda: self._scan_seq > after_seq or not self._acq_running, timeout
+            )
+            if not ok or self._scan_seq <= after_seq:
+                return after_seq, None, None
+            seq = self._scan_seq
+            scan, stamp = self._scan_slots[seq % 2]
+        return seq, stamp, scan
+
+    def read_scan(self, min_dist=40, max_dist=6000, timeout=0.5):
+        """
+        Tour le plus récent non encore lu par cet objet.
+        - Acquisition continue active : pris dans le double buffer (attend le
+          prochain seulement si le dernier a déjà été lu).
+        - Sinon : lecture directe via get_scan().
+        """
+        if not self.acquiring:
+            return self.get_scan(min_dist=min_dist, max_dist=max_dist)
+
+        seq, _, scan = self.wait_scan(self._read_seq, timeout)
+        if scan is None:
+            return None
+        # Si le consommateur est en retard, on saute directement au plus récent
+        self._read_seq = seq
+        dists = scan.dists
+        keep = (dists > min_dist) & (dists < max_dist)
+        return scan if keep.all() else scan.subset(keep)
+
+    # ---------------------
+    # Sortie par secteurs angulaires
+    # ---------------------
+
+    def add_sector_listener(self, callback, sector_deg=None):
+        """
+        Enregistre callback(start_deg, end_deg, points, stamp), appelé dès
+        qu'un secteur angulaire est entièrement décodé (points : LidarScan
+        du secteur). Appelé depuis le thread qui lit le LIDAR.
+        """
+        if sector_deg is not None:
+            self.sector_deg = float(sector_deg)
+        self._sector_listeners.append(callback)
+
+    def remove_sector_listener(self, callback):
+        if callback in self._sector_listeners:
+            self._sector_listeners.remove(callback)
+
+    def iter_sectors(self, sector_deg=30.0, timeout=0.5):
+        """
+        Générateur de secteurs (start_deg, end_deg, points, stamp) au fil du tour.
+        Démarre l'acquisition continue si besoin. Produit None si rien
+        n'arrive pendant timeout, pour laisser l'appelant respirer.
+        """
+        q_sectors = queue.Queue(maxsize=64)
+
+        def push(*sector):
+            if q_sectors.full():
+                q_sectors.get_nowait()
+            q_sectors.put_nowait(sector)
+
+        self.add_sector_listener(push, sector_deg)
+        if not self.acquiring:
+            self.start_acquisition()
+        try:
+            while True:
+                try:
+                    yield q_sectors.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+        finally:
+            self.remove_sector_listener(push)
+
+    def _feed_sectors(self, batch, min_dist, max_dist):
+        """Découpe un lot décodé en secteurs et publie ceux qui sont terminés."""
+        self._sector_range = (min_dist, max_dist)
+        sec = (batch[:, 0] // self.sector_deg).astype(int)
+        cuts = np.flatnonzero(sec[1:] != sec[:-1]) + 1
+
+        if self._sector_idx is not None and sec[0] != self._sector_idx:
+            self._emit_sector()
+        bounds = np.concatenate(([0], cuts, [len(batch)]))
+        for i in range(len(bounds) - 1):
+            if i > 0:
+                self._emit_sector()
+            self._sector_parts.append(batch[bounds[i]:bounds[i + 1]])
+            self._sector_idx = int(sec[bounds[i]])
+
+    def _emit_sector(self):
+        parts, self._sector_parts = self._sector_parts, []
+        if not parts:
+            return
+        min_dist, max_dist = self._sector_range
+        pts = LidarScan(sum(len(p) for p in parts))
+        pts.has_quality = self._scan_format == "standard"
+        for part in parts:
+            pts.extend_rows(part, min_dist, max_dist)
+
+        start = self._sector_idx * self.sector_deg
+        # Heure de capture du dernier point (pts.stamp, comme pour un tour) et
+        # non l'heure de publication, en retard d'un secteur plus la lecture ;
+        # secteur vide après filtrage : dernier point reçu
+        if len(pts) == 0:
+            pts.stamp = max(float(part[:, 3].max()) for part in parts)
+        stamp = pts.stamp
+        for cb in list(self._sector_listeners):
+            try:
+                cb(start, start + self.sector_deg, pts, stamp)
+            except Exception as e:
+                print("[LIDAR-SECTOR] erreur callback:", e)
+
     # ---------------------
     # Mode affichage temps réel
     # ---------------------
 
-    def plot_live_pygame_threaded(self, rmax=4000, fps=15, step=500):
+    def plot_live_pygame_threaded(self, rmax=4000, fps=15, step=500, sector=None):
         """
         Affichage temps réel PyGame (fluide + interactif + auto seuil)
         -----------------------------------------------------------------
@@ -206,6 +677,7 @@ class RPLidarC1M1:
         - Échelle de distance (cercles + labels)
         - Points > seuil = blanc (bande réfléchissante)
         - ESC ou croix pour quitter proprement
+        - sector=(début, fin) en degrés : n'affiche que ce secteur angulaire
         """
         import pygame, math, threading, queue, numpy as np, time # type: ignore
 
@@ -234,7 +706,7 @@ class RPLidarC1M1:
             while running:
                 try:
                     scan = self.get_scan(min_dist=20, max_dist=rmax)
-                    if len(scan) == 0:
+                    if scan is None or len(scan) == 0:
                         continue
                     if q_scans.full():
                         q_scans.get_nowait()
@@ -287,16 +759,19 @@ class RPLidarC1M1:
                 last_scan = q_scans.get_nowait()
 
             if last_scan is not None:
-                angles = np.radians(last_scan[:, 0])
-                dists = last_scan[:, 1]
-                qual = last_scan[:, 2]
+                # Secteur demandé via l'index angulaire du scan, sinon tout le tour
+                if sector is not None:
+                    idx = last_scan.between(math.radians(sector[0]), math.radians(sector[1]))
+                else:
+                    idx = slice(None)
+                qual = last_scan.quals[idx]
 
                 # mode auto : top 5 % des valeurs
                 if auto_mode and len(qual) > 20:
                     qual_thresh = int(np.percentile(qual, 95))
 
-                x = dists * np.sin(angles)
-                y = -dists * np.cos(angles)
+                x = last_scan.y[idx]
+                y = -last_scan.x[idx]
 
                 for i in range(len(x)):
                     q = int(qual[i])
@@ -333,10 +808,11 @@ class RPLidarC1M1:
     # Mode analyse qualité (interactif)
     # ---------------------
 
-    def plot_reflectivity(self, rmax=6000, qual_min=0):
+    def plot_reflectivity(self, rmax=6000, qual_min=0, sector=None):
         """
         Affiche une carte (x, y) de la qualité des mesures.
         Permet d'ajuster dynamiquement le seuil de qualité avec ↑/↓.
+        sector=(début, fin) en degrés : limite l'affichage à ce secteur angulaire.
         """
         import matplotlib.pyplot as plt
 
@@ -345,15 +821,16 @@ class RPLidarC1M1:
         scan = self.get_scan(min_dist=20, max_dist=rmax)
         self.close()
 
-        if len(scan) == 0:
+        if scan is None or len(scan) == 0:
             print("[WARN] Aucun point détecté.")
             return
 
-        angles = np.radians(scan[:, 0])
-        dists = scan[:, 1]
-        qual = scan[:, 2]
-        x = dists * np.cos(angles)
-        y = dists * np.sin(angles)
+        idx = slice(None)
+        if sector is not None:
+            idx = scan.between(np.radians(sector[0]), np.radians(sector[1]))
+        qual = scan.quals[idx]
+        x = scan.x[idx]
+        y = scan.y[idx]
 
         fig, ax = plt.subplots(figsize=(8, 6))
         sc = ax.scatter(x, y, c=qual, s=10, cmap='turbo', vmin=0, vmax=63)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Carte statique de la table : grille d'occupation apprise pendant une
+calibration (bordures, éléments de jeu fixes, supports de balises), puis
+utilisée pour trier les points LIDAR en statiques / dynamiques par une
+seule lecture indexée.
+
+Usage (calibration, robot immobile ou déplacé lentement sur la table vide
+d'adversaires) :
+    python3 static_map.py [durée_s] [fichier.npz]
+"""
+import numpy as np
+
+
+class StaticMap:
+    """
+    Grille (ny, nx) de cellules de resolution mm couvrant bounds
+    ((xmin, xmax), (ymin, ymax)), repère table.
+
+    Calibration : add_points() compte, pour chaque cellule, le nombre de tours
+    où elle a reçu au moins un point ; finalize() marque statiques les cellules
+    vues dans au moins min_ratio des tours, puis dilate de margin mm (erreur
+    de pose, bruit de distance). Tout ce qui tombe hors de la grille est statique.
+
+    Exécution : is_static(x, y) et dynamic_mask(x, y) sont vectorisés (un
+    calcul d'indice et un gather sur la grille aplatie).
+    """
+
+    def __init__(self, bounds, resolution=10.0):
+        (self.xmin, self.xmax), (self.ymin, self.ymax) = bounds
+        self.resolution = float(resolution)
+        self.nx = int(np.ceil((self.xmax - self.xmin) / self.resolution))
+        self.ny = int(np.ceil((self.ymax - self.ymin) / self.resolution))
+        self.static = np.zeros((self.ny, self.nx), dtype=bool)
+        self.hits = np.zeros((self.ny, self.nx), dtype=np.uint16)
+        self.n_scans = 0
+
+    @property
+    def bounds(self):
+        return (self.xmin, self.xmax), (self.ymin, self.ymax)
+
+    # ---------------------
+    # Indexation
+    # ---------------------
+
+    def cells(self, x, y):
+        """
+        Indices aplatis des cellules de (x, y) (mm, repère table), -1 hors grille.
+        """
+        ix = np.floor((np.asarray(x, dtype=float) - self.xmin) / self.resolution).astype(np.intp)
+        iy = np.floor((np.asarray(y, dtype=float) - self.ymin) / self.resolution).astype(np.intp)
+        inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        return np.where(inside, iy * self.nx + ix, -1)
+
+    def is_static(self, x, y):
+        """Masque des points sur une cellule statique ou hors de la table."""
+        c = self.cells(x, y)
+        flat = self.static.ravel()
+        return (c < 0) | flat[np.maximum(c, 0)]
+
+    def dynamic_mask(self, x, y):
+        """Masque des points qui ne s'expliquent pas par la carte (adversaires, objets déplacés)."""
+        return ~self.is_static(x, y)
+
+    # ---------------------
+    # Calibration
+    # ---------------------
+
+    def add_points(self, x, y):
+        """Un tour de calibration : points (mm, repère table)."""
+        c = self.cells(x, y)
+        c = c[c >= 0]
+        seen = np.bincount(c, minlength=self.nx * self.ny) > 0
+        hits = self.hits.ravel()
+        hits[seen & (hits < np.iinfo(np.uint16).max)] += 1
+        self.n_scans += 1
+
+    def finalize(self, min_ratio=0.3, margin=30.0):
+        """Statique = vu dans au moins min_ratio des tours, dilaté de margin (mm)."""
+        static = self.hits >= max(1, int(np.ceil(min_ratio * self.n_scans)))
+        self.static = self._dilate(static, int(np.ceil(margin / self.resolution)))
+        return self
+
+    @staticmethod
+    def _dilate(mask, k):
+        """Dilatation carrée de k cellules (décalages successifs, sans scipy)."""
+        out = mask.copy()
+        for _ in range(k):
+            grown = out.copy()
+            grown[1:, :] |= out[:-1, :]
+            grown[:-1, :] |= out[1:, :]
+            grown[:, 1:] |= out[:, :-1]
+            grown[:, :-1] |= out[:, 1:]
+            out = grown
+        return out
+
+    @classmethod
+    def from_table(cls, bounds, resolution=10.0, border=60.0, beacons=(), beacon_radius=120.0):
+        """
+        Carte par défaut sans calibration : bande de border mm le long des
+        bordures et disques autour des balises.
+        """
+        m = cls(bounds, resolution)
+        xs = m.xmin + (np.arange(m.nx) + 0.5) * m.resolution
+        ys = m.ymin + (np.arange(m.ny) + 0.5) * m.resolution
+        X, Y = np.meshgrid(xs, ys)
+        m.static = (
+            (X < m.xmin + border) | (X > m.xmax - border)
+            | (Y < m.ymin + border) | (Y > m.ymax - border)
+        )
+        for bx, by in beacons:
+            m.static |= (X - bx) ** 2 + (Y - by) ** 2 < beacon_radius ** 2
+        return m
+
+    # ---------------------
+    # Persistance
+    # ---------------------
+
+    def save(self, path):
+        np.savez_compressed(
+            path, static=self.static, hits=self.hits, n_scans=self.n_scans,
+            bounds=np.array(self.bounds, dtype=float), resolution=self.resolution,
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        m = cls(tuple(map(tuple, data["bounds"])), float(data["resolution"]))
+        m.static = data["static"].astype(bool)
+        m.hits = data["hits"].astype(np.uint16)
+        m.n_scans = int(data["n_scans"])
+        return m
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from ekf_localizer import EKFLocalizer
+
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 20.0
+    path = sys.argv[2] if len(sys.argv) > 2 else "static_map.npz"
+
+    ekf = EKFLocalizer("/dev/lidar")
+    ekf.start_acquisition()
+    smap = StaticMap(ekf.table_bounds)
+    print(f"--- CALIBRATION CARTE STATIQUE ({duration:.0f} s) ---")
+    t_end = time.monotonic() + duration
+    try:
+        while time.monotonic() < t_end:
+            pose, nb, _ = ekf.locate_once()
+            if pose is None:
+                continue
+            scan = ekf.read_scan(min_dist=40, max_dist=6000)
+            if scan is None:
+                continue
+            x, y, th = pose
+            b = scan.angles.astype(float) + ekf.angle_offset + th
+            r = scan.dists.astype(float)
+            smap.add_points(x + r * np.cos(b), y + r * np.sin(b))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ekf.close()
+    smap.finalize().save(path)
+    print(f"[STATIC] {smap.n_scans} tours, {np.count_nonzero(smap.static)} cellules statiques -> {path}")
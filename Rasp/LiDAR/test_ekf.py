@@ -19,15 +19,13 @@ print(f"Initialisation à : {init_pose}")
 # On passe init_pose à la création de l'objet
 ekf = EKFLocalizer("/dev/ttyUSB0", init_pose=init_pose)
 
-ekf.start_scan()
+ekf.start_acquisition() # Thread lecteur : chaque tour est publié dès qu'il est complet
 time.sleep(1.0) # Temps de chauffe
 
 print("--- Démarrage Localisation ---")
 
 try:
     while True:
-        ekf.clean_input() # Vider le buffer (Crucial !)
-        
         # Prédiction (indispensable pour la covariance)
         ekf.predict(dt=0.1, v=0.0, w=0.0)
 
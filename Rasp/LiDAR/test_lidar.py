@@ -26,8 +26,8 @@ try:
         if scan is None: continue
         
         # On prend le point le plus proche (supposé être l'objet de test)
-        dists = scan[:, 1]
-        angles = scan[:, 0] # Degrés
+        dists = scan.dists
+        angles = np.degrees(scan.angles) # Degrés
         
         valid = (dists > 50) & (dists < 800) # On regarde juste entre 5cm et 80cm
         if np.any(valid):
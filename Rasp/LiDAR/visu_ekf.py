@@ -206,7 +206,7 @@ class RobotMonitor:
         print("Démarrage EKF...")
         init_pose = (INIT_X, INIT_Y, np.radians(INIT_TH))
         ekf = EKFLocalizer("/dev/ttyUSB0", init_pose=init_pose)
-        ekf.start_scan()
+        ekf.start_acquisition()
         time.sleep(1.0)
         
         while self.running:
@@ -227,16 +227,13 @@ class RobotMonitor:
                         ekf.P = np.eye(3) # Reset covariance brut
                         print("[EKF] Reset Position")
 
-                # 2. Vider le buffer LIDAR
-                ekf.clean_input()
-
-                # 3. PREDICT : On injecte le DELTA calculé
+                # 2. PREDICT : On injecte le DELTA calculé
                 ekf.predict(dt=0.1, dx=dx_cmd, dy=dy_cmd, dtheta=dth_cmd)
                 
-                # 4. LOCATE
+                # 3. LOCATE (dernier tour publié par le thread d'acquisition)
                 pose, nb, obs = ekf.locate_once()
                 
-                # 5. Calcul visuel des points
+                # 4. Calcul visuel des points
                 seen_beacons = []
                 if pose and obs:
                     rx, ry, rth = pose
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Bordures de la table : extraction de segments dans un scan et appariement
+au modèle de la table.
+
+- find_segments : split-and-merge vectorisé sur les points cartésiens
+  (repère LIDAR, ordre angulaire). Toutes les coupures d'un même niveau
+  sont calculées d'un bloc ; chaque segment est ensuite ajusté par moindres
+  carrés totaux à partir de ses moments (x, y, x², xy, y²), ce qui rend la
+  fusion de deux segments voisins immédiate.
+- table_walls / match_walls : droites des quatre bordures (forme polaire,
+  repère table) et affectation segment -> bordure autour d'une pose prédite.
+"""
+import numpy as np
+from lidar_scan import LidarScan
+
+
+# Un segment : droite en forme polaire dans le repère LIDAR
+# (normale alpha en rad, distance rho >= 0 en mm), longueur (mm),
+# nombre de points, écart quadratique des points à la droite (mm), centroïde
+SEGMENT_DTYPE = np.dtype([
+    ("alpha", np.float64), ("rho", np.float64),
+    ("length", np.float32), ("n", np.int32), ("rms", np.float32),
+    ("cx", np.float32), ("cy", np.float32),
+])
+
+
+def _lines_from_moments(m):
+    """
+    Droites de moindres carrés totaux à partir des moments (K, 6) :
+    n, sx, sy, sxx, sxy, syy. Retourne alpha, rho, longueur, rms, cx, cy.
+    """
+    n = m[:, 0]
+    cx, cy = m[:, 1] / n, m[:, 2] / n
+    cxx = m[:, 3] / n - cx * cx
+    cxy = m[:, 4] / n - cx * cy
+    cyy = m[:, 5] / n - cy * cy
+    # Axe principal phi ; la normale est à phi + pi/2
+    alpha = 0.5 * np.arctan2(2.0 * cxy, cxx - cyy) + 0.5 * np.pi
+    rho = cx * np.cos(alpha) + cy * np.sin(alpha)
+    flip = rho < 0.0
+    rho[flip] = -rho[flip]
+    alpha[flip] += np.pi
+    alpha = (alpha + np.pi) % (2 * np.pi) - np.pi
+    half = 0.5 * (cxx + cyy)
+    root = np.sqrt(np.maximum(0.25 * (cxx - cyy) ** 2 + cxy * cxy, 0.0))
+    # Valeurs propres : étalement le long du segment (uniforme : L²/12) et résidu
+    length = np.sqrt(12.0 * np.maximum(half + root, 0.0))
+    rms = np.sqrt(np.maximum(half - root, 0.0))
+    return alpha, rho, length, rms, cx, cy
+
+
+def find_segments(scan: LidarScan, gap=100.0, split_tol=25.0, min_points=8,
+                  min_length=200.0, max_dist=4000.0,
+                  merge_alpha=np.deg2rad(3.0), merge_rho=30.0):
+    """
+    Segments de droite du scan (bordures, flancs d'obstacles).
+    - Les points à plus de max_dist (mm) sont ignorés.
+    - Coupure entre deux voisins angulaires distants de plus de gap (mm).
+    - Split : un morceau est coupé en son point le plus éloigné de la corde
+      tant que cet écart dépasse split_tol (mm). Les morceaux de moins de
+      min_points points ou de corde inférieure à min_length / 2 sont
+      écartés (bruit, pieds de support, flancs arrondis).
+    - Merge : deux segments consécutifs de normales à moins de merge_alpha
+      (rad) et de distances à moins de merge_rho (mm) sont fusionnés.
+    Retourne un tableau structuré SEGMENT_DTYPE (longueur >= min_length), trié par angle.
+    """
+    empty = np.zeros(0, dtype=SEGMENT_DTYPE)
+    if len(scan) < min_points:
+        return empty
+    idx = scan.between(0.0, 2 * np.pi)          # ordre angulaire (index du scan)
+    idx = idx[scan.dists[idx] < max_dist]
+    n = len(idx)
+    if n < min_points:
+        return empty
+    x = scan.x[idx].astype(float)
+    y = scan.y[idx].astype(float)
+
+    # Ruptures (circulaires) ; on démarre sur une rupture pour ne pas couper
+    # en deux la bordure qui chevauche 0°
+    brk = np.hypot(x - np.roll(x, 1), y - np.roll(y, 1)) > gap
+    if brk.any():
+        k = int(np.argmax(brk))
+        x, y, brk = np.roll(x, -k), np.roll(y, -k), np.roll(brk, -k)
+    brk[0] = True
+    s = np.flatnonzero(brk)
+    e = np.append(s[1:], n) - 1
+    keep = (e - s + 1 >= min_points) & (np.hypot(x[e] - x[s], y[e] - y[s]) >= 0.5 * min_length)
+    s, e = s[keep], e[keep]
+
+    # --- Split : tous les morceaux en attente traités d'un bloc par niveau ---
+    done_s, done_e = [], []
+    while len(s):
+        L = e - s + 1
+        off = np.cumsum(L) - L
+        lab = np.repeat(np.arange(len(s)), L)
+        pid = np.arange(int(L.sum())) - np.repeat(off - s, L)
+        ax, ay = x[s], y[s]
+        ux, uy = x[e] - ax, y[e] - ay
+        norm = np.maximum(np.hypot(ux, uy), 1e-9)
+        dist = np.abs((x[pid] - ax[lab]) * uy[lab] - (y[pid] - ay[lab]) * ux[lab]) / norm[lab]
+        dmax = np.maximum.reduceat(dist, off)
+        # Premier point qui atteint l'écart maximal de son morceau
+        kmax = np.minimum.reduceat(np.where(dist == dmax[lab], pid, n), off)
+
+        split = dmax > split_tol
+        done_s.append(s[~split])
+        done_e.append(e[~split])
+        s = np.concatenate((s[split], kmax[split]))
+        e = np.concatenate((kmax[split], e[split]))
+        # Morceaux trop courts (en points ou en corde) pour donner un segment utile
+        keep = (e - s + 1 >= min_points) & (np.hypot(x[e] - x[s], y[e] - y[s]) >= 0.5 * min_length)
+        s, e = s[keep], e[keep]
+
+    if not done_s:
+        return empty            # aucun morceau assez long dès le départ
+    s = np.concatenate(done_s)
+    if len(s) == 0:
+        return empty
+    e = np.concatenate(done_e)
+    o = np.argsort(s)
+    s, e = s[o], e[o]
+
+    # Moments de chaque segment
+    L = e - s + 1
+    off = np.cumsum(L) - L
+    pid = np.arange(int(L.sum())) - np.repeat(off - s, L)
+    px, py = x[pid], y[pid]
+    m = np.column_stack((
+        L.astype(float),
+        np.add.reduceat(px, off), np.add.reduceat(py, off),
+        np.add.reduceat(px * px, off), np.add.reduceat(px * py, off), np.add.reduceat(py * py, off),
+    ))
+
+    # --- Merge : chaînes de segments consécutifs (qui se touchent) et alignés ---
+    alpha, rho = _lines_from_moments(m)[:2]
+    da = np.abs((np.diff(alpha) + np.pi) % (2 * np.pi) - np.pi)
+    join = (s[1:] <= e[:-1] + 1) & (da < merge_alpha) & (np.abs(np.diff(rho)) < merge_rho)
+    first = np.flatnonzero(np.concatenate(([True], ~join)))
+    m = np.add.reduceat(m, first, axis=0)
+
+    alpha, rho, length, rms, cx, cy = _lines_from_moments(m)
+    keep = length >= min_length
+    out = np.zeros(int(np.count_nonzero(keep)), dtype=SEGMENT_DTYPE)
+    out["alpha"], out["rho"] = alpha[keep], rho[keep]
+    out["length"], out["n"], out["rms"] = length[keep], m[keep, 0], rms[keep]
+    out["cx"], out["cy"] = cx[keep], cy[keep]
+    return out
+
+
+def table_walls(bounds):
+    """
+    Bordures de la table ((xmin, xmax), (ymin, ymax)) en forme polaire
+    n . p = c, avec n = (cos a, sin a) : {nom: (a, c)}.
+    """
+    (xmin, xmax), (ymin, ymax) = bounds
+    return {
+        "mur_haut": (0.0, xmin),
+        "mur_bas": (0.0, xmax),
+        "mur_gauche": (0.5 * np.pi, ymin),
+        "mur_droite": (0.5 * np.pi, ymax),
+    }
+
+
+def predict_walls(walls, pose):
+    """
+    Droites attendues dans le repère robot depuis pose : (rho, alpha, signe)
+    pour chaque bordure, signe = +1 si n pointe du robot vers la bordure.
+    """
+    x, y, th = pose
+    a = np.array([w[0] for w in walls.values()])
+    c = np.array([w[1] for w in walls.values()])
+    d = c - np.cos(a) * x - np.sin(a) * y
+    sign = np.where(d >= 0.0, 1.0, -1.0)
+    alpha = a + np.where(sign > 0, 0.0, np.pi) - th
+    return np.abs(d), (alpha + np.pi) % (2 * np.pi) - np.pi, sign
+
+
+def match_walls(segments, walls, pose, angle_offset, rho_window=150.0,
+                alpha_window=np.deg2rad(10.0), min_length=300.0):
+    """
+    Affecte à chaque bordure le segment le plus compatible avec sa droite
+    attendue depuis pose (écarts normalisés par les fenêtres, S x W d'un bloc).
+    Les segments plus courts que min_length (mm) sont ignorés.
+    Retourne une liste de (nom, rho, alpha) mesurés dans le repère robot.
+    """
+    if len(segments) == 0:
+        return []
+    names = list(walls.keys())
+    rho_hat, alpha_hat, _ = predict_walls(walls, pose)
+    seg = segments[segments["length"] >= min_length]
+    if len(seg) == 0:
+        return []
+    a_meas = seg["alpha"] + angle_offset
+    da = (a_meas[:, None] - alpha_hat[None, :] + np.pi) % (2 * np.pi) - np.pi
+    dr = seg["rho"][:, None] - rho_hat[None, :]
+    score = (da / alpha_window) ** 2 + (dr / rho_window) ** 2
+    score[(np.abs(da) > alpha_window) | (np.abs(dr) > rho_window)] = np.inf
+
+    out = []
+    best = np.argmin(score, axis=0)
+    for j, name in enumerate(names):
+        i = best[j]
+        if np.isfinite(score[i, j]):
+            a = (a_meas[i] + np.pi) % (2 * np.pi) - np.pi
+            out.append((name, float(seg["rho"][i]), float(a)))
+    return out
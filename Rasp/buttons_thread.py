@@ -6,6 +6,12 @@ import os
 import random
 import ihm.shared as shared
 
+# Arrêt moteurs direct (sans passer par la stratégie ni la file de commandes)
+try:
+    from interface_deplacement.interface_deplacement import emergency_stop
+except ImportError:
+    emergency_stop = None
+
 # Try Importing GPIO (Mock if not available)
 try:
     import RPi.GPIO as GPIO
@@ -53,6 +59,8 @@ class ButtonsThread:
         }
         # Debounce counters (simple software debounce)
         self.counters = { k: 0 for k in self.last_states }
+        # Heure du premier échantillon du changement en cours (latence du BAU)
+        self.edge_time = { k: None for k in self.last_states }
         self.DEBOUNCE_THRESH = 3 # ticks (at 20Hz approx)
 
     def setup(self):
@@ -144,6 +152,8 @@ class ButtonsThread:
         val = GPIO.input(pin)
         
         if val != self.last_states[pin]:
+            if self.counters[pin] == 0:
+                self.edge_time[pin] = time.monotonic()
             self.counters[pin] += 1
             if self.counters[pin] >= self.DEBOUNCE_THRESH:
                 self.last_states[pin] = val
@@ -152,6 +162,12 @@ class ButtonsThread:
                 if name == "BAU":
                     # BAU Pressed (Closed to 3.3V) -> 1
                     if val == 1: 
+                        # Moteurs d'abord : STOP écrit directement vers l'ESP32
+                        if emergency_stop:
+                            latency = emergency_stop("BAU", t_event=self.edge_time[pin])
+                            if latency is not None:
+                                print(f"[BUTTONS] BAU -> STOP moteurs : {latency:.1f} ms "
+                                      f"(dont anti-rebond {self.DEBOUNCE_THRESH} échantillons)")
                         print("[BUTTONS] 🚨 ARRET D'URGENCE (BAU) !")
                         shared.state['match_running'] = False
                         shared.state['fsm_state'] = "STOPPED"
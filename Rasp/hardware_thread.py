@@ -2,6 +2,7 @@
 import time
 import sys
 import os
+import math
 
 # Imports pour communiquer avec le reste
 import ihm.shared as shared
@@ -10,63 +11,154 @@ import ihm.shared as shared
 try:
     sys.path.append(os.path.join(os.path.dirname(__file__), 'LiDAR'))
     from ekf_localizer import EKFLocalizer
+    from particle_localizer import ParticleLocalizer
+    from opponents import OpponentTracker, obstacle_points
+    from static_map import StaticMap
 except ImportError:
     print("[HARDWARE] Attention: 'ekf_localizer' non trouvé (Mode Simulation ?)")
     EKFLocalizer = None
+    ParticleLocalizer = None
+    OpponentTracker = None
+
+try:
+    from interface_deplacement.interface_deplacement import get_odometry, get_pose_fusion, get_collision_monitor, is_ready
+except ImportError:
+    get_odometry = None
+    get_pose_fusion = None
+    get_collision_monitor = None
+    is_ready = lambda: False
+
+def _collision_listener(ekf, monitor, static_map=None):
+    """Callback de secteur LIDAR : points hors carte statique -> CollisionMonitor.check."""
+    def on_sector(start_deg, end_deg, points, stamp):
+        if not monitor.active or len(points) == 0:
+            return
+        pose = (shared.robot_pos['x'], shared.robot_pos['y'], math.radians(shared.robot_pos['theta']))
+        pts = obstacle_points(points, pose, ekf.angle_offset, ekf.table_bounds, ekf.balises.values(),
+                              static_map=static_map)
+        monitor.check(pts, pose, float(points.times.max()))
+    return on_sector
 
 def hardware_loop():
     print("[HARDWARE] Démarrage du thread capteurs...")
 
     # --- 1. INITIALISATION ---
     ekf = None
+    sectors = None
+    tracker = None
+    # Publicateur unique de shared.robot_pos (odométrie ESP32 recalée par l'EKF)
+    fusion = get_pose_fusion() if get_pose_fusion else None
     if EKFLocalizer and shared.cfg.get("lidar_enabled", True):
         try:
-            ekf = EKFLocalizer("/dev/lidar") 
-            ekf.start_scan()
+            # "standard", "express" ou "dense" (plus de points par balise à débit série égal,
+            # mais sans qualité : pas de recalage global ni de moteur "particles")
+            lidar_cfg = shared.cfg.get("lidar", {})
+            scan_mode = lidar_cfg.get("scan_mode", "standard")
+            # Balises de config.json (sinon valeurs par défaut de l'EKF)
+            balises = {k: tuple(v) for k, v in lidar_cfg.get("beacons", {}).items()} or None
+            # Moteur de localisation : "ekf" (défaut) ou "particles" (multimodal)
+            if lidar_cfg.get("engine", "ekf") == "particles":
+                pf_cfg = lidar_cfg.get("particles", {})
+                ekf = ParticleLocalizer("/dev/lidar", scan_mode=scan_mode, balises=balises,
+                                        n_particles=pf_cfg.get("n_max", 2000),
+                                        n_min=pf_cfg.get("n_min", 300),
+                                        budget_ms=pf_cfg.get("budget_ms", 5.0))
+            else:
+                ekf = EKFLocalizer("/dev/lidar", scan_mode=scan_mode, balises=balises)
+            if "angle_offset_deg" in lidar_cfg:
+                ekf.angle_offset = math.radians(lidar_cfg["angle_offset_deg"])
+            # Bordures de la table en plus des balises (robuste à une balise masquée)
+            ekf.use_walls = lidar_cfg.get("walls", True)
+            # Odométrie horodatée de l'ESP32 : redressement des points pendant le tour
+            if get_odometry:
+                ekf.odom = get_odometry()
+            # Thread lecteur dédié + sortie par secteurs de 30° :
+            # une balise est corrigée dès que son secteur est décodé.
+            # Timeout court : la prédiction suit l'odométrie même sans secteur.
+            sectors = ekf.iter_sectors(sector_deg=30.0, timeout=0.01)
+            # Carte statique apprise en calibration (LiDAR/static_map.py) ;
+            # à défaut, bande des bordures et disques des balises
+            static_map = None
+            map_path = os.path.join(os.path.dirname(__file__), lidar_cfg.get("static_map", "LiDAR/static_map.npz"))
+            if os.path.exists(map_path):
+                static_map = StaticMap.load(map_path)
+                print(f"[HARDWARE] Carte statique chargée ({map_path}).")
+            else:
+                static_map = StaticMap.from_table(ekf.table_bounds, beacons=ekf.balises.values())
+            # Suivi des adversaires, une fois par tour complet
+            tracker = OpponentTracker(static_map=static_map)
+            # Anti-collision : chaque secteur est testé contre la trajectoire en cours
+            # directement dans le thread LIDAR (pas d'attente de la boucle ci-dessous)
+            monitor = get_collision_monitor() if get_collision_monitor else None
+            if monitor:
+                ekf.add_sector_listener(_collision_listener(ekf, monitor, static_map))
             print("[HARDWARE] Lidar & EKF connectés.")
         except Exception as e:
             print(f"[HARDWARE] Erreur init EKF: {e}")
 
     # --- 2. BOUCLE PRINCIPALE ---
-    last_time = time.time()
-    
+    reloc_seq = -1
+    opp_seq = -1
     while True:
         try:
-            # Gestion du Delta Time (dt)
-            now = time.time()
-            dt = now - last_time
-            last_time = now
-
             if ekf:
-                # A. Lecture & Calcul EKF
-                ekf.clean_input() # Vider le buffer pour être temps réel
-                
-                # Prédiction (Odométrie - A récupérer via ESP32 plus tard)
-                # Pour l'instant on met 0,0 si on a pas l'info moteurs
-                ekf.predict(dt=dt, v=0.0, w=0.0)
-                
-                # Correction (Lidar)
-                pose, nb_balises, _ = ekf.locate_once()
-                
-                # B. Mise à jour de l'ETAT PARTAGÉ (Le point clé !)
-                # C'est ici qu'on dit à l'IHM et à la Stratégie où on est
-                if pose:
-                    x, y, theta = pose
-                    shared.robot_pos['x'] = x
-                    shared.robot_pos['y'] = y
-                    shared.robot_pos['theta'] = theta
+                # A. Recalage demandé par la stratégie (set_pos -> SET POSE)
+                reset = fusion.take_reset() if fusion else None
+                if reset is not None:
+                    ekf.reset_pose(reset)
+
+                # B. Prédiction avec les vrais déplacements de l'odométrie ESP32
+                ekf.predict_odometry()
+
+                # B'. Filtre perdu (choc, mauvais recalage) : recalage global
+                # sur le dernier tour complet, une fois par tour
+                relocated = False
+                if ekf.lost:
+                    seq, _, scan = ekf.get_latest_scan()
+                    if scan is not None and seq != reloc_seq:
+                        reloc_seq = seq
+                        relocated = ekf.relocalize(ekf.deskew(scan)) is not None
+                        # Rattache la nouvelle pose au dernier échantillon d'odométrie
+                        ekf.predict_odometry()
+
+                # C. Correction (Lidar) : secteur suivant (attend au plus 10 ms)
+                sector = next(sectors)
+                obs = ekf.update_sector(*sector) if sector else []
+
+                # D. Mise à jour de l'ETAT PARTAGÉ, via le publicateur unique :
+                # la pose EKF recale l'odométrie publiée à pleine cadence
+                if obs or relocated:
+                    if fusion:
+                        fusion.correct(ekf.x, ekf.odom_last[1:] if ekf.odom_last else None,
+                                       ekf.odom_idx - 1)
+                    else:
+                        x, y, theta = (float(v) for v in ekf.x)
+                        shared.robot_pos['x'] = x
+                        shared.robot_pos['y'] = y
+                        shared.robot_pos['theta'] = math.degrees(theta)
                     
                     # (Optionnel) Tu peux logger si perdu
-                    # if nb_balises < 2: print("[HARDWARE] Perdu (1 balise)...")
+                    # if len(obs) < 2: print("[HARDWARE] Perdu (1 balise)...")
+
+                # E. Adversaires : après chaque tour complet, points hors carte
+                # statique -> obstacles -> pistes, publiés avec l'heure du tour
+                seq, _, scan = ekf.get_latest_scan()
+                if tracker and scan is not None and seq != opp_seq and not ekf.lost:
+                    opp_seq = seq
+                    shared.opponents[:] = tracker.process(
+                        ekf.deskew(scan), ekf.x, ekf.angle_offset,
+                        ekf.table_bounds, ekf.balises.values())
 
             else:
                 # Mode Simulation : On fait bouger le robot fake pour tester l'IHM
-                if shared.state["match_running"]:
+                # (si l'ESP32 est là, c'est son odométrie qui est publiée)
+                if shared.state["match_running"] and not is_ready():
                     shared.robot_pos['x'] = (shared.robot_pos['x'] + 2) % 3000
                 time.sleep(0.05) 
 
-            # Pause pour laisser respirer le CPU (20Hz - 50Hz est suffisant)
-            time.sleep(0.02)
+                # Pause pour laisser respirer le CPU (20Hz - 50Hz est suffisant)
+                # (avec l'EKF, c'est l'attente du tour LIDAR suivant qui cadence la boucle)
+                time.sleep(0.02)
 
         except Exception as e:
             print(f"[HARDWARE] Erreur boucle : {e}")
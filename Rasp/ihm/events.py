@@ -34,6 +34,8 @@ def handle_action(data):
             
     elif cmd == 'stop':
         shared.state['match_running'] = False
+        from interface_deplacement.interface_deplacement import emergency_stop
+        emergency_stop("IHM")
         # On ne met pas finished à True pour permettre de reprendre si erreur
         
     elif cmd == 'reset':
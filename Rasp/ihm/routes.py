@@ -156,6 +156,8 @@ def handle_action(act):
         # Arrêt d'urgence
         state['match_running'] = False
         state['fsm_state'] = 'STOPPED'
+        from interface_deplacement.interface_deplacement import emergency_stop
+        emergency_stop("IHM")
         
     elif act == 'reset': 
         # On remet l'état d'attente reconnu par main_strat
@@ -57,6 +57,10 @@ state = {
 # Position Robot Partagée (Mise à jour par le Main, Lue par l'IHM)
 robot_pos = {'x': 1500, 'y': 1000, 'theta': 0}
 
+# Adversaires suivis par le LIDAR (Mis à jour par le thread capteurs, lus par la Strat et l'IHM)
+# Liste de {'id', 'x', 'y', 'vx', 'vy', 't'} : mm, mm/s, time.monotonic() du tour
+opponents = []
+
 def send_led_cmd(cmd):
     if not state["leds_enabled"]: return
     try:
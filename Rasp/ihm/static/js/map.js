@@ -4,6 +4,7 @@ let ctxMap = null;
 let imgTable = new Image();
 let imgRobot = new Image();
 let robotPos = { x: 1500, y: 1000, theta: 0 };
+let opponents = [];   // Adversaires suivis par le LIDAR : {id, x, y, vx, vy, t}
 
 // Initialisation de la page carte
 document.addEventListener('DOMContentLoaded', () => {
@@ -31,6 +32,12 @@ socket.on('robot_position', (pos) => {
     drawMap();
 });
 
+// Réception périodique (10 Hz) : adversaires suivis
+socket.on('map_update', (data) => {
+    opponents = data.opponents || [];
+    drawMap();
+});
+
 // Dessin de la table et du robot
 function drawMap() {
     if (!ctxMap) return;
@@ -55,4 +62,22 @@ function drawMap() {
         ctxMap.drawImage(imgRobot, -size / 2, -size / 2, size, size);
         ctxMap.restore();
     }
+    // Adversaires : disque + vecteur vitesse (position dans 1 s)
+    const scaleX = w / 3000;
+    const scaleY = h / 2000;
+    ctxMap.strokeStyle = '#ff3030';
+    ctxMap.fillStyle = 'rgba(255, 48, 48, 0.35)';
+    ctxMap.lineWidth = 2;
+    for (const o of opponents) {
+        const px = o.x * scaleX;
+        const py = h - (o.y * scaleY);
+        ctxMap.beginPath();
+        ctxMap.arc(px, py, 200 * scaleX, 0, 2 * Math.PI);
+        ctxMap.fill();
+        ctxMap.stroke();
+        ctxMap.beginPath();
+        ctxMap.moveTo(px, py);
+        ctxMap.lineTo(px + o.vx * scaleX, py - o.vy * scaleY);
+        ctxMap.stroke();
+    }
 }
@@ -4,8 +4,12 @@ import psutil
 import os
 import numpy as np
 # On assure d'importer robot_pos
-from ihm.shared import socketio, state, audio, send_led_cmd, robot_pos 
+from ihm.shared import socketio, state, audio, send_led_cmd, robot_pos, opponents
 from utils import get_ip, get_battery_voltage, get_cpu_temp, get_battery_current
+try:
+    from interface_deplacement.interface_deplacement import emergency_stop
+except ImportError:
+    emergency_stop = None
 
 def background_loop():
     print("[IHM] Background loop démarrée.")
@@ -17,6 +21,8 @@ def background_loop():
             remaining = 100.0 - elapsed
             if remaining <= 0:
                 state["timer_str"] = "0.0"; state["match_running"] = False; state["match_finished"] = True
+                # Fin de match : moteurs arrêtés sans attendre la stratégie
+                if emergency_stop: emergency_stop("fin de match")
                 if state["music_enabled"] and audio: audio.stop(); audio.play('end')
                 send_led_cmd("MATCH_STOP"); socketio.emit('state_update', state)
             else:
@@ -42,7 +48,8 @@ def background_loop():
         # --- 3. AJOUT : Envoi Position Robot (Map) ---
         # C'est ce qui manquait pour que la page /map bouge !
         socketio.emit('map_update', {
-            'pos': robot_pos
+            'pos': robot_pos,
+            'opponents': opponents
         })
         # ---------------------------------------------
 
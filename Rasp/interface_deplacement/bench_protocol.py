@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Banc de latence commande -> mouvement sans ESP32 branché : DeplacementServer
+relié au simulateur esp32_sim.FakeESP32 (liaison 115200 bauds simulée).
+
+Mesure, pour chaque façon d'envoyer une trajectoire, le temps entre
+envoyer(trajectoire) et la fin de sa réception par l'ESP32 (le robot peut
+partir). Chaque gain est rapporté à la ligne qui ne diffère que par ce
+changement : pause de 50 ms supprimée (ancien envoi SET POSE, pause, JSON,
+rejoué ici), format binaire (mêmes 50 points), échantillonnage adaptatif
+(même format), puis le gain total. Ensuite les
+allers-retours commande -> acquittement par type de commande, la
+latence d'un arrêt derrière des trajectoires en file, la reprise sur une
+trame tronquée, et au repos le débit d'odométrie reçu et la charge CPU des
+threads du serveur.
+
+Usage (depuis Rasp/) : python3 -m interface_deplacement.bench_protocol [nb_essais]
+"""
+import os
+import sys
+import threading
+import time
+import numpy as np
+import interface_deplacement.interface_deplacement as dep
+from interface_deplacement import bezier
+from interface_deplacement.esp32_sim import FakeESP32
+
+N_TRIES = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def thread_cpu(threads):
+    """Temps CPU (s) cumulé des threads donnés (Linux, /proc/self/task)."""
+    tick = os.sysconf("SC_CLK_TCK")
+    total = 0
+    for th in threads:
+        with open(f"/proc/self/task/{th.native_id}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        total += int(fields[11]) + int(fields[12])      # utime + stime
+    return total / tick
+
+
+def server_threads(server):
+    return [th for th in threading.enumerate()
+            if th is server or th.name.startswith("DeplacementServer")]
+
+
+def latency(server, esp, traj, pause=None):
+    """pause (s) : ancien envoi, SET POSE puis attente fixe avant la trajectoire."""
+    n0 = len(esp.loaded)
+    t0 = time.monotonic()
+    if pause is not None:
+        dep.envoyer("SET POSE 0 0 0")
+        time.sleep(pause)
+    dep.envoyer(traj)
+    while len(esp.loaded) == n0:
+        time.sleep(0.0005)
+    t_loaded, n, size = esp.loaded[-1]
+    dep.wait_idle(timeout=0.01)
+    return (t_loaded - t0) * 1e3, size
+
+
+if __name__ == "__main__":
+    sims = []
+    server = dep.init(opener=lambda **kw: sims.append(FakeESP32(speed=5000.0, **kw)) or sims[-1])
+    while not server.is_connected or not sims:
+        time.sleep(0.01)
+    esp = sims[-1]
+
+    P = ((300.0, -1000.0), (800.0, -1000.0), (1200.0, 600.0), (1700.0, 1000.0))
+    fixed = bezier.bezier_cubique_discret(50, *P)
+    adaptive = bezier.bezier_trajectoire(*P)
+    # (nom, binaire, trajectoire, pause, référence du gain, changement mesuré)
+    cases = [
+        ("JSON + pause 50 ms", False, fixed, 0.05, None, ""),
+        ("JSON, 50 points en t", False, fixed, None, "JSON + pause 50 ms", "sans la pause"),
+        ("binaire, 50 points en t", True, fixed, None, "JSON, 50 points en t", "format binaire"),
+        ("binaire, adaptatif", True, adaptive, None, "binaire, 50 points en t", "échantillonnage"),
+    ]
+    medians = {}
+    for name, binary, traj, pause, ref, what in cases:
+        server.binary = binary
+        res = [latency(server, esp, traj, pause) for _ in range(N_TRIES)]
+        ms = np.array([r[0] for r in res])
+        medians[name] = med = float(np.median(ms))
+        gain = f"x{medians[ref] / med:.1f} ({what})" if ref else "référence"
+        print(f"{name:26s} {len(traj):3d} pts {res[0][1]:5d} o  "
+              f"médiane={med:6.1f} ms  max={ms.max():6.1f} ms  {gain}")
+    total = medians["JSON + pause 50 ms"] / medians["binaire, adaptatif"]
+    print(f"{'gain total':26s} x{total:.1f}")
+
+    # Allers-retours acquittés (écriture -> ACK) par type de commande
+    e2e = []
+    for _ in range(N_TRIES):
+        dep.envoyer("SET POSE 0 0 0").wait(timeout=1.0)
+        t0 = time.monotonic()
+        dep.envoyer("SPEED 350").wait(timeout=1.0)
+        e2e.append((time.monotonic() - t0) * 1e3)
+        time.sleep(0.003)
+    for kind, (n, med, p99) in sorted(dep.command_stats().items()):
+        print(f"aller-retour {kind:14s} n={n:3d}  médiane={med:6.1f} ms  p99={p99:6.1f} ms")
+    print(f"envoyer -> ACK (SPEED)       médiane={np.median(e2e):6.1f} ms  max={max(e2e):6.1f} ms")
+
+    # Arrêt d'urgence derrière des trajectoires en file : heure de l'événement
+    # -> STOP reçu par l'ESP32. La trajectoire déjà en cours d'écriture ne
+    # peut pas être rattrapée, les suivantes sont fusionnées ou annulées.
+    traj = bezier.bezier_cubique_discret(50, *P)
+
+    def stop_arrival(t0):
+        while True:
+            # Ligne numérotée reconnue par l'ESP32 (pas un reste de trame)
+            hits = [t for t, line in esp.lines if line.startswith("#") and line.endswith(" STOP") and t >= t0]
+            if hits:
+                return (hits[0] - t0) * 1e3
+            time.sleep(0.0005)
+
+    for binary in (True, False):
+        server.binary = binary
+        ms, n_loaded = [], []
+        for _ in range(N_TRIES // 2 or 1):
+            n0 = len(esp.loaded)
+            for _ in range(4):
+                dep.envoyer(traj)
+            t0 = time.monotonic()
+            dep.emergency_stop("banc")
+            ms.append(stop_arrival(t0))
+            time.sleep(0.2)
+            n_loaded.append(len(esp.loaded) - n0)
+        name = "binaire" if binary else "JSON"
+        print(f"arrêt, 4 trajectoires en file ({name:7s}) -> {np.mean(n_loaded):.1f} chargée(s), "
+              f"STOP reçu en médiane={np.median(ms):6.1f} ms  max={max(ms):6.1f} ms")
+    server.binary = True
+
+    # Liaison perturbée : octets perdus au milieu d'une trame. L'ESP32 la
+    # lâche après FRAME_TIMEOUT de silence ("NAK seq delai") et la Rasp la
+    # renvoie ; un STOP écrit derrière la trame tronquée n'est pas perdu.
+    traj = bezier.bezier_trajectoire(*P)
+    ms, n_resent = [], 0
+    for _ in range(N_TRIES // 2 or 1):
+        n0 = len(esp.loaded)
+        esp.lose_bytes(3)
+        t0 = time.monotonic()
+        cmd = dep.envoyer(traj)
+        ok = cmd.wait(timeout=1.0)
+        n_resent += cmd.resends
+        if ok:
+            ms.append((esp.loaded[-1][0] - t0) * 1e3)
+        dep.wait_idle(timeout=1.0)
+    print(f"trame tronquée -> renvoi      {len(ms)}/{N_TRIES // 2 or 1} chargées ({n_resent} renvois), "
+          f"médiane={np.median(ms):6.1f} ms  max={max(ms):6.1f} ms")
+    ms, n_loaded = [], []
+    for _ in range(N_TRIES // 2 or 1):
+        n0 = len(esp.loaded)
+        esp.lose_bytes(3)
+        dep.envoyer(traj)
+        time.sleep(0.005)               # la trame est en cours d'émission
+        t0 = time.monotonic()
+        dep.emergency_stop("banc")
+        ms.append(stop_arrival(t0))
+        time.sleep(0.1)
+        n_loaded.append(len(esp.loaded) - n0)
+    print(f"trame tronquée puis arrêt     {np.mean(n_loaded):.1f} trajectoire(s) chargée(s), "
+          f"STOP reçu en médiane={np.median(ms):6.1f} ms  max={max(ms):6.1f} ms")
+
+    # Au repos : débit des lignes d'odométrie reçues (100 Hz publiées) et
+    # CPU des threads du serveur seuls (hors simulateur)
+    time.sleep(0.5)
+    threads = server_threads(server)
+    n0, c0, t0 = server.odom.count, thread_cpu(threads), time.monotonic()
+    time.sleep(5.0)
+    dt = time.monotonic() - t0
+    print(f"odométrie reçue : {(server.odom.count - n0) / dt:.1f} lignes/s, "
+          f"CPU du serveur au repos : {100.0 * (thread_cpu(threads) - c0) / dt:.1f} % "
+          f"({len(threads)} threads)")
+    server.running = False
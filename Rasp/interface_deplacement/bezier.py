@@ -1,4 +1,8 @@
 import numpy as np
+from functools import lru_cache
+
+# Nombre maximal de points acceptés par le TrajectoryFollower de l'ESP32
+MAX_POINTS = 50
 
 # === Fonction de Bézier cubique ===
 def bezier_cubique(t, P0, P1, P2, P3):
@@ -14,21 +18,67 @@ def bezier_cubique(t, P0, P1, P2, P3):
         t**3 * P3
     )
 
+# === Bases de Bernstein (mises en cache par nombre de points) ===
+@lru_cache(maxsize=16)
+def _bases(n):
+    """
+    Bases de Bernstein (n, 4) de la courbe et de ses dérivées première et
+    seconde pour n valeurs de t régulières sur [0, 1] : une courbe entière
+    s'évalue alors en un seul produit matriciel B @ P, P = (4, 2).
+    """
+    t = np.linspace(0.0, 1.0, n)
+    u = 1.0 - t
+    B = np.column_stack((u**3, 3 * u**2 * t, 3 * u * t**2, t**3))
+    dB = np.column_stack((-3 * u**2, 3 * u**2 - 6 * u * t, 6 * u * t - 3 * t**2, 3 * t**2))
+    d2B = np.column_stack((6 * u, 6 * t - 12 * u, 6 * u - 12 * t, 6 * t))
+    for M in (B, dB, d2B):
+        M.flags.writeable = False
+    return B, dB, d2B
+
+def _controles(P0, P1, P2, P3):
+    return np.array((P0, P1, P2, P3), dtype=float)[:, :2]
+
 # === Calcul de la courbe pour plusieurs valeurs de t ===
 def bezier_cubique_discret(n, P0, P1, P2, P3):
     """
-    Génère n points le long de la courbe.
-    Convertit automatiquement les entrées (tuples) en vecteurs numpy.
+    Génère n points le long de la courbe (t régulier).
+    Les entrées (tuples) sont converties en un tableau de contrôle (4, 2).
     """
-    # --- CORRECTION CRITIQUE ICI ---
-    # On transforme les tuples (x,y) en array numpy pour permettre les maths (multiplication par float)
-    P0 = np.array(P0)
-    P1 = np.array(P1)
-    P2 = np.array(P2)
-    P3 = np.array(P3)
-    # -------------------------------
-
-    t_vals = np.linspace(0, 1, n)
-    
     # On retourne un tableau de points
-    return np.array([bezier_cubique(t, P0, P1, P2, P3) for t in t_vals])
\ No newline at end of file
+    return _bases(n)[0] @ _controles(P0, P1, P2, P3)
+
+# === Trajectoire échantillonnée pour l'ESP32 ===
+def bezier_trajectoire(P0, P1, P2, P3, max_step=150.0, min_step=20.0,
+                       chord_tol=2.0, max_points=MAX_POINTS, n_dense=256):
+    """
+    Trajectoire (N, 2) float32 en mm le long de la courbe, échantillonnée en
+    abscisse curviligne (et non en t) avec un pas adapté à la courbure :
+    le pas ds est le plus grand qui garde l'écart corde / arc sous chord_tol
+    (écart ~ k ds² / 8 pour une courbure k), borné entre min_step et max_step.
+    Une ligne droite donne donc peu de points, un virage serré beaucoup.
+    Si plus de max_points points sont nécessaires, le pas est élargi
+    uniformément. Le premier et le dernier point sont P0 et P3.
+    """
+    P = _controles(P0, P1, P2, P3)
+    B, dB, d2B = _bases(n_dense)
+    pts, d1, d2 = B @ P, dB @ P, d2B @ P
+
+    # Abscisse curviligne (cordes du découpage fin) et courbure
+    s = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(pts, axis=0).T))))
+    length = s[-1]
+    if length < 1e-6:
+        return P[[0, 3]].astype(np.float32)
+    speed = np.hypot(d1[:, 0], d1[:, 1])
+    k = np.abs(d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]) / np.maximum(speed ** 3, 1e-9)
+
+    # Densité de points (1 / pas) intégrée le long de la courbe
+    ds = np.clip(np.sqrt(8.0 * chord_tol / np.maximum(k, 1e-12)), min_step, max_step)
+    dens = 1.0 / ds
+    cum = np.concatenate(([0.0], np.cumsum(0.5 * (dens[1:] + dens[:-1]) * np.diff(s))))
+    n = int(np.clip(np.ceil(cum[-1]), 1, max_points - 1))
+
+    # n intervalles de même "masse" de densité -> abscisses, puis positions
+    s_out = np.interp(np.linspace(0.0, cum[-1], n + 1), cum, s)
+    out = np.column_stack((np.interp(s_out, s, pts[:, 0]), np.interp(s_out, s, pts[:, 1])))
+    out[0], out[-1] = P[0], P[3]
+    return out.astype(np.float32)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Vérifications du canal de commandes vers l'ESP32 sans matériel : règles de
+la file (CommandScheduler), puis DeplacementServer relié au simulateur
+esp32_sim.FakeESP32 avec des défauts injectés (écriture lente, octet abîmé,
+câble débranché). Contrairement à bench_protocol, chaque cas est vérifié
+(assert) : c'est ce canal qui décide si un STOP arrive.
+
+- ACK reçu avant le retour de write() : la commande est bien acquittée ;
+- NAK crc : un seul renvoi, la commande abîmée deux fois échoue ;
+- pas de renvoi d'une trajectoire abîmée après un STOP ;
+- déconnexion : les commandes en cours échouent, puis reconnexion.
+
+Usage (depuis Rasp/) : python3 -m interface_deplacement.check_protocol
+"""
+import time
+import interface_deplacement.interface_deplacement as dep
+from interface_deplacement import bezier
+from interface_deplacement.commands import CommandError, CommandScheduler, CommandTracker
+from interface_deplacement.esp32_sim import FakeESP32
+
+P = ((300.0, -1000.0), (800.0, -1000.0), (1200.0, 600.0), (1700.0, 1000.0))
+
+
+class FaultyESP32(FakeESP32):
+    """FakeESP32 dont on peut abîmer les prochaines écritures, vu de la Rasp."""
+
+    def __init__(self, **kw):
+        self.write_delay = 0.0      # write() rend la main après ce délai (s)
+        self.t_written = None       # heure du dernier retour de write()
+        self.corrupt = 0            # nombre de prochaines écritures abîmées (un octet)
+        self.broken = False         # câble débranché : write() lève OSError
+        self.naks = []              # (seq, raison) envoyés à la Rasp
+        super().__init__(**kw)
+
+    def write(self, data):
+        if self.broken:
+            raise OSError("câble débranché")
+        if self.corrupt:
+            self.corrupt -= 1
+            data = bytearray(data)
+            data[len(data) // 2] ^= 0x01
+        n = super().write(data)
+        time.sleep(self.write_delay)
+        self.t_written = time.monotonic()
+        return n
+
+    def _println(self, text):
+        if text.startswith("NAK"):
+            _, seq, reason = text.split()
+            self.naks.append((int(seq), reason))
+        super()._println(text)
+
+
+def wait_until(cond, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def failed(future, timeout=1.0):
+    """Exception (CommandError attendue) du Future, None s'il a réussi."""
+    try:
+        future.result(timeout)
+    except CommandError as e:
+        return e
+    return None
+
+
+# ---------------------
+# File des commandes (sans liaison)
+# ---------------------
+
+def check_scheduler():
+    tracker, queue = CommandTracker(), CommandScheduler()
+
+    def put(message):
+        cmd = tracker.new(message)
+        queue.put(cmd, message)
+        return cmd
+
+    # Fusion : seule la dernière trajectoire et le dernier SPEED restent
+    t1, s1, pose, t2, s2 = put([[0, 0]]), put("SPEED 100"), put("SET POSE 0 0 0"), put([[1, 1]]), put("SPEED 200")
+    assert failed(t1.acked) and failed(s1.acked), "consignes remplacées non échouées"
+    assert [c for c, _ in queue.drain()] == [pose, t2, s2], "ordre de la voie normale"
+
+    # STOP : passe devant, annule trajectoires et vitesses, garde le reste
+    t3, pose, s3, stop = put([[2, 2]]), put("SET POSE 1 1 0"), put("SPEED 300"), put("STOP")
+    assert failed(t3.acked) and failed(t3.done) and failed(s3.acked), "STOP n'a pas purgé la file"
+    assert not pose.acked.done(), "STOP a purgé un SET POSE"
+    assert [c for c, _ in queue.drain()] == [stop, pose], "STOP pas en tête"
+
+    # Renvoi : en tête de voie normale, sauf si un STOP ou une consigne plus récente attend
+    pose, t4 = put("SET POSE 2 2 0"), tracker.new([[3, 3]])
+    assert queue.retry(t4, t4.message) and queue.get(0)[0] is t4, "renvoi pas en tête"
+    queue.drain()
+    put([[4, 4]])
+    assert not queue.retry(t4, t4.message) and failed(t4.acked), "renvoi malgré une trajectoire plus récente"
+    t5 = tracker.new([[5, 5]])
+    put("STOP")
+    assert not queue.retry(t5, t5.message) and failed(t5.acked), "renvoi malgré un STOP en file"
+    queue.drain()
+
+
+# ---------------------
+# Liaison simulée
+# ---------------------
+
+def check_ack_before_write(esp):
+    """L'ESP32 répond pendant que write() n'a pas rendu la main."""
+    esp.write_delay = 0.05
+    esp.t_written = None
+    t_ack = []
+    cmd = dep.envoyer("SPEED 5000")
+    cmd.acked.add_done_callback(lambda f: t_ack.append(time.monotonic()))
+    try:
+        assert failed(cmd.acked) is None, "ACK perdu (commande enregistrée après l'écriture)"
+        assert wait_until(lambda: esp.t_written is not None)
+    finally:
+        esp.write_delay = 0.0
+    assert t_ack[0] < esp.t_written, "l'ACK n'est pas arrivé avant le retour de write()"
+    assert cmd.resends == 0
+
+
+def check_crc_resend(esp, traj):
+    """Trame abîmée une fois : renvoyée une fois ; deux fois : échoue."""
+    n0 = len(esp.loaded)
+    esp.corrupt = 1
+    cmd = dep.envoyer(traj)
+    assert cmd.wait(timeout=1.0), "trajectoire non renvoyée après NAK crc"
+    assert (cmd.seq, "crc") in esp.naks, "pas de NAK crc"
+    assert cmd.resends == 1 and len(esp.loaded) == n0 + 1
+    assert dep.wait_idle(timeout=2.0)
+
+    n0 = len(esp.loaded)
+    esp.corrupt = 2
+    cmd = dep.envoyer(traj)
+    e = failed(cmd.acked)
+    assert e is not None and "crc" in str(e), "trajectoire abîmée deux fois acceptée"
+    assert esp.naks.count((cmd.seq, "crc")) == 2 and cmd.resends == 1, "plus d'un renvoi"
+    assert failed(cmd.done)
+    time.sleep(0.1)
+    assert len(esp.loaded) == n0, "trajectoire chargée malgré deux NAK"
+
+
+def check_no_resend_after_stop(esp, traj):
+    """Trame abîmée, STOP écrit derrière : elle n'est pas renvoyée."""
+    n0, n_stop = len(esp.loaded), len(esp.lines)
+    esp.corrupt = 1
+    cmd = dep.envoyer(traj)
+    assert wait_until(lambda: cmd.t_sent is not None)
+    dep.emergency_stop("vérification")
+    assert wait_until(lambda: (cmd.seq, "crc") in esp.naks), "pas de NAK crc"
+    assert failed(cmd.acked) and cmd.resends == 0, "trajectoire renvoyée après un STOP"
+    assert wait_until(lambda: any(line.endswith(" STOP") for _, line in esp.lines[n_stop:])), "STOP perdu"
+    time.sleep(0.1)
+    assert len(esp.loaded) == n0, "trajectoire chargée après un STOP"
+
+
+def check_disconnect(server, sims, traj):
+    """Écriture impossible : tout ce qui est en cours échoue, puis reconnexion."""
+    esp = sims[-1]
+    move = dep.envoyer(traj)
+    assert move.wait(timeout=1.0) and not move.done.done(), "trajectoire pas en cours"
+    esp.broken = True
+    speed = dep.envoyer("SPEED 5000")
+    assert failed(speed.acked), "commande non échouée à la déconnexion"
+    assert failed(move.done), "trajectoire en cours non échouée à la déconnexion"
+    assert wait_until(lambda: len(sims) == 2 and server.is_connected, timeout=5.0), "pas de reconnexion"
+    assert dep.envoyer("SPEED 5000").wait(timeout=1.0), "liaison inutilisable après reconnexion"
+
+
+if __name__ == "__main__":
+    check_scheduler()
+    print("file des commandes (fusion, STOP, renvoi)   OK")
+
+    sims = []
+    server = dep.init(opener=lambda **kw: sims.append(FaultyESP32(speed=5000.0, **kw)) or sims[-1])
+    assert wait_until(lambda: server.is_connected and sims, timeout=5.0)
+    server.binary = True
+    esp = sims[-1]
+    traj = bezier.bezier_trajectoire(*P)
+
+    check_ack_before_write(esp)
+    print("ACK avant le retour de write()               OK")
+    check_crc_resend(esp, traj)
+    print("NAK crc -> un seul renvoi                    OK")
+    check_no_resend_after_stop(esp, traj)
+    print("pas de renvoi après un STOP                  OK")
+    check_disconnect(server, sims, traj)
+    print("déconnexion -> échec des commandes en cours  OK")
+    server.running = False
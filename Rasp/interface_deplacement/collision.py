@@ -0,0 +1,160 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+
+
+class CollisionMonitor:
+    """
+    Surveillance de la trajectoire en cours contre les obstacles LIDAR.
+
+    La trajectoire envoyée à l'ESP32 (polyligne, repère table, mm) est gardée
+    jusqu'à sa fin. Chaque secteur LIDAR (points déjà dans le repère table)
+    est confronté à l'empreinte balayée du robot sur la portion restante :
+    un point à moins de radius mm de la polyligne bloque le passage à
+    l'abscisse curviligne où il se projette. Le temps avant collision
+    (distance / vitesse mesurée par l'odométrie) décide de l'action :
+        - ttc < ttc_stop ou obstacle à moins de stop_dist : STOP immédiat ;
+        - ttc < ttc_slow : ralentissement (SPEED slow_speed), levé quand plus
+          aucun secteur n'a vu d'obstacle depuis clear_time s, soit un tour
+          complet (SPEED nominal_speed).
+
+    send(cmd) écrit la commande sur la liaison série sans passer par la file
+    et retourne l'heure d'écriture (time.monotonic()) : le temps de réaction,
+    de l'arrivée du dernier point du secteur à l'écriture de la commande,
+    est mesuré à chaque déclenchement (reaction_ms).
+    """
+
+    def __init__(self, send, odom=None, radius=230.0, lookahead=1500.0,
+                 ttc_stop=0.6, ttc_slow=1.5, stop_dist=250.0,
+                 nominal_speed=350.0, slow_speed=150.0, clear_time=0.2):
+        self.send = send
+        self.odom = odom
+        self.radius = radius                # demi-largeur du robot + marge (mm)
+        self.lookahead = lookahead          # portion de trajectoire surveillée (mm)
+        self.ttc_stop = ttc_stop            # s
+        self.ttc_slow = ttc_slow            # s
+        self.stop_dist = stop_dist          # mm
+        self.nominal_speed = nominal_speed  # mm/s, vitesse nominale de l'ESP32
+        self.slow_speed = slow_speed        # mm/s
+        self.clear_time = clear_time        # s sans obstacle avant de réaccélérer
+
+        self._lock = threading.Lock()
+        self._traj = None
+        self._cum = None
+        self.slowed = False
+        self.stopped = False                # dernier trajet interrompu par un STOP
+        self.last_ttc = math.inf
+        self._last_hit = -math.inf
+        self.reaction_ms = deque(maxlen=200)
+
+    # ---------------------
+    # Trajectoire courante
+    # ---------------------
+
+    def set_trajectory(self, points):
+        """Nouvelle trajectoire (N, 2) en mm, repère table."""
+        traj = np.asarray(points, dtype=float)[:, :2].copy()
+        cum = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(traj, axis=0).T))))
+        with self._lock:
+            self._traj, self._cum = traj, cum
+            restore, self.slowed = self.slowed, False
+            self.stopped = False
+        # L'ESP32 garde sa consigne : on repart à la vitesse nominale
+        if restore:
+            self.send(f"SPEED {self.nominal_speed:.0f}")
+
+    def clear(self):
+        """Trajectoire terminée ou abandonnée (la consigne de vitesse reste en l'état)."""
+        with self._lock:
+            self._traj = self._cum = None
+
+    @property
+    def active(self):
+        return self._traj is not None
+
+    def speed(self, window=0.1):
+        """Vitesse linéaire (mm/s) sur les window dernières secondes d'odométrie."""
+        if self.odom is None:
+            return self.nominal_speed
+        hist = self.odom.snapshot()
+        if len(hist) < 2:
+            return 0.0
+        recent = hist[hist[:, 0] >= hist[-1, 0] - window]
+        if len(recent) < 2:
+            recent = hist[-2:]
+        dt = recent[-1, 0] - recent[0, 0]
+        if dt <= 0.0:
+            return 0.0
+        return math.hypot(recent[-1, 1] - recent[0, 1], recent[-1, 2] - recent[0, 2]) / dt
+
+    # ---------------------
+    # Contrôle par secteur
+    # ---------------------
+
+    def time_to_collision(self, points, pose):
+        """
+        Distance (mm) le long de la trajectoire restante jusqu'au premier
+        obstacle de points (M, 2) dans l'empreinte balayée, depuis pose
+        (x, y en mm). Retourne math.inf si le passage est libre.
+        """
+        with self._lock:
+            traj, cum = self._traj, self._cum
+        if traj is None or len(points) == 0 or len(traj) < 2:
+            return math.inf
+
+        # Avancement : sommet le plus proche du robot, puis fenêtre de lookahead
+        px, py = pose[0], pose[1]
+        i0 = int(np.argmin(np.hypot(traj[:, 0] - px, traj[:, 1] - py)))
+        i0 = min(i0, len(traj) - 2)
+        i1 = int(np.searchsorted(cum, cum[i0] + self.lookahead, side="right"))
+        A = np.vstack(((px, py), traj[i0 + 1:max(i1, i0 + 2)]))
+        seg = np.diff(A, axis=0)                                   # (S, 2)
+        seg_len = np.hypot(seg[:, 0], seg[:, 1])
+        s0 = np.concatenate(([0.0], np.cumsum(seg_len)[:-1]))
+
+        # Distance de chaque point à chaque segment (M x S d'un bloc)
+        P = np.asarray(points, dtype=float)
+        rel = P[:, None, :] - A[None, :-1, :]
+        u = np.einsum("msk,sk->ms", rel, seg) / np.maximum(seg_len * seg_len, 1e-9)
+        np.clip(u, 0.0, 1.0, out=u)
+        d = np.hypot(rel[..., 0] - u * seg[:, 0], rel[..., 1] - u * seg[:, 1])
+        hit = d < self.radius
+        if not hit.any():
+            return math.inf
+        return float(np.min((s0 + u * seg_len)[hit]))
+
+    def check(self, points, pose, t_sample):
+        """
+        Contrôle d'un secteur : points (M, 2) repère table, pose (x, y) du
+        robot, t_sample heure d'arrivée du dernier point (time.monotonic()).
+        Retourne la commande envoyée ("STOP", "SPEED ...") ou None.
+        """
+        if not self.active:
+            return None
+        dist = self.time_to_collision(points, pose)
+        v = self.speed()
+        ttc = dist / max(v, 1.0)
+        self.last_ttc = ttc
+        if not math.isinf(dist):
+            self._last_hit = t_sample
+
+        if dist < self.stop_dist or ttc < self.ttc_stop:
+            cmd = "STOP"
+            self.clear()
+            self.stopped = True
+        elif ttc < self.ttc_slow and not self.slowed:
+            cmd = f"SPEED {self.slow_speed:.0f}"
+            self.slowed = True
+        elif self.slowed and t_sample - self._last_hit > self.clear_time:
+            cmd = f"SPEED {self.nominal_speed:.0f}"
+            self.slowed = False
+        else:
+            return None
+
+        t_written = self.send(cmd)
+        reaction = (t_written - t_sample) * 1e3
+        self.reaction_ms.append(reaction)
+        print(f"[COLLISION] {cmd} (obstacle à {dist:.0f} mm, ttc={ttc:.2f} s, "
+              f"réaction {reaction:.1f} ms)")
+        return cmd
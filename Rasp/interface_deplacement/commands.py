@@ -0,0 +1,294 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+
+class CommandError(Exception):
+    """Commande refusée par l'ESP32 (NAK), perdue (timeout) ou liaison coupée."""
+
+
+# Refus dus à la liaison (trame abîmée, incomplète ou mal numérotée) :
+# la commande elle-même est bonne, elle est renvoyée (voir CommandTracker.on_nak)
+RESEND_REASONS = ("crc", "trame", "delai")
+
+
+def command_kind(message):
+    """Type d'une commande pour les statistiques : TRAJ, SET_POSE, POSE, STOP, SPEED..."""
+    if not isinstance(message, str):
+        return "TRAJ"
+    if message.startswith("SET POSE"):
+        return "SET_POSE"
+    return message.split(maxsplit=1)[0] if message.strip() else "?"
+
+
+class Command:
+    """
+    Une commande numérotée vers l'ESP32.
+
+    - seq : numéro de séquence (1..255), repris par l'ESP32 dans sa réponse ;
+    - acked : Future résolu à l'acquittement ("ACK seq") avec la durée
+      aller-retour (s), ou en erreur (CommandError) sur "NAK seq raison",
+      absence de réponse ou déconnexion ;
+    - done : pour une trajectoire, Future résolu à l'arrivée ("DONE seq")
+      avec la durée du trajet (s) ; None sinon ;
+    - resends : nombre de renvois après une erreur de liaison.
+    """
+
+    __slots__ = ("seq", "kind", "message", "t_queued", "t_sent", "acked", "done", "resends")
+
+    def __init__(self, seq, kind, message):
+        self.seq = seq
+        self.kind = kind
+        self.message = message
+        self.t_queued = time.monotonic()
+        self.t_sent = None
+        self.acked = Future()
+        self.done = Future() if kind == "TRAJ" else None
+        self.resends = 0
+
+    def wait(self, timeout=None):
+        """Attend l'acquittement ; True si accepté, False si refusé ou sans réponse."""
+        try:
+            self.acked.result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def __repr__(self):
+        return f"Command(#{self.seq} {self.kind})"
+
+
+class CommandTracker:
+    """
+    Numérotation des commandes et suivi des réponses de l'ESP32.
+
+    new() attribue un numéro, sent() enregistre la commande juste avant son
+    écriture (l'ACK peut arriver avant le retour de write), unsent() l'annule
+    si l'écriture échoue, on_ack / on_nak / on_done résolvent les Future.
+    expire() fait échouer les commandes sans réponse après ack_timeout s
+    (firmware sans acquittement, ligne perdue).
+    Les durées aller-retour sont gardées par type de commande (stats()).
+    """
+
+    def __init__(self, ack_timeout=0.5, history=200, max_resends=1):
+        self.ack_timeout = ack_timeout
+        self.max_resends = max_resends
+        self._t_stop = 0.0          # heure du dernier STOP (cancel_moves)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pending = {}          # seq -> Command en attente d'acquittement
+        self._moving = {}           # seq -> trajectoire acquittée, en attente de DONE
+        self.rtt = {}               # type -> deque des allers-retours (s)
+        self._history = history
+
+    def new(self, message):
+        with self._lock:
+            self._seq = self._seq % 255 + 1
+            cmd = Command(self._seq, command_kind(message), message)
+            old = self._pending.pop(cmd.seq, None)
+        if old is not None:
+            _fail(old.acked, CommandError(f"#{old.seq} remplacée avant réponse"))
+        return cmd
+
+    def sent(self, cmd):
+        """Commande sur le point d'être écrite : début de l'aller-retour."""
+        cmd.t_sent = time.monotonic()
+        with self._lock:
+            self._pending[cmd.seq] = cmd
+
+    def unsent(self, cmd, reason):
+        """L'écriture de cmd a échoué : elle n'attend plus de réponse."""
+        with self._lock:
+            if self._pending.get(cmd.seq) is cmd:
+                del self._pending[cmd.seq]
+        _fail(cmd.acked, CommandError(f"#{cmd.seq} {cmd.kind} non envoyée : {reason}"))
+        if cmd.done is not None:
+            _fail(cmd.done, CommandError(f"#{cmd.seq} non envoyée"))
+
+    def on_ack(self, seq, t=None):
+        t = time.monotonic() if t is None else t
+        with self._lock:
+            cmd = self._pending.pop(seq, None)
+            if cmd is None:
+                return None
+            rtt = t - cmd.t_sent
+            self.rtt.setdefault(cmd.kind, deque(maxlen=self._history)).append(rtt)
+            if cmd.done is not None:
+                self._moving[seq] = cmd
+        cmd.acked.set_result(rtt)
+        return cmd
+
+    def on_nak(self, seq, reason=""):
+        """
+        Refus de l'ESP32. Sur une erreur de liaison (RESEND_REASONS), la
+        commande est rendue sans faire échouer ses Future, pour être renvoyée :
+        au plus max_resends fois, et jamais si un STOP est parti depuis son
+        envoi. Retourne la Command (Future encore en cours : à renvoyer) ou None.
+        """
+        with self._lock:
+            cmd = self._pending.pop(seq, None)
+            if (cmd is not None and reason in RESEND_REASONS
+                    and cmd.resends < self.max_resends and cmd.t_sent > self._t_stop):
+                cmd.resends += 1
+                return cmd
+        if cmd is not None:
+            _fail(cmd.acked, CommandError(f"#{seq} {cmd.kind} refusée : {reason}"))
+            if cmd.done is not None:
+                _fail(cmd.done, CommandError(f"#{seq} refusée"))
+        return cmd
+
+    def on_done(self, seq=None, t=None):
+        """Fin de trajectoire (seq None : ancienne ligne "trajectoryFinished", toutes)."""
+        t = time.monotonic() if t is None else t
+        with self._lock:
+            if seq is None:
+                done, self._moving = list(self._moving.values()), {}
+            else:
+                done = [c for c in (self._moving.pop(seq, None),) if c is not None]
+        for cmd in done:
+            if not cmd.done.done():
+                cmd.done.set_result(t - cmd.t_sent)
+
+    def cancel_moves(self, reason="STOP"):
+        """Trajectoires interrompues (STOP) : leurs Future done échouent."""
+        with self._lock:
+            self._t_stop = time.monotonic()
+            moving, self._moving = list(self._moving.values()), {}
+        for cmd in moving:
+            _fail(cmd.done, CommandError(f"#{cmd.seq} interrompue ({reason})"))
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            late = [c for c in self._pending.values() if now - c.t_sent > self.ack_timeout]
+            for c in late:
+                del self._pending[c.seq]
+        for c in late:
+            _fail(c.acked, CommandError(f"#{c.seq} {c.kind} sans réponse"))
+            if c.done is not None:
+                _fail(c.done, CommandError(f"#{c.seq} sans réponse"))
+
+    def fail_all(self, reason):
+        """Liaison perdue : toutes les commandes en cours échouent."""
+        with self._lock:
+            cmds = list(self._pending.values()) + list(self._moving.values())
+            self._pending, self._moving = {}, {}
+        for c in cmds:
+            _fail(c.acked, CommandError(reason))
+            if c.done is not None:
+                _fail(c.done, CommandError(reason))
+
+    def stats(self):
+        """{type: (nombre, médiane ms, p99 ms)} des allers-retours récents."""
+        with self._lock:
+            rtt = {k: np.array(v) * 1e3 for k, v in self.rtt.items() if v}
+        return {k: (len(v), float(np.median(v)), float(np.percentile(v, 99))) for k, v in rtt.items()}
+
+
+class CommandScheduler:
+    """
+    File des commandes vers l'ESP32, à deux voies :
+
+    - voie prioritaire (STOP) : passe devant tout ce qui attend, et annule
+      les trajectoires et changements de vitesse pas encore envoyés ;
+    - voie normale (FIFO), avec fusion : une nouvelle trajectoire remplace
+      celles encore en file (seule la dernière consigne compte), un SPEED
+      remplace le SPEED en attente.
+
+    Les commandes écartées voient leurs Future échouer (CommandError).
+    get() bloque jusqu'à la prochaine commande, drain() rend tout le reste
+    (voie prioritaire d'abord) pour une écriture groupée.
+    """
+
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._urgent = deque()
+        self._normal = deque()
+
+    def __len__(self):
+        with self._cv:
+            return len(self._urgent) + len(self._normal)
+
+    def put(self, cmd, message):
+        with self._cv:
+            if cmd.kind == "STOP":
+                dropped = self._remove(("TRAJ", "SPEED"), "annulée par STOP")
+                self._urgent.append((cmd, message))
+            else:
+                dropped = self._remove((cmd.kind,), "remplacée") if cmd.kind in ("TRAJ", "SPEED") else []
+                self._normal.append((cmd, message))
+            self._cv.notify()
+        _fail_all(dropped)
+
+    def get(self, timeout=None):
+        """Prochaine (cmd, message), voie prioritaire d'abord ; None après timeout s."""
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._urgent or self._normal, timeout):
+                return None
+            return (self._urgent or self._normal).popleft()
+
+    def drain(self):
+        with self._cv:
+            out = list(self._urgent) + list(self._normal)
+            self._urgent.clear()
+            self._normal.clear()
+        return out
+
+    def retry(self, cmd, message):
+        """
+        Renvoi d'une commande refusée sur erreur de liaison, en tête de la voie
+        normale ; abandonné si un STOP attend ou si une consigne plus récente
+        du même type (trajectoire, vitesse) est déjà en file.
+        """
+        with self._cv:
+            stale = any(c.kind == "STOP" for c, _ in self._urgent) or (
+                cmd.kind in ("TRAJ", "SPEED") and any(c.kind == cmd.kind for c, _ in self._normal))
+            if not stale:
+                self._normal.appendleft((cmd, message))
+                self._cv.notify()
+        if stale:
+            _fail_all([(cmd, CommandError(f"#{cmd.seq} {cmd.kind} remplacée avant renvoi"))])
+        return not stale
+
+    def discard(self, kinds, reason):
+        """Retire de la file les commandes de ces types (ex. trajectoires périmées)."""
+        with self._cv:
+            dropped = self._remove(kinds, reason)
+        _fail_all(dropped)
+        return len(dropped)
+
+    def _remove(self, kinds, reason):
+        keep, dropped = deque(), []
+        for item in self._normal:
+            (dropped if item[0].kind in kinds else keep).append(item)
+        self._normal = keep
+        return [(c, CommandError(f"#{c.seq} {c.kind} {reason}")) for c, _ in dropped]
+
+
+def _fail_all(dropped):
+    for cmd, exc in dropped:
+        _fail(cmd.acked, exc)
+        if cmd.done is not None:
+            _fail(cmd.done, exc)
+
+
+def _fail(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+
+def parse_reply(line):
+    """
+    Réponse de l'ESP32 : ("ACK", seq, "") / ("NAK", seq, raison) / ("DONE", seq, "")
+    ou None si la ligne n'en est pas une.
+    """
+    parts = line.split(maxsplit=2)
+    if len(parts) < 2 or parts[0] not in ("ACK", "NAK", "DONE"):
+        return None
+    try:
+        seq = int(parts[1])
+    except ValueError:
+        return None
+    return parts[0], seq, parts[2] if len(parts) > 2 else ""
@@ -0,0 +1,273 @@
+import json
+import math
+import threading
+import time
+from collections import deque
+import numpy as np
+from interface_deplacement.protocol import (SYNC, HEADER_SIZE, FRAME_TIMEOUT,
+                                            frame_length, decode_trajectory)
+
+
+class FakeESP32:
+    """
+    Simulateur de l'ESP32 moteurs, vu comme un port série (write, read,
+    in_waiting, close) : permet de faire tourner DeplacementServer et de
+    mesurer les latences sans matériel.
+
+    - La liaison est simulée dans les deux sens : un octet occupe
+      10 / baudrate s sur le fil, les écritures successives se suivent.
+    - Côté ESP32, même décodage que main_motor.cpp : lignes texte
+      "#seq commande" (trajectoire JSON, SET POSE, POSE, STOP, SPEED) et
+      trames binaires (protocol.py), réponses "ACK seq" / "NAK seq raison",
+      abandon et re-synchronisation sur une trame invalide ou incomplète.
+    - Le robot suit la trajectoire à speed mm/s (point à point), publie son
+      odométrie "[x, y, theta]" (m) à odom_hz et "DONE seq" à l'arrivée.
+    - loaded : (heure, nb de points, taille de la commande) de chaque
+      trajectoire chargée, heure = fin de réception (départ possible du robot).
+    """
+
+    def __init__(self, port=None, baudrate=115200, timeout=0.1,
+                 odom_hz=100.0, speed=350.0):
+        self.port = port
+        self.byte_time = 10.0 / baudrate
+        self.timeout = timeout
+        self.odom_period = 1.0 / odom_hz
+        self.speed = speed / 1000.0          # m/s
+        self.is_open = True
+
+        self._cv = threading.Condition()
+        self._to_esp = deque()               # (début d'émission, octets)
+        self._esp_pos = 0                    # octets déjà reçus de la première écriture
+        self._to_host = deque()
+        self._host_buf = bytearray()         # déjà arrivé côté Rasp
+        self._esp_free = 0.0                 # fil Rasp -> ESP libre à partir de
+        self._host_free = 0.0                # fil ESP -> Rasp
+        self._lose = 0                       # octets à perdre dans la prochaine écriture
+
+        # État côté ESP32 (repère ESP : m, rad)
+        self._line = bytearray()
+        self._frame = None
+        self._frame_len = None
+        self._frame_t = 0.0                  # arrivée du dernier octet de la trame
+        self.pose = [0.0, 0.0, 0.0]
+        self.traj = None
+        self.traj_idx = 0
+        self.traj_seq = 0
+        self.loaded = []
+        self.lines = []                      # commandes texte reçues (heure, texte)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ---------------------
+    # Interface port série (côté Rasp)
+    # ---------------------
+
+    def write(self, data):
+        data = bytes(data)
+        n = len(data)
+        with self._cv:
+            if self._lose:
+                mid = len(data) // 2
+                data, self._lose = data[:mid] + data[mid + self._lose:], 0
+            t0 = max(time.monotonic(), self._esp_free)
+            self._esp_free = t0 + len(data) * self.byte_time
+            self._to_esp.append((t0, data))
+        return n
+
+    def lose_bytes(self, n):
+        """Liaison perturbée : n octets du milieu de la prochaine écriture se perdent."""
+        with self._cv:
+            self._lose = n
+
+    def flush(self):
+        pass
+
+    @property
+    def in_waiting(self):
+        with self._cv:
+            self._deliver_host(time.monotonic())
+            return len(self._host_buf)
+
+    def read(self, size=1):
+        """Lecture bloquante (au plus timeout s), comme pyserial."""
+        deadline = time.monotonic() + (self.timeout or 0.0)
+        with self._cv:
+            while True:
+                self._deliver_host(time.monotonic())
+                if len(self._host_buf) >= size or not self.is_open:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    break
+                self._cv.wait(min(remaining, self._next_host_arrival()))
+            out = bytes(self._host_buf[:size])
+            del self._host_buf[:size]
+            return out
+
+    def reset_input_buffer(self):
+        with self._cv:
+            self._host_buf.clear()
+
+    def close(self):
+        self.is_open = False
+        with self._cv:
+            self._cv.notify_all()
+
+    def _deliver_host(self, now):
+        while self._to_host and self._to_host[0][0] <= now:
+            self._host_buf += self._to_host.popleft()[1]
+
+    def _next_host_arrival(self):
+        if self._to_host:
+            return max(self._to_host[0][0] - time.monotonic(), 1e-4)
+        return 0.01
+
+    # ---------------------
+    # Côté ESP32
+    # ---------------------
+
+    def _println(self, text):
+        data = (text + "\r\n").encode()
+        with self._cv:
+            t0 = max(time.monotonic(), self._host_free)
+            self._host_free = t0 + len(data) * self.byte_time
+            self._to_host.append((self._host_free, data))
+            self._cv.notify_all()
+
+    def _run(self):
+        next_odom = time.monotonic()
+        last = time.monotonic()
+        while self.is_open:
+            now = time.monotonic()
+            for b, t in self._arrived(now):
+                self._receive_byte(b, t)
+            if self._frame is not None and now - self._frame_t > FRAME_TIMEOUT:
+                self._abort_frame("delai", now)
+            self._move(now - last)
+            last = now
+            if now >= next_odom:
+                next_odom += self.odom_period
+                x, y, th = self.pose
+                self._println(f"[{x:.2f}, {y:.2f}, {th:.2f}]")
+            time.sleep(0.0005)
+
+    def _arrived(self, now):
+        """Octets arrivés côté ESP32 à now, avec leur heure d'arrivée (un par byte_time)."""
+        out = []
+        with self._cv:
+            while self._to_esp:
+                t0, data = self._to_esp[0]
+                n = min(len(data), int((now - t0) / self.byte_time))
+                out += [(data[i], t0 + (i + 1) * self.byte_time) for i in range(self._esp_pos, n)]
+                if n < len(data):
+                    self._esp_pos = max(self._esp_pos, n)
+                    break
+                self._to_esp.popleft()
+                self._esp_pos = 0
+        return out
+
+    def _receive_byte(self, b, t):
+        """Même automate que rxByte : lignes texte, ou trame dès l'octet A5."""
+        if self._frame is not None:
+            self._frame.append(b)
+            self._frame_t = t
+            if len(self._frame) == 2 and b != SYNC[1]:
+                self._abort_frame("trame", t)
+            elif len(self._frame) == HEADER_SIZE:
+                self._frame_len = frame_length(bytes(self._frame))
+                if self._frame_len is None:
+                    self._abort_frame("trame", t)
+            elif len(self._frame) > HEADER_SIZE and len(self._frame) == self._frame_len:
+                frame, self._frame = self._frame, None
+                try:
+                    pts, pose, seq = decode_trajectory(frame)
+                except ValueError:
+                    self._frame = frame
+                    self._abort_frame("crc", t)
+                    return
+                if pose is not None:
+                    self.pose = [pose[0] / 1000.0, pose[1] / 1000.0, pose[2]]
+                self._load(pts, t, len(frame), seq)
+            return
+        if b == SYNC[0]:
+            self._line = bytearray()
+            self._frame = bytearray((b,))
+            self._frame_t = t
+            return
+        if b == 0x0A:
+            line = self._line.decode(errors="ignore").strip()
+            self._line = bytearray()
+            if line:
+                self._command(line, t)
+        elif b != 0x0D:
+            self._line.append(b)
+
+    def _abort_frame(self, reason, t):
+        """Comme abortFrame : NAK si le numéro est arrivé, puis relecture des octets après A5."""
+        frame, self._frame = self._frame, None
+        if len(frame) > 3:
+            self._println(f"NAK {frame[3]} {reason}")
+        for c in frame[1:]:
+            self._receive_byte(c, t)
+
+    def _command(self, line, t):
+        # Reste d'une trame abandonnée devant la commande : elle commence à son '#'
+        if line.rfind("#") > 0:
+            line = line[line.rfind("#"):]
+        self.lines.append((t, line))
+        size = len(line) + 1
+        seq = 0
+        if line.startswith("#"):
+            head, _, line = line.partition(" ")
+            seq = int(head[1:])
+        try:
+            if line.startswith("["):
+                pts = np.array(json.loads(line), dtype=float)[:, :2]
+                self._load(pts, t, size, seq)
+                return
+            elif line.startswith("SET POSE"):
+                x, y, th = (float(v) for v in line.split()[2:5])
+                self.pose = [x / 1000.0, y / 1000.0, th]
+            elif line.startswith("POSE"):
+                pass
+            elif line.startswith("STOP"):
+                self.traj = None
+            elif line.startswith("SPEED"):
+                self.speed = float(line.split()[1]) / 1000.0
+            else:
+                raise ValueError("inconnue")
+        except Exception:
+            if seq:
+                self._println(f"NAK {seq} syntaxe")
+            return
+        if seq:
+            self._println(f"ACK {seq}")
+
+    def _load(self, pts_mm, t, size, seq):
+        self.traj = np.asarray(pts_mm, dtype=float) / 1000.0
+        self.traj_idx = 0
+        self.traj_seq = seq
+        self.loaded.append((t, len(pts_mm), size))
+        self._println(f"ACK {seq}")
+
+    def _move(self, dt):
+        if self.traj is None:
+            return
+        step = self.speed * dt
+        while step > 0.0 and self.traj is not None:
+            tx, ty = self.traj[self.traj_idx]
+            dx, dy = tx - self.pose[0], ty - self.pose[1]
+            d = math.hypot(dx, dy)
+            if d <= step:
+                self.pose[0], self.pose[1] = tx, ty
+                step -= d
+                self.traj_idx += 1
+                if self.traj_idx == len(self.traj):
+                    self.traj = None
+                    self._println(f"DONE {self.traj_seq}")
+            else:
+                self.pose[0] += step * dx / d
+                self.pose[1] += step * dy / d
+                self.pose[2] = math.atan2(dy, dx)
+                step = 0.0
@@ -1,27 +1,41 @@
 import serial
 import time
 import json
-import ast
 import numpy as np
 import threading
-import queue
+from collections import deque
 import ihm.shared as shared
+from interface_deplacement.odometry import OdometryBuffer, parse_odometry_line
+from interface_deplacement.pose_fusion import PoseFusion
+from interface_deplacement.collision import CollisionMonitor
+from interface_deplacement.protocol import encode_trajectory
+from interface_deplacement.commands import CommandTracker, CommandScheduler, parse_reply
 
 # --- CONFIGURATION ---
 PORT = '/dev/esp32_motors'
 BAUDRATE = 115200
+BYTE_TIME = 10.0 / BAUDRATE   # durée d'un octet sur la liaison (8N1)
+# Trajectoires en trame binaire (protocol.py, pose de départ incluse) ;
+# False : ancien format SET POSE + JSON pour un firmware qui ne la connaît pas
+BINARY_TRAJ = True
 
 # File d'attente globale pour envoyer des commandes à l'ESP32
-_cmd_queue = queue.Queue()
+# (voie prioritaire pour STOP, trajectoires en attente remplacées par la suivante)
+_cmd_queue = CommandScheduler()
+# Numérotation des commandes et réponses de l'ESP32 (ACK / NAK / DONE)
+_commands = CommandTracker()
 _server_instance = None
 
 def envoyer(message):
     """
     Envoie un message (texte ou trajectoire) à la file d'attente du thread de déplacement.
     Cette fonction est NON-BLOQUANTE pour la stratégie.
+    Retourne la Command numérotée (commands.py) : cmd.wait(timeout) ou
+    cmd.acked.result(timeout) pour attendre l'acquittement de l'ESP32,
+    cmd.done pour la fin d'une trajectoire.
     """
     if len(message) == 0:
-        return
+        return None
         
     if _server_instance:
         if isinstance(message, (list, np.ndarray)):
@@ -33,7 +47,22 @@ def envoyer(message):
             print("[DEBUG] SETTING event for STOP")
             _server_instance.move_completed_event.set()
 
-    _cmd_queue.put(message)
+    cmd = _commands.new(message)
+    _cmd_queue.put(cmd, message)
+    return cmd
+
+def emergency_stop(reason="", t_event=None):
+    """
+    Arrêt moteurs immédiat (BAU, fin de match) : vide la file des
+    trajectoires et consignes pas encore envoyées et écrit STOP directement
+    depuis le thread appelant, sans passer par le thread écrivain.
+    t_event : heure (time.monotonic()) de l'événement, pour mesurer la latence.
+    Retourne la latence événement -> écriture (ms), ou None sans liaison.
+    """
+    if _server_instance:
+        return _server_instance.emergency_stop(reason, t_event)
+    _cmd_queue.discard(("TRAJ", "SPEED"), f"annulée ({reason or 'STOP'})")
+    return None
 
 def wait_idle(timeout=10.0):
     """
@@ -45,6 +74,28 @@ def wait_idle(timeout=10.0):
     print("[DEBUG] _server_instance is None in wait_idle!")
     return False
 
+def command_stats():
+    """Allers-retours récents par type de commande : {type: (nombre, médiane ms, p99 ms)}."""
+    return _commands.stats()
+
+def get_odometry():
+    """Historique horodaté de l'odométrie ESP32 (None si le thread n'est pas lancé)."""
+    if _server_instance:
+        return _server_instance.odom
+    return None
+
+def get_pose_fusion():
+    """Publicateur unique de shared.robot_pos (None si le thread n'est pas lancé)."""
+    if _server_instance:
+        return _server_instance.pose
+    return None
+
+def get_collision_monitor():
+    """Surveillance anti-collision de la trajectoire en cours (None si le thread n'est pas lancé)."""
+    if _server_instance:
+        return _server_instance.collision
+    return None
+
 def is_ready():
     """Vérifie si la connexion série est établie et prête."""
     if _server_instance:
@@ -52,17 +103,39 @@ def is_ready():
     return False
 
 class DeplacementServer(threading.Thread):
-    def __init__(self):
+    def __init__(self, opener=None):
         super().__init__(daemon=True)
+        # opener(port, baudrate, timeout) -> port série (par défaut serial.Serial,
+        # esp32_sim.FakeESP32 pour tourner sans matériel)
+        self.opener = opener
+        self.binary = BINARY_TRAJ
         self.ser = None
         self.is_connected = False
         self.running = True
+        # Réveille le thread écrivain à la connexion
+        self._connected = threading.Event()
         
         # Un Event pour signaler à la stratégie qu'un mouvement est terminé.
         self.move_completed_event = threading.Event()
         # Par défaut, on considère qu'on est au repos.
         self.move_completed_event.set()
 
+        # Historique (t, x_mm, y_mm, theta_rad) pour l'EKF et le redressement LIDAR
+        self.odom = OdometryBuffer()
+        # Seul écrivain de shared.robot_pos : odométrie recalée par l'EKF
+        self.pose = PoseFusion(self.odom)
+        # Octets reçus pas encore découpés en lignes
+        self._rx = bytearray()
+        # Recalage de l'odométrie envoyé, en attente d'acquittement : (seq, pose, reinit)
+        self._rebase = None
+        self._rebase_lock = threading.Lock()
+        # Les écritures série viennent aussi du thread LIDAR (STOP anti-collision)
+        self._write_lock = threading.Lock()
+        self.commands = _commands
+        # Latences événement -> écriture des arrêts d'urgence (ms)
+        self.stop_latency_ms = deque(maxlen=50)
+        self.collision = CollisionMonitor(self.send_now, self.odom)
+
     def wait_for_completion(self, timeout=10.0):
         print(f"[DEBUG] BEFORE wait({timeout}), event is set? {self.move_completed_event.is_set()}")
         # Attend que l'événement soit "set" (signalant la fin d'un mouvement)
@@ -70,14 +143,71 @@ class DeplacementServer(threading.Thread):
         print(f"[DEBUG] AFTER wait, success={success}, event is set? {self.move_completed_event.is_set()}")
         return success
 
+    def send_now(self, message):
+        """
+        Ecrit une commande texte immédiatement, sans passer par la file
+        (appelable depuis un autre thread). Retourne l'heure d'écriture.
+        """
+        cmd = self.commands.new(message)
+        if self.ser and self.is_connected:
+            try:
+                with self._write_lock:
+                    self.commands.sent(cmd)
+                    self.ser.write(f"#{cmd.seq} {message}\n".encode())
+            except OSError as e:
+                self.commands.unsent(cmd, e)
+                print(f"[COM] Erreur d'envoi prioritaire : {e}")
+        t = time.monotonic()
+        if "STOP" in message:
+            self.commands.cancel_moves()
+            self.move_completed_event.set()
+        return t
+
+    def emergency_stop(self, reason="", t_event=None):
+        """Voir emergency_stop() : purge de la file puis STOP en une écriture."""
+        t0 = time.monotonic() if t_event is None else t_event
+        dropped = _cmd_queue.discard(("TRAJ", "SPEED"), f"annulée ({reason or 'STOP'})")
+        self.collision.clear()
+        t_written = self.send_now("STOP")
+        latency = (t_written - t0) * 1e3
+        self.stop_latency_ms.append(latency)
+        print(f"[COM] ARRET MOTEURS ({reason}) : STOP écrit en {latency:.2f} ms, "
+              f"{dropped} commande(s) en file annulée(s)")
+        return latency if self.is_connected else None
+
+    def _expect_rebase(self, cmd, x_mm, y_mm, theta_deg, reinit=False):
+        """
+        cmd impose une pose (repère table) à l'odométrie de l'ESP32 (SET POSE,
+        trame avec pose). Jusqu'à son acquittement, les échantillons reçus
+        peuvent être dans l'ancien repère comme dans le nouveau : ils sont
+        écartés (ni historique, ni fusion, ni EKF). A l'ACK la fusion repart
+        de cette pose et l'historique est coupé ; sur NAK ou sans réponse,
+        l'ESP32 n'a rien changé : l'odométrie reprend sans coupure.
+        """
+        entry = (cmd.seq, (x_mm, y_mm, theta_deg), reinit)
+        with self._rebase_lock:
+            self._rebase = entry
+        cmd.acked.add_done_callback(lambda f: self._end_rebase(entry, f))
+
+    def _end_rebase(self, entry, acked):
+        """Réponse au recalage (appelé par le thread lecteur, avant les lignes suivantes)."""
+        with self._rebase_lock:
+            if self._rebase is not entry:
+                return   # remplacé par un recalage plus récent
+            self._rebase = None
+            if acked.exception() is None:
+                x_mm, y_mm, theta_deg = entry[1]
+                self.pose.set_pose(x_mm, y_mm, theta_deg, reinit=entry[2])
+
     def _connect(self):
         try:
-            self.ser = serial.Serial(port=PORT, baudrate=BAUDRATE, timeout=0.1)
+            self.ser = (self.opener or serial.Serial)(port=PORT, baudrate=BAUDRATE, timeout=0.1)
             print(f"[COM] Port série {PORT} ouvert avec succès.")
             self.is_connected = True
-            # Quand on ouvre l'ESP reboot. On attend 2 secondes.
-            print("[COM] Attente du redémarrage de l'ESP32...")
-            time.sleep(2.0)
+            if self.opener is None:
+                # Quand on ouvre l'ESP reboot. On attend 2 secondes.
+                print("[COM] Attente du redémarrage de l'ESP32...")
+                time.sleep(2.0)
             return True
         except serial.SerialException as e:
             print(f"[COM] Erreur ouverture port {PORT} : {e}")
@@ -85,32 +215,77 @@ class DeplacementServer(threading.Thread):
             return False
 
     def _read_data(self):
-        """Lit les données entrantes de l'ESP32 (odométrie, statuts) de manière non bloquante."""
+        """
+        Lit les données entrantes de l'ESP32 (odométrie, statuts) : attend le
+        premier octet (au plus le timeout du port), puis prend tout ce qui est arrivé.
+        """
         if not self.ser or not self.is_connected:
             return
             
         try:
-            while self.ser.in_waiting > 0:
-                line = self.ser.readline().decode(errors="ignore").strip()
-                if not line:
+            # Tout ce qui est arrivé en une lecture, découpé en lignes ici
+            # (readline() de pyserial lit octet par octet)
+            chunk = self.ser.read(1)
+            if not chunk:
+                return
+            n = self.ser.in_waiting
+            self._rx += chunk + self.ser.read(n) if n > 0 else chunk
+            now = time.monotonic()
+            total = len(self._rx)
+            *lines, rest = self._rx.split(b"\n")
+            self._rx = bytearray(rest)
+
+            end = 0
+            for raw in lines:
+                end += len(raw) + 1
+                raw = raw.strip()
+                if not raw:
                     continue
-                
-                # --- FIN EXPLICITE DU TRAJET ---
-                if "trajectoryFinished" in line:
+
+                # --- MISE A JOUR POSITION (Odométrie, ~100 Hz) ---
+                odo = parse_odometry_line(raw)
+                if odo is not None:
+                    if self._rebase is not None:
+                        # Recalage pas encore acquitté : repère incertain
+                        continue
+                    # Heure d'arrivée de la ligne : on retranche la durée des octets reçus après
+                    t = now - (total - end) * BYTE_TIME
+                    x_mm, y_mm, theta = odo[0] * 1000, odo[1] * 1000, odo[2]
+                    self.odom.append(t, x_mm, y_mm, theta)
+                    self.pose.on_odometry(x_mm, y_mm, theta)
+                    continue
+
+                line = raw.decode(errors="ignore")
+
+                # --- REPONSES NUMEROTEES (ACK / NAK / DONE seq) ---
+                reply = parse_reply(line)
+                if reply is not None:
+                    kind, seq, reason = reply
+                    t = now - (total - end) * BYTE_TIME
+                    if kind == "ACK":
+                        self.commands.on_ack(seq, t)
+                    elif kind == "NAK":
+                        cmd = self.commands.on_nak(seq, reason)
+                        if cmd is not None and not cmd.acked.done():
+                            # Trame abîmée en route : on la renvoie
+                            resent = _cmd_queue.retry(cmd, cmd.message)
+                            print(f"[COM] ESP32 : commande #{seq} mal reçue ({reason}), "
+                                  f"{'renvoyée' if resent else 'abandonnée'}")
+                        else:
+                            print(f"[COM] ESP32 : commande #{seq} refusée ({reason})")
+                    else:
+                        print("[COM] ESP32 : Fin de trajectoire reçue.")
+                        self.commands.on_done(seq, t)
+                        self.collision.clear()
+                        self.move_completed_event.set()
+
+                # --- FIN EXPLICITE DU TRAJET (ancien firmware) ---
+                elif "trajectoryFinished" in line:
                     print("[COM] ESP32 : Fin de trajectoire reçue.")
+                    self.commands.on_done()
+                    self.collision.clear()
                     self.move_completed_event.set() # Libère le wait_idle() de la strat
                 
-                # --- MISE A JOUR POSITION (Odométrie) ---
-                elif line.startswith('[') and line.endswith(']'):
-                    try:
-                        msg_list = ast.literal_eval(line)
-                        if len(msg_list) >= 3:
-                            shared.robot_pos['x'] = msg_list[0] * 1000
-                            shared.robot_pos['y'] = msg_list[1] * 1000
-                            shared.robot_pos['theta'] = msg_list[2] * 180 / np.pi
-                    except:
-                        pass
-                
                 # --- LOGS / DEBUG ESP32 ---
                 elif "BEZ OK" in line:
                     print("[COM] ESP32 a validé la trajectoire Bezier.")
@@ -122,92 +297,165 @@ class DeplacementServer(threading.Thread):
                     # print(f"[ESP32] {line}")
                     pass
                     
-        except OSError as e:
+        except (OSError, serial.SerialException) as e:
             print(f"[COM] Déconnexion brutale : {e}")
-            self.is_connected = False
+            self._disconnected()
+            self.commands.fail_all("liaison ESP32 perdue")
 
-    def _process_queue(self):
-        """Dépile une commande de la queue et l'envoie à l'ESP32."""
-        if not self.is_connected:
-            return
-            
-        try:
-            message = _cmd_queue.get_nowait()
-        except queue.Empty:
-            return
+    def _encode(self, cmd, message):
+        """
+        Octets à écrire pour une commande de la file, et commandes numérotées
+        qu'ils contiennent. Applique au passage les effets côté Rasp
+        (recalage de la fusion, trajectoire surveillée, fin de mouvement sur STOP),
+        une fois la commande encodée : une commande invalide (ValueError) n'en
+        laisse aucun.
+        """
+        if isinstance(message, str):
+            # TEXTE (ex: SET POSE, STOP)
+            print(f"[COM->ESP] #{cmd.seq} {message}")
+            if message.startswith("SET POSE"):
+                # Recalage : l'odométrie ESP32 repartira de cette pose (repère ESP = y, x)
+                try:
+                    y_mm, x_mm, theta_rad = (float(v) for v in message.split()[2:5])
+                    self._expect_rebase(cmd, x_mm, y_mm, np.degrees(theta_rad), reinit=True)
+                except ValueError:
+                    pass
+            # Les commandes simples sont considérées comme instantanées
+            if "STOP" in message:
+                self.commands.cancel_moves()
+                self.collision.clear()
+                self.move_completed_event.set()
+            return f"#{cmd.seq} {message}\n".encode(), [cmd]
 
-        try:
-            # On indique qu'un mouvement est en cours, donc on "clear" le signal de fin.
-            # (Sauf si c'est juste un SET POSE ou STOP, mais dans le doute on clear avant chaque grosse cmd)
-            
-            if isinstance(message, str):
-                # TEXTE (ex: SET POSE, STOP)
-                self.ser.write((message + '\n').encode())
-                print(f"[COM->ESP] {message}")
-                # Les commandes simples sont considérées comme instantanées
-                if "STOP" in message:
-                    self.move_completed_event.set()
-                
-            elif isinstance(message, np.ndarray) or isinstance(message, list):
-                # TRAJECTOIRE DE BEZIER
-                # (L'event a déjà été 'clear' dans envoyer() pour bloquer la stratégie instantanément)
-                
-                trajectoire_bezier_mm = np.array(message)
-                nb_points = len(trajectoire_bezier_mm)
-                
-                # --- CORRECTION DU REPERE ---
-                # Le repère de la map Web (X, Y) est transposé par rapport à l'ESP32 (Y, X).
-                # SET POSE a bien affecté y_mm à la variable interne X, et x_mm à la variable interne Y.
-                # Il faut donc inverser les colonnes de la trajectoire pour que l'ESP32 reçoive [y, x] !
-                if trajectoire_bezier_mm.shape[1] >= 2:
-                    trajectoire_bezier_mm[:, [0, 1]] = trajectoire_bezier_mm[:, [1, 0]]
-                
-                # 1. Envoi de la position actuelle pour recaler l'ESP avant le trajet
-                y_mm = shared.robot_pos['y']
-                x_mm = shared.robot_pos['x']
-                theta_rad = shared.robot_pos['theta'] * (np.pi/180.0)
-                cmd_pose = f"SET POSE {y_mm:.2f} {x_mm:.2f} {theta_rad:.4f}\n"
-                self.ser.write(cmd_pose.encode())
-                
-                # Petit délai pour que l'ESP digère le SET POSE avant le JSON
-                time.sleep(0.05) 
-                
-                # 2. Envoi JSON
-                json_str = json.dumps(trajectoire_bezier_mm.tolist())
-                self.ser.write((json_str + '\n').encode())
-                print(f"[COM->ESP] Trajectoire ({nb_points} pts) envoyée.")
-                
-            _cmd_queue.task_done()
-            
-        except Exception as e:
-            print(f"[COM] Erreur d'envoi réseau : {e}")
-            self.is_connected = False
+        # TRAJECTOIRE DE BEZIER
+        # (L'event a déjà été 'clear' dans envoyer() pour bloquer la stratégie instantanément)
+
+        # Au dixième de mm : le float32 de bezier_trajectoire ne rallonge pas le JSON
+        trajectoire_bezier_mm = np.round(np.asarray(message, dtype=float), 1)
+        nb_points = len(trajectoire_bezier_mm)
+        trajectoire_table = trajectoire_bezier_mm.copy()
+
+        # --- CORRECTION DU REPERE ---
+        # Le repère de la map Web (X, Y) est transposé par rapport à l'ESP32 (Y, X).
+        # SET POSE a bien affecté y_mm à la variable interne X, et x_mm à la variable interne Y.
+        # Il faut donc inverser les colonnes de la trajectoire pour que l'ESP32 reçoive [y, x] !
+        if trajectoire_bezier_mm.shape[1] >= 2:
+            trajectoire_bezier_mm[:, [0, 1]] = trajectoire_bezier_mm[:, [1, 0]]
+
+        # Position actuelle pour recaler l'ESP avant le trajet
+        y_mm = shared.robot_pos['y']
+        x_mm = shared.robot_pos['x']
+        theta_rad = shared.robot_pos['theta'] * (np.pi/180.0)
+        theta_deg = shared.robot_pos['theta']
+
+        if self.binary:
+            # Une seule trame : recalage + points (int16, CRC), ~4 octets par point
+            frame = encode_trajectory(trajectoire_bezier_mm, pose=(y_mm, x_mm, theta_rad), seq=cmd.seq)
+            # Surveillée contre le LIDAR jusqu'à sa fin (repère table)
+            self.collision.set_trajectory(trajectoire_table)
+            # L'odométrie repartira de la pose publiée, à l'acquittement de la trame
+            self._expect_rebase(cmd, x_mm, y_mm, theta_deg)
+            print(f"[COM->ESP] Trajectoire ({nb_points} pts, {len(frame)} o) envoyée.")
+            return frame, [cmd]
+
+        # 1. SET POSE puis 2. JSON : l'ESP32 traite ses lignes dans l'ordre,
+        # chacune est acquittée (pas d'attente entre les deux)
+        msg_pose = f"SET POSE {y_mm:.2f} {x_mm:.2f} {theta_rad:.4f}"
+        json_str = json.dumps(trajectoire_bezier_mm.tolist())
+        self.collision.set_trajectory(trajectoire_table)
+        cmd_pose = self.commands.new(msg_pose)
+        self._expect_rebase(cmd_pose, x_mm, y_mm, theta_deg)
+        print(f"[COM->ESP] Trajectoire ({nb_points} pts) envoyée.")
+        return f"#{cmd_pose.seq} {msg_pose}\n#{cmd.seq} {json_str}\n".encode(), [cmd_pose, cmd]
+
+    def _write_loop(self):
+        """
+        Thread écrivain : réveillé dès qu'une commande est mise en file.
+        Toutes les commandes en attente à ce moment partent en une seule écriture.
+        """
+        while self.running:
+            if not self._connected.is_set():
+                # Les commandes restent en file jusqu'à la (re)connexion (ESP32 redémarré)
+                self._connected.wait(0.5)
+                continue
+            item = _cmd_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            batch = [item] + _cmd_queue.drain()
+
+            data, sent = bytearray(), []
+            for cmd, message in batch:
+                try:
+                    chunk, cmds = self._encode(cmd, message)
+                except Exception as e:
+                    # Commande invalide (point hors int16, trop de points...) : elle
+                    # seule échoue, la liaison et le reste du lot n'y sont pour rien
+                    print(f"[COM] Commande #{cmd.seq} non encodable : {e}")
+                    self.commands.unsent(cmd, e)
+                    if not isinstance(message, str):
+                        self.move_completed_event.set()   # pas de mouvement à attendre
+                    continue
+                data += chunk
+                sent += cmds
+            if not data:
+                continue
+
+            try:
+                with self._write_lock:
+                    # Enregistrées avant l'écriture : l'ACK peut revenir avant write()
+                    for cmd in sent:
+                        self.commands.sent(cmd)
+                    self.ser.write(data)
+            except (OSError, serial.SerialException) as e:
+                print(f"[COM] Erreur d'envoi réseau : {e}")
+                for cmd in sent:
+                    self.commands.unsent(cmd, e)
+                self._disconnected()
+                self.commands.fail_all(f"envoi impossible : {e}")
+
+    def _disconnected(self):
+        self.is_connected = False
+        self._connected.clear()
 
     def run(self):
+        """
+        Thread lecteur (et reconnexion) : bloqué dans read() jusqu'à l'arrivée
+        d'octets ; l'écriture a son propre thread (_write_loop).
+        """
         print("[COM] Thread DeplacementServer démarré.")
+        writer = threading.Thread(target=self._write_loop, name="DeplacementServer-tx", daemon=True)
+        writer.start()
         while self.running:
             if not self.is_connected:
                 # Tente de se connecter en boucle
                 if not self._connect():
                     time.sleep(2) # Attend avant de réessayer
                     continue
-            
-            # 1. Lire ce qui vient de l'ESP32
+                # Les trajectoires mises en file pendant la coupure sont périmées
+                # (pose de départ, état du match) : on ne les rejoue pas
+                stale = _cmd_queue.discard(("TRAJ",), "périmée (reconnexion)")
+                if stale:
+                    print(f"[COM] {stale} trajectoire(s) périmée(s) écartée(s) à la reconnexion.")
+                    self.move_completed_event.set()
+                self._connected.set()
+
+            # Lire ce qui vient de l'ESP32 (au plus timeout du port d'attente)
             self._read_data()
-            
-            # 2. Envoyer les commandes en attente
-            self._process_queue()
-            
-            # Boucle rapide pour réactivité, mais pas trop pour ne pas griller le CPU
-            time.sleep(0.01)
-            
+
+            # Commandes restées sans réponse
+            self.commands.expire()
+
+        self._connected.set()
         if self.ser and self.ser.is_open:
             self.ser.close()
 
-def init():
-    """Initialise et lance le thread de communication en tâche de fond."""
+def init(opener=None):
+    """
+    Initialise et lance le thread de communication en tâche de fond.
+    opener : voir DeplacementServer (esp32_sim.FakeESP32 sans matériel).
+    """
     global _server_instance
     if _server_instance is None:
-        _server_instance = DeplacementServer()
+        _server_instance = DeplacementServer(opener)
         _server_instance.start()
     return _server_instance
\ No newline at end of file
@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+
+
+def parse_odometry_line(line: bytes):
+    """
+    Décode une ligne d'odométrie ESP32 b"[x, y, theta]" (m, m, rad)
+    sans décodage texte ni ast.literal_eval.
+    Retourne (x, y, theta) ou None si la ligne n'en est pas une.
+    """
+    if not (line.startswith(b"[") and line.endswith(b"]")):
+        return None
+    parts = line[1:-1].split(b",")
+    if len(parts) < 3:
+        return None
+    try:
+        return float(parts[0]), float(parts[1]), float(parts[2])
+    except ValueError:
+        return None
+
+
+class OdometryBuffer:
+    """
+    Historique horodaté de l'odométrie ESP32 : (t, x, y, theta).
+
+    - t : time.monotonic() à la réception de la ligne (s)
+    - x, y : mm ; theta : rad
+    Tableaux préalloués (buffer circulaire), écrits par le thread série
+    et lus par les autres threads (EKF, redressement des scans LIDAR).
+
+    Les échantillons ont un index absolu (count) : un consommateur garde son
+    curseur et lit les nouveaux avec read_since(). rebase() marque un saut
+    volontaire de l'odométrie (SET POSE acquitté par l'ESP32) : le déplacement
+    entre l'échantillon d'index last_break - 1 et last_break n'est pas réel.
+    snapshot() et pose_at() ne remontent pas au-delà de ce saut.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, 4))
+        self._n = 0
+        self.last_break = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._n, self.capacity)
+
+    @property
+    def count(self):
+        """Nombre total d'échantillons reçus (index absolu du prochain)."""
+        return self._n
+
+    def append(self, t, x, y, theta):
+        with self._lock:
+            self._data[self._n % self.capacity] = (t, x, y, theta)
+            self._n += 1
+
+    def rebase(self):
+        """L'odométrie de l'ESP32 vient d'être réinitialisée : coupe l'historique."""
+        with self._lock:
+            self.last_break = self._n
+            return self._n
+
+    def clear(self):
+        with self._lock:
+            self._n = 0
+            self.last_break = 0
+
+    def read_since(self, idx):
+        """
+        Echantillons d'index absolu >= idx (les plus anciens peuvent avoir été
+        écrasés). Retourne (samples (M, 4), index du premier, nouvel index).
+        """
+        with self._lock:
+            first = max(idx, self._n - self.capacity, 0)
+            order = np.arange(first, self._n) % self.capacity
+            return self._data[order], first, self._n
+
+    def latest(self):
+        """Dernier échantillon (t, x, y, theta) ou None."""
+        with self._lock:
+            if self._n == 0:
+                return None
+            return tuple(self._data[(self._n - 1) % self.capacity])
+
+    def snapshot(self):
+        """
+        Copie (N, 4) des échantillons depuis le dernier recalage (last_break),
+        du plus ancien au plus récent.
+        """
+        with self._lock:
+            n = min(self._n - self.last_break, self.capacity)
+            order = np.arange(self._n - n, self._n) % self.capacity
+            return self._data[order]
+
+    def pose_at(self, times):
+        """
+        Pose interpolée (N, 3) aux instants demandés (x, y en mm, theta en rad).
+        En dehors de l'historique, on garde la première/dernière pose connue.
+        Retourne None si aucun échantillon n'a encore été reçu.
+        """
+        hist = self.snapshot()
+        if len(hist) == 0:
+            return None
+        t = hist[:, 0]
+        th = np.unwrap(hist[:, 3])
+        times = np.asarray(times, dtype=float)
+        return np.column_stack((
+            np.interp(times, t, hist[:, 1]),
+            np.interp(times, t, hist[:, 2]),
+            np.interp(times, t, th),
+        ))
@@ -0,0 +1,83 @@
+import math
+import threading
+import ihm.shared as shared
+
+
+def _compose(a, b):
+    """Pose a ∘ b (x, y en mm, theta en rad)."""
+    c, s = math.cos(a[2]), math.sin(a[2])
+    return (a[0] + c * b[0] - s * b[1], a[1] + s * b[0] + c * b[1], a[2] + b[2])
+
+
+def _inverse(a):
+    c, s = math.cos(a[2]), math.sin(a[2])
+    return (-c * a[0] - s * a[1], s * a[0] - c * a[1], -a[2])
+
+
+class PoseFusion:
+    """
+    Seul écrivain de shared.robot_pos (x, y en mm, theta en degrés).
+
+    La pose publiée est la dernière odométrie ESP32 recalée par la dernière
+    correction absolue (EKF LIDAR) :
+        pose = C ∘ odom,   avec C = pose_EKF ∘ odom(t_EKF)^-1
+    Elle suit donc l'odométrie à pleine cadence et se recale à chaque
+    correction, sans que l'EKF et l'odométrie s'écrasent l'un l'autre.
+    Sans EKF, C reste l'identité : on publie l'odométrie brute.
+    """
+
+    def __init__(self, odom=None):
+        self.odom = odom
+        self._lock = threading.Lock()
+        self._corr = (0.0, 0.0, 0.0)
+        self._last_odom = None
+        self._reset = None
+
+    def _publish(self, pose):
+        shared.robot_pos['x'] = pose[0]
+        shared.robot_pos['y'] = pose[1]
+        shared.robot_pos['theta'] = math.degrees(math.atan2(math.sin(pose[2]), math.cos(pose[2])))
+
+    def on_odometry(self, x, y, theta):
+        """Nouvel échantillon d'odométrie (mm, mm, rad), appelé par le thread série."""
+        with self._lock:
+            self._last_odom = (x, y, theta)
+            self._publish(_compose(self._corr, self._last_odom))
+
+    def correct(self, pose, odom_pose=None, odom_idx=None):
+        """
+        Correction absolue (mm, mm, rad), valable à l'instant de l'échantillon
+        d'odométrie odom_pose (d'index odom_idx dans l'OdometryBuffer).
+        Ignorée si l'odométrie a été réinitialisée depuis cet échantillon.
+        """
+        pose = tuple(float(v) for v in pose)
+        with self._lock:
+            if odom_pose is not None:
+                if self.odom is not None and odom_idx is not None and odom_idx < self.odom.last_break:
+                    return
+                self._corr = _compose(pose, _inverse(odom_pose))
+            self._publish(pose)
+
+    def set_pose(self, x, y, theta_deg, reinit=False):
+        """
+        La pose (repère table, theta en degrés) imposée à l'ESP32 (SET POSE,
+        trame avec pose) vient d'être acquittée : son odométrie repart de là,
+        la correction redevient l'identité.
+        reinit : recalage volontaire, l'EKF doit aussi repartir de cette pose
+        (voir take_reset).
+        """
+        pose = (float(x), float(y), math.radians(theta_deg))
+        with self._lock:
+            if self.odom is not None:
+                self.odom.rebase()
+            self._corr = (0.0, 0.0, 0.0)
+            self._last_odom = pose
+            if reinit:
+                self._reset = pose
+            self._publish(pose)
+
+    def take_reset(self):
+        """Pose de recalage en attente (x, y, theta rad) pour l'EKF, ou None."""
+        with self._lock:
+            reset, self._reset = self._reset, None
+            return reset
@@ -0,0 +1,108 @@
+import struct
+import numpy as np
+
+# === Trame binaire Rasp -> ESP32 moteurs ===
+#
+#   SYNC (A5 5A) | type (u8) | seq (u8) | n (u8) | [pose] | n points | CRC16 (u16)
+#
+# - type TRAJ : trajectoire seule ; TRAJ_POSE : recalage de l'odométrie
+#   (remplace "SET POSE") puis trajectoire, dans la même trame.
+# - seq : numéro de commande (commands.py), repris dans "ACK seq" / "NAK seq ...".
+# - pose : x, y (int16, 1/4 mm), theta (int16, 1e-4 rad).
+# - points : x, y (int16, 1/4 mm), soit ±8.19 m.
+# - CRC16-CCITT (poly 0x1021, init 0xFFFF) sur type..dernier point.
+# Tout est little-endian. L'octet A5 n'apparaît dans aucune commande texte :
+# l'ESP32 bascule en lecture binaire dès qu'il le reçoit (une ligne en cours
+# n'est alors que le reste d'une trame abandonnée).
+# En-tête invalide (2e octet de synchro, type, n hors de 1..MAX_POINTS) ou
+# plus d'octet pendant FRAME_TIMEOUT s : trame abandonnée ("NAK seq trame" /
+# "NAK seq delai"), les octets reçus après le A5 sont relus (texte ou
+# nouvelle trame) : une commande qui suivait n'est pas perdue.
+
+SYNC = b"\xA5\x5A"
+TYPE_TRAJ = 0x01
+TYPE_TRAJ_POSE = 0x02
+POS_SCALE = 4.0          # unités par mm
+ANGLE_SCALE = 10000.0    # unités par rad
+MAX_POINTS = 50          # MAX_POINTS du TrajectoryFollower : au-delà, l'ESP32 refuse la trame
+
+_HEADER = struct.Struct("<2sBBB")
+_POSE = struct.Struct("<hhh")
+_CRC = struct.Struct("<H")
+HEADER_SIZE = _HEADER.size
+FRAME_TIMEOUT = 0.005    # s, FRAME_TIMEOUT_MS du firmware
+
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table.tolist()
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC16-CCITT (FALSE) par table, même calcul que côté ESP32."""
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[(crc >> 8) ^ b]
+    return crc
+
+
+def _fixed(values, scale):
+    q = np.rint(np.asarray(values, dtype=float) * scale)
+    if np.any(np.abs(q) > 32767):
+        raise ValueError("valeur hors de la plage int16 de la trame")
+    return q.astype("<i2")
+
+
+def encode_trajectory(points, pose=None, seq=0):
+    """
+    Trame d'une trajectoire (N, 2) en mm, dans le repère de l'ESP32, avec
+    éventuellement la pose (x_mm, y_mm, theta_rad) de départ à imposer à
+    l'odométrie, et son numéro de commande seq. Retourne des bytes.
+    """
+    pts = np.asarray(points, dtype=float)[:, :2]
+    if not 0 < len(pts) <= MAX_POINTS:
+        raise ValueError(f"{len(pts)} points (1 à {MAX_POINTS} par trame)")
+    body = bytearray((TYPE_TRAJ if pose is None else TYPE_TRAJ_POSE, seq & 0xFF, len(pts)))
+    if pose is not None:
+        x, y, th = pose
+        body += _fixed((x, y), POS_SCALE).tobytes()
+        body += _fixed(th, ANGLE_SCALE).tobytes()
+    body += _fixed(pts, POS_SCALE).tobytes()
+    return SYNC + bytes(body) + _CRC.pack(crc16(body))
+
+
+def frame_length(header):
+    """Longueur totale d'une trame d'après ses HEADER_SIZE premiers octets (None si invalide)."""
+    sync, kind, _, n = _HEADER.unpack_from(header)
+    if sync != SYNC or kind not in (TYPE_TRAJ, TYPE_TRAJ_POSE) or not 0 < n <= MAX_POINTS:
+        return None
+    return _HEADER.size + (_POSE.size if kind == TYPE_TRAJ_POSE else 0) + 4 * n + _CRC.size
+
+
+def decode_trajectory(frame):
+    """
+    Décodage d'une trame complète (côté ESP32, ou simulateur) :
+    retourne (points (N, 2) en mm, pose ou None, seq). ValueError si la trame est invalide.
+    """
+    frame = bytes(frame)
+    size = frame_length(frame[:_HEADER.size]) if len(frame) >= _HEADER.size else None
+    if size is None or len(frame) != size:
+        raise ValueError("trame invalide")
+    body = frame[2:-_CRC.size]
+    if crc16(body) != _CRC.unpack_from(frame, size - _CRC.size)[0]:
+        raise ValueError("CRC invalide")
+    kind, seq, n = body[0], body[1], body[2]
+    off = 3
+    pose = None
+    if kind == TYPE_TRAJ_POSE:
+        x, y, th = _POSE.unpack_from(body, off)
+        pose = (x / POS_SCALE, y / POS_SCALE, th / ANGLE_SCALE)
+        off += _POSE.size
+    pts = np.frombuffer(body, dtype="<i2", count=2 * n, offset=off).reshape(n, 2) / POS_SCALE
+    return pts, pose, seq
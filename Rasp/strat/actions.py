@@ -91,13 +91,12 @@ class RobotActions:
         # 3. Envoi à l'ESP32 (Reset Odométrie)
         if envoyer:
             cmd = f"SET POSE {real_y:.2f} {real_x:.2f} {math.radians(real_theta):.4f}"
-            envoyer(cmd)
-            
-            # Wait a brief moment to ensure the ESP has processed the pose reset
-            try:
-                import interface_deplacement.interface_deplacement as idp
-                idp.wait_idle(timeout=0.5)
-            except: pass
+            sent = envoyer(cmd)
+
+            # Attend l'acquittement du recalage par l'ESP32 (ACK), pas un délai fixe
+            from interface_deplacement.interface_deplacement import is_ready
+            if sent is not None and is_ready() and not sent.wait(timeout=0.5):
+                print("[ACTION] SET_POS non acquitté par l'ESP32")
         else:
             print("[SIMU] SET_POS virtuel (Pas de com)")
 
@@ -138,9 +137,8 @@ class RobotActions:
 
         if Bezier and envoyer and not simulating:
             try:
-                # Génération d'une liste de points (ex: 50 points)
-                points_bezier = Bezier.bezier_cubique_discret(
-                    50, 
+                # Points espacés en abscisse curviligne, resserrés dans les virages
+                points_bezier = Bezier.bezier_trajectoire(
                     (p0_x, p0_y), 
                     (p1_x, p1_y), 
                     (p2_x, p2_y), 
@@ -69,6 +69,70 @@ bool TrajectoryFollower::loadFromJson(const char *json) {
   return true;
 }
 
+// CRC16-CCITT (poly 0x1021, init 0xFFFF), identique à protocol.crc16 côté Rasp
+static uint16_t crc16(const uint8_t *data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int b = 0; b < 8; b++)
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  }
+  return crc;
+}
+
+static int16_t readI16(const uint8_t *p) {
+  return (int16_t)((uint16_t)p[0] | ((uint16_t)p[1] << 8));
+}
+
+size_t TrajectoryFollower::frameLength(const uint8_t *header) {
+  if (header[0] != FRAME_SYNC0 || header[1] != FRAME_SYNC1 || header[4] == 0 ||
+      header[4] > MAX_POINTS)
+    return 0;
+  if (header[2] == FRAME_TRAJ)
+    return FRAME_HEADER + 4 * header[4] + 2;
+  if (header[2] == FRAME_TRAJ_POSE)
+    return FRAME_HEADER + 6 + 4 * header[4] + 2;
+  return 0;
+}
+
+// Trame binaire (voir Rasp/interface_deplacement/protocol.py) :
+// A5 5A | type | seq | n | [x y theta] | n x (x y) | CRC16, little-endian,
+// positions en int16 1/4 mm, angle en int16 1e-4 rad.
+bool TrajectoryFollower::loadFromFrame(const uint8_t *frame, size_t len,
+                                       Pose2D &startPose, bool &hasPose) {
+  size_t expected = frameLength(frame);
+  if (expected == 0 || len != expected) {
+    Serial.println("Trame invalide");
+    return false;
+  }
+  uint16_t crc = (uint16_t)frame[len - 2] | ((uint16_t)frame[len - 1] << 8);
+  if (crc16(frame + 2, len - 4) != crc) {
+    Serial.println("Trame: CRC invalide");
+    return false;
+  }
+
+  const uint8_t *p = frame + FRAME_HEADER;
+  hasPose = frame[2] == FRAME_TRAJ_POSE;
+  if (hasPose) {
+    startPose.x = readI16(p) / (FRAME_POS_SCALE * 1000.0f);
+    startPose.y = readI16(p + 2) / (FRAME_POS_SCALE * 1000.0f);
+    startPose.theta = readI16(p + 4) / FRAME_ANGLE_SCALE;
+    p += 6;
+  }
+
+  int n = frame[4];
+  for (int i = 0; i < n; i++, p += 4) {
+    // 1/4 mm -> m
+    points[i].x = readI16(p) / (FRAME_POS_SCALE * 1000.0f);
+    points[i].y = readI16(p + 2) / (FRAME_POS_SCALE * 1000.0f);
+  }
+
+  nPoints = n;
+  currentIdx = 0;
+  active = true;
+  return true;
+}
+
 void TrajectoryFollower::setCorrectedPose(const Pose2D &pose) {
   poseCorr = pose;
   hasCorr = true;
@@ -0,0 +1,62 @@
+#ifndef TRAJECTORY_FOLLOWER_HPP
+#define TRAJECTORY_FOLLOWER_HPP
+
+#include <Arduino.h>
+#include "utilities.hpp"
+
+// Nombre maximal de points d'une trajectoire (JSON ou trame binaire),
+// identique à protocol.MAX_POINTS côté Rasp
+#define MAX_POINTS 50
+
+struct Point2D {
+    float x;      // m
+    float y;      // m
+};
+
+struct Pose2D {
+    float x;      // m
+    float y;      // m
+    float theta;  // rad
+};
+
+
+class TrajectoryFollower {
+    public:
+        TrajectoryFollower();
+
+        // Trajectoire "[[x, y], ...]" en mm
+        bool loadFromJson(const char* json);
+
+        // Trame binaire (voir Rasp/interface_deplacement/protocol.py)
+        // Longueur totale d'après l'en-tête (FRAME_HEADER octets), 0 si invalide
+        static size_t frameLength(const uint8_t* header);
+        // Trame complète, CRC vérifié ; hasPose : la trame impose startPose
+        bool loadFromFrame(const uint8_t* frame, size_t len, Pose2D& startPose, bool& hasPose);
+
+        void setCorrectedPose(const Pose2D& pose);
+        bool hasCorrectedPose() const;
+        bool isFinished() const;
+        void reset();
+
+        void setLookahead(float Ld_m);
+        void setNominalSpeed(float v_mps);
+
+        void computeCommand(const Pose2D& poseOdom, float dt,
+                            float& vL_out, float& vR_out, float& temps_arc);
+
+    private:
+        static float wrapPi(float a);
+
+        Point2D points[MAX_POINTS];
+        int nPoints;
+        int currentIdx;
+        bool active;
+
+        bool hasCorr;
+        Pose2D poseCorr;
+
+        float Ld;     // m
+        float v_nom;  // m/s
+};
+
+#endif
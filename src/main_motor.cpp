@@ -10,6 +10,8 @@
 
 ClassMotors motors;
 TrajectoryFollower follower;
+// Numéro de la trajectoire en cours, renvoyé dans "DONE seq" à son arrivée
+volatile int trajSeq = 0;
 
 // Géométrie robot (cohérente avec ClassMotors)
 
@@ -82,64 +84,186 @@ void taskControl(void* arg) {
 
         if(now_long - lastComputeCommand >= temps_arc){
             lastComputeCommand = now_long; 
+            bool wasActive = !follower.isFinished();
             follower.computeCommand(odomPose, dt, vL, vR, temps_arc);
+            // Fin de trajectoire : la Rasp libère son wait_idle()
+            if (wasActive && follower.isFinished()) {
+                SERIAL_PI.printf("DONE %d\n", trajSeq);
+            }
         }
         applyVLVR(vL, vR);
         vTaskDelayUntil(&lastWake, pdMS_TO_TICKS(10)); // 50 Hz
     }
 }
 
+// Réponse numérotée à la Rasp : "ACK seq" ou "NAK seq raison"
+// (seq = 0 : commande non numérotée, ancien format, pas de réponse)
+static void reply(int seq, const char* err) {
+    if (seq <= 0) return;
+    if (err) {
+        SERIAL_PI.printf("NAK %d %s\n", seq, err);
+    } else {
+        SERIAL_PI.printf("ACK %d\n", seq);
+    }
+}
+
+// Trame binaire en cours (depuis l'octet A5)
+static uint8_t frame[FRAME_HEADER + 6 + 4 * 255 + 2];
+static size_t frameLen = 0, frameExpected = 0;
+static bool inFrame = false;
+static uint32_t frameLastByte = 0;   // millis() du dernier octet reçu de la trame
+static String rxLine;
+
+static void rxByte(uint8_t c);
+
+// Commande texte complète (sans le '\n')
+static void handleLine(String line) {
+    line.trim();
+    // Reste d'une trame abandonnée devant la commande : celle-ci commence à
+    // son '#' (le seul de la ligne, aucune commande n'en contient d'autre)
+    int hash = line.lastIndexOf('#');
+    if (hash > 0) line = line.substring(hash);
+    // Numéro de commande "#seq " en tête de ligne
+    int seq = 0;
+    if (line.startsWith("#")) {
+        int sp = line.indexOf(' ');
+        seq = line.substring(1, sp < 0 ? line.length() : sp).toInt();
+        line = sp < 0 ? String("") : line.substring(sp + 1);
+    }
+    if (line.length() == 0) return;
+    const char* err = nullptr;
+    // 1) JSON trajectoire (commence normalement par '[')
+    if (line[0] == '[') {
+        if (follower.loadFromJson(line.c_str())) {
+            trajSeq = seq;
+            if (seq <= 0) SERIAL_PI.println("BEZ OK");
+        } else {
+            err = "json";
+            if (seq <= 0) SERIAL_PI.println("BEZ ERR");
+        }
+    }
+    // 2) Pose corrigée: "POSE x y theta" (x,y en mm)
+    else if (line.startsWith("POSE")) {
+        float x_mm, y_mm, th;
+        if (sscanf(line.c_str(), "POSE %f %f %f", &x_mm, &y_mm, &th) == 3) {
+            Pose2D p;
+            p.x = x_mm / 1000.0f;
+            p.y = y_mm / 1000.0f;
+            p.theta = th;
+            follower.setCorrectedPose(p);
+        } else {
+            err = "syntaxe";
+        }
+    }
+    else if (line.startsWith("SET POSE")){
+        float x_mm, y_mm, th;
+        if (sscanf(line.c_str(), "SET POSE %f %f %f", &x_mm, &y_mm, &th) == 3) {
+            motors.ResetPosition(x_mm/ 1000.0f, y_mm/ 1000.0f, th);
+        } else {
+            err = "syntaxe";
+        }
+    }
+    // 3) STOP
+    else if (line.startsWith("STOP")) {
+        follower.reset();
+        motors.Stop();
+    }
+    // 4) Vitesse nominale "SPEED v" (mm/s) : ralentissement anti-collision
+    else if (line.startsWith("SPEED")) {
+        float v_mm;
+        if (sscanf(line.c_str(), "SPEED %f", &v_mm) == 1 && v_mm > 0.0f) {
+            follower.setNominalSpeed(v_mm / 1000.0f);
+        } else {
+            err = "syntaxe";
+        }
+    }
+    else {
+        err = "inconnue";
+    }
+    reply(seq, err);
+}
+
+static void abortFrame(const char* reason);
+
+// Trame complète : CRC vérifié, recalage de l'odométrie puis trajectoire
+static void handleFrame() {
+    Pose2D start;
+    bool hasPose = false;
+    if (follower.loadFromFrame(frame, frameLen, start, hasPose)) {
+        if (hasPose) {
+            motors.ResetPosition(start.x, start.y, start.theta);
+        }
+        trajSeq = frame[3];
+        reply(frame[3], nullptr);
+    } else {
+        // Octets perdus : la "fin" de la trame est le début de la commande suivante
+        abortFrame("crc");
+    }
+}
+
+// Trame abandonnée (en-tête invalide, octets manquants, CRC faux) : NAK si
+// son numéro est arrivé, pour que la Rasp la renvoie, puis les octets reçus
+// après le A5 sont relus (texte ou nouvelle trame) : une commande qui suivait
+// une trame tronquée, un STOP par exemple, n'est pas mangée comme charge utile.
+static void abortFrame(const char* reason) {
+    // Une relecture peut en imbriquer une autre (trame ouverte puis abandonnée
+    // pendant la relecture) : ses octets sont alors déjà relus, en tête de
+    // replay, et la copie n'écrase que ceux-là.
+    static uint8_t replay[sizeof(frame)];
+    inFrame = false;
+    if (frameLen > 3) reply(frame[3], reason);
+    size_t n = frameLen - 1;
+    memcpy(replay, frame + 1, n);
+    frameLen = 0;
+    for (size_t i = 0; i < n; i++) rxByte(replay[i]);
+}
+
+// Automate de réception : lignes texte, ou trame binaire dès l'octet A5
+static void rxByte(uint8_t c) {
+    if (inFrame) {
+        frame[frameLen++] = c;
+        frameLastByte = millis();
+        if (frameLen == 2 && c != FRAME_SYNC1) {
+            abortFrame("trame");
+        } else if (frameLen == FRAME_HEADER) {
+            // Type inconnu ou nombre de points hors de [1, MAX_POINTS]
+            frameExpected = TrajectoryFollower::frameLength(frame);
+            if (frameExpected == 0) abortFrame("trame");
+        } else if (frameLen > FRAME_HEADER && frameLen == frameExpected) {
+            inFrame = false;
+            handleFrame();
+        }
+        return;
+    }
+    // A5 n'existe dans aucune commande texte : une ligne en cours n'est que
+    // le reste d'une trame abandonnée, la nouvelle trame commence ici
+    if (c == FRAME_SYNC0) {
+        rxLine = "";
+        inFrame = true;
+        frame[0] = c;
+        frameLen = 1;
+        frameLastByte = millis();
+        return;
+    }
+    if (c == '\n') {
+        String line = rxLine;
+        rxLine = "";
+        handleLine(line);
+    } else if (c != '\r') {
+        rxLine += (char)c;
+    }
+}
+
 // Réception série depuis la Rasp
 void taskSerialRx(void* arg) {
-    String line;
-
     while (true) {
         while (SERIAL_PI.available()) {
-            char c = SERIAL_PI.read();
-            if (c == '\n') {
-                line.trim();
-                if (line.length() > 0) {
-                    // 1) JSON trajectoire (commence normalement par '[')
-                    if (line[0] == '[') {
-                        if (follower.loadFromJson(line.c_str())) {
-                            SERIAL_PI.println("BEZ OK");
-                        } else {
-                            SERIAL_PI.println("BEZ ERR");
-                        }
-                    }
-                    // 2) Pose corrigée: "POSE x y theta" (x,y en mm)
-                    else if (line.startsWith("POSE")) {
-                        float x_mm, y_mm, th;
-                        if (sscanf(line.c_str(), "POSE %f %f %f", &x_mm, &y_mm, &th) == 3) {
-                            Pose2D p;
-                            p.x = x_mm / 1000.0f;
-                            p.y = y_mm / 1000.0f;
-                            p.theta = th;
-                            follower.setCorrectedPose(p);
-                        }
-                    }
-                    else if (line.startsWith("SET POSE")){
-                        float x_mm, y_mm, th;
-                        if (sscanf(line.c_str(), "SET POSE %f %f %f", &x_mm, &y_mm, &th) == 3) {
-                            SERIAL_PI.print("SET POSE ");
-                            SERIAL_PI.print(x_mm);
-                            SERIAL_PI.print(" ");
-                            SERIAL_PI.print(y_mm);
-                            SERIAL_PI.print(" ");
-                            SERIAL_PI.println(th);
-                            motors.ResetPosition(x_mm/ 1000.0f, y_mm/ 1000.0f, th);
-                        }
-                    }
-                    // 3) STOP
-                    else if (line.startsWith("STOP")) {
-                        follower.reset();
-                        motors.Stop();
-                    }
-                }
-                line = "";
-            } else if (c != '\r') {
-                line += c;
-            }
+            rxByte(SERIAL_PI.read());
+        }
+        // Plus rien n'arrive au milieu d'une trame (octet perdu, n corrompu) :
+        // elle ne sera jamais complète, on la lâche et on se re-synchronise
+        if (inFrame && millis() - frameLastByte > FRAME_TIMEOUT_MS) {
+            abortFrame("delai");
         }
         vTaskDelay(pdMS_TO_TICKS(2));
     }
@@ -31,6 +31,16 @@ extern TaskHandle_t vAscHandle;
 #define MOTOR_RIGHT_STEP_PIN  17
 #define MOTOR_RIGHT_DIR_PIN   16
 
+// Trame binaire de trajectoire Rasp -> ESP32 (Rasp/interface_deplacement/protocol.py)
+#define FRAME_SYNC0 0xA5
+#define FRAME_SYNC1 0x5A
+#define FRAME_TRAJ 0x01       // points seuls
+#define FRAME_TRAJ_POSE 0x02  // recalage de l'odométrie puis points
+#define FRAME_HEADER 5        // A5 5A type seq n
+#define FRAME_POS_SCALE 4.0f      // int16 en 1/4 mm
+#define FRAME_ANGLE_SCALE 10000.0f // int16 en 1e-4 rad
+#define FRAME_TIMEOUT_MS 5        // trame abandonnée après ce silence (1 octet = 87 us à 115200 bauds)
+
 // Structure d'une commande de vitesse
 typedef struct {
     float vitesseGauche;  // m/s